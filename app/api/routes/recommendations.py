@@ -3,6 +3,8 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Dict, Any
 import logging
+from ...core.recommendation.catalog import AttractionCatalog
+from ...services.attraction_service import attraction_service
 from ...services.recommendation_service import RecommendationService
 from ...schemas.recommendation import RecommendationRequest, RecommendationResponse, UserPreferences, LocationInfo
 from ...data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
@@ -19,21 +21,41 @@ async def init_recommendation_service():
             # Try to load configured open-data sources first, then fall back to sample data
             from ...services.open_data_service import load_default_sources
             open_data = load_default_sources()
+            # Indexed once and shared with the attraction API, so both serve the same ids
+            catalog = AttractionCatalog(open_data or SAMPLE_NZ_ATTRACTIONS)
+            await recommendation_service.initialize(catalog.attractions, catalog=catalog)
             if open_data:
-                await recommendation_service.initialize(open_data)
                 logger.info(f"Recommendation service initialized with {len(open_data)} open-data attractions")
             else:
-                from ...data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
-                await recommendation_service.initialize(SAMPLE_NZ_ATTRACTIONS)
                 logger.info("Recommendation service initialized with sample data")
         except Exception as e:
             logger.error(f"Failed during recommendation service initialization: {e}")
             raise HTTPException(status_code=500, detail="Failed to initialize recommendation service")
+    if attraction_service.catalog is not recommendation_service.catalog:
+        attraction_service.use_catalog(recommendation_service.catalog)
 
 async def get_recommendation_service() -> RecommendationService:
     await init_recommendation_service()
     return recommendation_service
 
+# Largest number of requests accepted by the batch endpoint
+MAX_BATCH_SIZE = 100
+
+def _to_recommendation_request(request: dict) -> RecommendationRequest:
+    """Convert a raw request body to a RecommendationRequest, filling defaults"""
+    # Ensure preferences contain necessary fields
+    preferences = request.get("preferences", {})
+    if not preferences.get("activity_types"):
+        preferences["activity_types"] = ["natural", "scenic"]  # Default activity types
+
+    return RecommendationRequest(
+        user_id=request.get("user_id", "test_user"),
+        preferences=UserPreferences(**preferences),
+        current_location=LocationInfo(**request.get("current_location", {})) if request.get("current_location") else None,
+        exclude_visited=request.get("exclude_visited", []),
+        top_k=request.get("top_k", 6)
+    )
+
 @router.post("/")
 async def get_recommendations(request: dict, service: RecommendationService = Depends(get_recommendation_service)):
     """Get personalized recommendations"""
@@ -41,19 +63,8 @@ async def get_recommendations(request: dict, service: RecommendationService = De
         # Log received request data
         logger.info(f"Received recommendation request: {request}")
 
-        # Ensure preferences contain necessary fields
-        preferences = request.get("preferences", {})
-        if not preferences.get("activity_types"):
-            preferences["activity_types"] = ["natural", "scenic"]  # Default activity types
-        
         # Convert request to RecommendationRequest model
-        recommendation_request = RecommendationRequest(
-            user_id=request.get("user_id", "test_user"),
-            preferences=UserPreferences(**preferences),
-            current_location=LocationInfo(**request.get("current_location", {})) if request.get("current_location") else None,
-            exclude_visited=request.get("exclude_visited", []),
-            top_k=request.get("top_k", 6)
-        )
+        recommendation_request = _to_recommendation_request(request)
         
         # Get recommendations
         response = await service.get_recommendations(recommendation_request)
@@ -69,6 +80,28 @@ async def get_recommendations(request: dict, service: RecommendationService = De
         logger.error(f"Failed to get recommendations: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to get recommendations: {str(e)}")
 
+@router.post("/batch")
+async def get_recommendations_batch(request: dict, service: RecommendationService = Depends(get_recommendation_service)):
+    """Get recommendations for many requests scored in a single pass"""
+    try:
+        raw_requests = request.get("requests")
+        if not isinstance(raw_requests, list) or not raw_requests:
+            raise ValueError("'requests' must be a non-empty list")
+        if len(raw_requests) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} requests per batch")
+
+        recommendation_requests = [_to_recommendation_request(item) for item in raw_requests]
+        responses = await service.get_recommendations_batch(recommendation_requests)
+        logger.info(f"Generated batch recommendations for {len(responses)} requests")
+
+        return {"responses": responses, "total_count": len(responses)}
+    except ValueError as ve:
+        logger.warning(f"Invalid batch request parameters: {str(ve)}")
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Failed to get batch recommendations: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to get batch recommendations: {str(e)}")
+
 @router.post("/initialize")
 async def initialize_recommendations(
     attractions_data: List[Dict[str, Any]],
@@ -82,6 +115,11 @@ async def initialize_recommendations(
         logger.error(f"Failed to initialize recommendation system: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Initialization failed: {str(e)}")
 
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Recommendation result cache hit/miss counters"""
+    return recommendation_service.cache_stats()
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -50,6 +50,47 @@ class Settings(BaseSettings):
     # Application configurations
     DEBUG: bool = Field(default=True, env="DEBUG")
 
+    # Recommendation variety term: "seeded" (stable per user/day/request), "random" or "off"
+    RECOMMENDATION_VARIETY_MODE: str = Field(default="seeded", env="RECOMMENDATION_VARIETY_MODE")
+
+    # Recommendation result cache (size 0 disables it)
+    RECOMMENDATION_CACHE_SIZE: int = Field(default=2048, env="RECOMMENDATION_CACHE_SIZE")
+    RECOMMENDATION_CACHE_TTL_SECONDS: int = Field(default=300, env="RECOMMENDATION_CACHE_TTL_SECONDS")
+    RECOMMENDATION_CACHE_GEOHASH_PRECISION: int = Field(default=6, env="RECOMMENDATION_CACHE_GEOHASH_PRECISION")
+    RECOMMENDATION_CACHE_PER_USER: bool = Field(default=False, env="RECOMMENDATION_CACHE_PER_USER")
+    # Longest a response waits on outdoor weather before using cached (possibly stale) readings
+    RECOMMENDATION_WEATHER_TIMEOUT_SECONDS: float = Field(default=0.3, env="RECOMMENDATION_WEATHER_TIMEOUT_SECONDS")
+
+    # Travel-time cache for Distance Matrix legs ("" disables the SQLite store)
+    TRAVEL_CACHE_PATH: str = Field(default="/tmp/travel_times.sqlite3", env="TRAVEL_CACHE_PATH")
+    TRAVEL_CACHE_MEMORY_SIZE: int = Field(default=50000, env="TRAVEL_CACHE_MEMORY_SIZE")
+    TRAVEL_CACHE_TTL_SECONDS: int = Field(default=7 * 24 * 3600, env="TRAVEL_CACHE_TTL_SECONDS")
+
+    # Current-weather cache, keyed by geohash cell (precision 5 is ~4.9 km, 4 is ~39 km x 20 km)
+    WEATHER_GEOHASH_PRECISION: int = Field(default=5, env="WEATHER_GEOHASH_PRECISION")
+    WEATHER_CACHE_SIZE: int = Field(default=4096, env="WEATHER_CACHE_SIZE")
+    WEATHER_CACHE_TTL_SECONDS: int = Field(default=900, env="WEATHER_CACHE_TTL_SECONDS")
+    # Expired readings are served this long while a background refresh runs (0 disables)
+    WEATHER_STALE_TTL_SECONDS: int = Field(default=1800, env="WEATHER_STALE_TTL_SECONDS")
+    # Refresher keeping the most-requested cells warm before they expire (interval 0 disables it)
+    WEATHER_REFRESH_INTERVAL_SECONDS: int = Field(default=60, env="WEATHER_REFRESH_INTERVAL_SECONDS")
+    WEATHER_REFRESH_TOP_N: int = Field(default=200, env="WEATHER_REFRESH_TOP_N")
+    # Cells a provider failed to answer are not refetched for this long (0 retries on every lookup)
+    WEATHER_FAILURE_TTL_SECONDS: int = Field(default=60, env="WEATHER_FAILURE_TTL_SECONDS")
+    # Daily forecasts used to place outdoor stops on dry days, cached per (cell, date)
+    WEATHER_FORECAST_CACHE_SIZE: int = Field(default=16384, env="WEATHER_FORECAST_CACHE_SIZE")
+    WEATHER_FORECAST_TTL_SECONDS: int = Field(default=6 * 3600, env="WEATHER_FORECAST_TTL_SECONDS")
+
+    # Offline road graph used when Google Maps has no answer ("" disables it); must be a contraction
+    # hierarchy written by scripts/build_road_graph.py, raw graphs are rejected
+    ROAD_GRAPH_PATH: str = Field(default="", env="ROAD_GRAPH_PATH")
+
+    # Itinerary planning: "cluster" (top-k, clustered into days) or "orienteering"
+    ITINERARY_SOLVER: str = Field(default="cluster", env="ITINERARY_SOLVER")
+    ITINERARY_DAY_MINUTES: int = Field(default=480, env="ITINERARY_DAY_MINUTES")
+    ORIENTEERING_TIME_BUDGET_SECONDS: float = Field(default=0.2, env="ORIENTEERING_TIME_BUDGET_SECONDS")
+    ORIENTEERING_CANDIDATE_POOL: int = Field(default=40, env="ORIENTEERING_CANDIDATE_POOL")
+
     # DynamoDB tables
     DYNAMODB_USERS_TABLE: str = Field(default="trip-planner-users-849354442724", env="DYNAMODB_USERS_TABLE")
     DYNAMODB_ITINERARIES_TABLE: str = Field(default="trip-planner-itineraries-849354442724", env="DYNAMODB_ITINERARIES_TABLE")
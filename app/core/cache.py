@@ -0,0 +1,500 @@
+"""
+Bounded in-process caches
+"""
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+import asyncio
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_ABANDONED = object()  # Flight result when its leader was cancelled; waiters take the load over
+
+
+class _Flight:
+    """A load in progress that other callers for the same key wait on"""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Lookups move an entry to the most-recently-used end; inserting past
+    ``maxsize`` evicts from the least-recently-used end. Hit, miss and
+    eviction counters are kept so the cache can be sized from production
+    traffic. ``get_or_load`` / ``get_or_load_async`` add single-flight
+    loading: concurrent misses for one key share a single loader call;
+    ``get_or_load_many`` / ``get_or_load_many_async`` do the same for a
+    batch of keys with one loader call for everything not already cached
+    or loading.
+
+    With ``stale_ttl`` > 0 an expired entry is kept that much longer and
+    served stale-while-revalidate by the loading lookups: the caller gets
+    the old value at once while one background load replaces it. Plain
+    ``get`` never returns stale values. Per-key lookup counts feed
+    ``hot_keys`` so callers can refresh popular keys before they expire.
+
+    With ``negative_ttl`` > 0 a loader result of ``None`` (a failed
+    upstream call) is cached that long, so a failing key is not refetched
+    by every request. A failed reload never replaces a value that can
+    still be served stale.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+        stale_ttl: float = 0.0,
+        negative_ttl: float = 0.0,
+    ):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = float(ttl)
+        self.stale_ttl = float(stale_ttl)
+        self.negative_ttl = float(negative_ttl)
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._async_flights: Dict[Hashable, "asyncio.Future"] = {}
+        self._tasks: Set["asyncio.Task"] = set()  # Background refreshes, referenced until done
+        self._lookups: Dict[Hashable, float] = {}  # Decayed hit counts of cached keys, for hot_keys
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # Dropped to stay within maxsize
+        self.expirations = 0  # Dropped because the TTL (and any stale window) passed
+        self.coalesced = 0  # Misses that waited on another caller's load
+        self.stale_hits = 0  # Expired values served while a refresh ran
+        self.refreshes = 0  # Background reloads started by stale hits
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None, allow_stale: bool = False) -> Any:
+        """Cached value for ``key``, or ``default`` when absent or expired.
+
+        ``allow_stale`` also returns a value inside its stale window, without
+        starting a refresh. A negatively cached key reads as ``None``.
+        """
+        with self._lock:
+            value, fresh = self._lookup_locked(key)
+            if value is not _MISSING and not fresh and allow_stale:
+                self.stale_hits += 1
+            elif not fresh:
+                value = _MISSING
+                self.misses += 1
+        return default if value is _MISSING else value
+
+    def _lookup_locked(self, key: Hashable) -> Tuple[Any, bool]:
+        """``(value, fresh)``; ``value`` is ``_MISSING`` when absent. Counts fresh hits only."""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING, False
+        self._lookups[key] = self._lookups.get(key, 0.0) + 1.0
+        expires_at, stale_until, value = entry
+        now = self._clock()
+        if expires_at > now:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value, True
+        if stale_until > now:
+            return value, False
+        del self._data[key]
+        self._lookups.pop(key, None)
+        self.expirations += 1
+        return _MISSING, False
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store ``value``, evicting the least recently used entries beyond ``maxsize``"""
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._insert_locked(key, (expires_at, expires_at + self.stale_ttl, value))
+
+    def _insert_locked(self, key: Hashable, entry: tuple) -> None:
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            evicted, _ = self._data.popitem(last=False)
+            self._lookups.pop(evicted, None)
+            self.evictions += 1
+
+    def _store(self, key: Hashable, value: Any, ttl: Optional[float]) -> None:
+        """Cache a loader result; ``None`` is kept for ``negative_ttl`` only, with no stale window"""
+        if value is not None:
+            self.set(key, value, ttl)
+            return
+        if self.negative_ttl <= 0:
+            return
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[2] is not None and entry[1] > now:
+                return  # Keep serving the last good value until its stale window ends
+            self._insert_locked(key, (now + self.negative_ttl, now + self.negative_ttl, None))
+
+    def expires_in(self, key: Hashable) -> Optional[float]:
+        """Seconds until ``key`` goes stale (negative once it has), or ``None`` when not cached"""
+        with self._lock:
+            entry = self._data.get(key)
+        return None if entry is None else entry[0] - self._clock()
+
+    def hot_keys(self, n: int, decay: float = 0.5) -> List[Hashable]:
+        """The ``n`` cached keys looked up most often, most popular first.
+
+        Counts are multiplied by ``decay`` afterwards, so repeated calls
+        rank by recent traffic rather than all-time totals.
+        """
+        with self._lock:
+            ranked = heapq.nlargest(n, self._lookups, key=self._lookups.__getitem__)
+            for key in self._lookups:
+                self._lookups[key] *= decay
+        return ranked
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Cached value, or the result of ``loader()`` run once however many threads miss together.
+
+        ``None`` results are returned but cached only for ``negative_ttl``,
+        so a failed upstream call is retried soon after. Loader errors propagate to every
+        waiting caller. A stale value is returned as-is while a daemon
+        thread reloads it.
+        """
+        with self._lock:
+            value, fresh = self._lookup_locked(key)
+            if fresh:
+                return value
+            if value is not _MISSING:
+                self.stale_hits += 1
+                if key not in self._flights:
+                    flight = self._flights[key] = _Flight()
+                    self.refreshes += 1
+                    threading.Thread(
+                        target=self._refresh_quietly, args=(key, flight, loader, ttl), daemon=True
+                    ).start()
+                return value
+            self.misses += 1
+            flight, leader = self._join_flight_locked(key)
+        return self._run_flight(key, flight, leader, loader, ttl)
+
+    def refresh(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Reload ``key`` now whether or not it is cached, joining a load already in flight"""
+        with self._lock:
+            flight, leader = self._join_flight_locked(key)
+        return self._run_flight(key, flight, leader, loader, ttl)
+
+    def _join_flight_locked(self, key: Hashable) -> Tuple[_Flight, bool]:
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            return flight, False
+        flight = self._flights[key] = _Flight()
+        return flight, True
+
+    def _run_flight(self, key: Hashable, flight: _Flight, leader: bool, loader: Callable[[], Any], ttl: Optional[float]) -> Any:
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+            self._store(key, flight.value, ttl)
+            return flight.value
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _refresh_quietly(self, key: Hashable, flight: _Flight, loader: Callable[[], Any], ttl: Optional[float]) -> None:
+        try:
+            self._run_flight(key, flight, True, loader, ttl)
+        except Exception as exc:  # Nobody awaits a background refresh; the stale value stays until it lapses
+            logger.warning("Background refresh of %r failed: %s", key, exc)
+
+    async def get_or_load_async(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None
+    ) -> Any:
+        """``get_or_load`` for coroutines: tasks on one event loop share a single ``await loader()``.
+
+        A stale value is returned as-is while a task on the running loop reloads it.
+        Cancelling the task running the load does not fail the tasks waiting on
+        it: one of them starts the load again.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value, fresh = self._lookup_locked(key)
+            if fresh:
+                return value
+            if value is not _MISSING:
+                self.stale_hits += 1
+                future = self._async_flights.get(key)
+                if future is None or future.get_loop() is not loop:
+                    future = self._async_flights[key] = loop.create_future()
+                    self.refreshes += 1
+                    task = loop.create_task(self._refresh_quietly_async(key, future, loader, ttl))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                return value
+            self.misses += 1
+            future, leader = self._join_async_flight_locked(key, loop)
+        return await self._run_async_flight(key, future, leader, loader, ttl)
+
+    async def refresh_async(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None
+    ) -> Any:
+        """``refresh`` for coroutines"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            future, leader = self._join_async_flight_locked(key, loop)
+        return await self._run_async_flight(key, future, leader, loader, ttl)
+
+    def _join_async_flight_locked(self, key: Hashable, loop: asyncio.AbstractEventLoop) -> Tuple["asyncio.Future", bool]:
+        future = self._async_flights.get(key)
+        if future is not None and future.get_loop() is loop:
+            self.coalesced += 1
+            return future, False
+        future = self._async_flights[key] = loop.create_future()
+        return future, True
+
+    async def _run_async_flight(
+        self,
+        key: Hashable,
+        future: "asyncio.Future",
+        leader: bool,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float],
+    ) -> Any:
+        if not leader:
+            value = await asyncio.shield(future)
+            if value is _ABANDONED:
+                # The leader's request was cancelled, not this one: join or lead a new load
+                return await self.refresh_async(key, loader, ttl)
+            return value
+
+        try:
+            value = await loader()
+            self._store(key, value, ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.set_result(_ABANDONED)
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # Mark retrieved when nobody else was waiting
+            raise
+        finally:
+            with self._lock:
+                if self._async_flights.get(key) is future:
+                    del self._async_flights[key]
+
+    async def _refresh_quietly_async(
+        self, key: Hashable, future: "asyncio.Future", loader: Callable[[], Awaitable[Any]], ttl: Optional[float]
+    ) -> None:
+        try:
+            await self._run_async_flight(key, future, True, loader, ttl)
+        except Exception as exc:
+            logger.warning("Background refresh of %r failed: %s", key, exc)
+
+    def get_or_load_many(
+        self, keys: Iterable[Hashable], loader: Callable[[List[Hashable]], Dict[Hashable, Any]], ttl: Optional[float] = None
+    ) -> Dict[Hashable, Any]:
+        """Values for ``keys``, loading every key not cached or already loading with one ``loader(keys)`` call.
+
+        The loader returns a dict of the values it found; requested keys it
+        leaves out count as ``None`` results and are negatively cached. Keys
+        another thread is loading are waited on, not reloaded, and stale
+        keys are returned as-is while one daemon thread reloads them all.
+        Every distinct key is in the result, ``None`` where nothing is known.
+        """
+        found: Dict[Hashable, Any] = {}
+        owned: Dict[Hashable, _Flight] = {}
+        waiting: Dict[Hashable, _Flight] = {}
+        stale: Dict[Hashable, _Flight] = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                value, fresh = self._lookup_locked(key)
+                if fresh:
+                    found[key] = value
+                elif value is not _MISSING:
+                    self.stale_hits += 1
+                    found[key] = value
+                    if key not in self._flights:
+                        stale[key] = self._flights[key] = _Flight()
+                        self.refreshes += 1
+                else:
+                    self.misses += 1
+                    flight, leader = self._join_flight_locked(key)
+                    (owned if leader else waiting)[key] = flight
+        if stale:
+            threading.Thread(target=self._refresh_many_quietly, args=(stale, loader, ttl), daemon=True).start()
+        if owned:
+            found.update(self._run_flights(owned, loader, ttl))
+        for key, flight in waiting.items():
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            found[key] = flight.value
+        return found
+
+    def _run_flights(
+        self, flights: Dict[Hashable, _Flight], loader: Callable[[List[Hashable]], Dict[Hashable, Any]], ttl: Optional[float]
+    ) -> Dict[Hashable, Any]:
+        try:
+            loaded = self._store_many(list(flights), loader(list(flights)), ttl)
+            for key, flight in flights.items():
+                flight.value = loaded[key]
+            return loaded
+        except BaseException as exc:
+            for flight in flights.values():
+                flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                for key in flights:
+                    self._flights.pop(key, None)
+            for flight in flights.values():
+                flight.done.set()
+
+    def _store_many(self, keys: List[Hashable], values: Dict[Hashable, Any], ttl: Optional[float]) -> Dict[Hashable, Any]:
+        """Cache everything a batch loader returned, plus ``None`` for the requested keys it missed"""
+        for key, value in values.items():
+            self._store(key, value, ttl)
+        loaded = {key: values.get(key) for key in keys}
+        for key, value in loaded.items():
+            if value is None and key not in values:
+                self._store(key, None, ttl)
+        return loaded
+
+    def _refresh_many_quietly(
+        self, flights: Dict[Hashable, _Flight], loader: Callable[[List[Hashable]], Dict[Hashable, Any]], ttl: Optional[float]
+    ) -> None:
+        try:
+            self._run_flights(flights, loader, ttl)
+        except Exception as exc:
+            logger.warning("Background refresh of %d keys failed: %s", len(flights), exc)
+
+    async def get_or_load_many_async(
+        self,
+        keys: Iterable[Hashable],
+        loader: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        ttl: Optional[float] = None,
+    ) -> Dict[Hashable, Any]:
+        """``get_or_load_many`` for coroutines: one ``await loader(keys)`` for the keys nobody on this loop is loading.
+
+        Stale keys are returned as-is while a task on the running loop reloads them.
+        """
+        loop = asyncio.get_running_loop()
+        found: Dict[Hashable, Any] = {}
+        owned: Dict[Hashable, "asyncio.Future"] = {}
+        waiting: Dict[Hashable, "asyncio.Future"] = {}
+        stale: Dict[Hashable, "asyncio.Future"] = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                value, fresh = self._lookup_locked(key)
+                if fresh:
+                    found[key] = value
+                elif value is not _MISSING:
+                    self.stale_hits += 1
+                    found[key] = value
+                    future = self._async_flights.get(key)
+                    if future is None or future.get_loop() is not loop:
+                        stale[key] = self._async_flights[key] = loop.create_future()
+                        self.refreshes += 1
+                else:
+                    self.misses += 1
+                    future, leader = self._join_async_flight_locked(key, loop)
+                    (owned if leader else waiting)[key] = future
+        if stale:
+            task = loop.create_task(self._refresh_many_quietly_async(stale, loader, ttl))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if owned:
+            found.update(await self._run_async_flights(owned, loader, ttl))
+        abandoned = []
+        for key, future in waiting.items():
+            found[key] = await asyncio.shield(future)
+            if found[key] is _ABANDONED:
+                abandoned.append(key)
+        if abandoned:
+            # Their leader was cancelled; this caller was not, so load them again
+            found.update(await self.get_or_load_many_async(abandoned, loader, ttl))
+        return found
+
+    async def _run_async_flights(
+        self,
+        futures: Dict[Hashable, "asyncio.Future"],
+        loader: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        ttl: Optional[float],
+    ) -> Dict[Hashable, Any]:
+        try:
+            loaded = self._store_many(list(futures), await loader(list(futures)), ttl)
+            for key, future in futures.items():
+                future.set_result(loaded[key])
+            return loaded
+        except asyncio.CancelledError:
+            for future in futures.values():
+                future.set_result(_ABANDONED)
+            raise
+        except BaseException as exc:
+            for future in futures.values():
+                future.set_exception(exc)
+                future.exception()
+            raise
+        finally:
+            with self._lock:
+                for key, future in futures.items():
+                    if self._async_flights.get(key) is future:
+                        del self._async_flights[key]
+
+    async def _refresh_many_quietly_async(
+        self,
+        futures: Dict[Hashable, "asyncio.Future"],
+        loader: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        ttl: Optional[float],
+    ) -> None:
+        try:
+            await self._run_async_flights(futures, loader, ttl)
+        except Exception as exc:
+            logger.warning("Background refresh of %d keys failed: %s", len(futures), exc)
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept"""
+        with self._lock:
+            self._data.clear()
+            self._lookups.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale_hits
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stale_hits": self.stale_hits,
+                "refreshes": self.refreshes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights) + len(self._async_flights),
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "stale_ttl_seconds": self.stale_ttl,
+                "negative_ttl_seconds": self.negative_ttl,
+            }
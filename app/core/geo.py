@@ -0,0 +1,137 @@
+"""
+Geographic helpers shared by services
+"""
+
+from typing import Optional, Sequence, Tuple
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+_GEOHASH_DECODE = {c: i for i, c in enumerate(_GEOHASH_ALPHABET)}
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 6) -> str:
+    """Geohash cell containing the point; precision 6 cells are about 1.2 km x 0.6 km"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # Bits alternate longitude, latitude
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2.0
+            if lng >= mid:
+                value = (value << 1) | 1
+                lng_lo = mid
+            else:
+                value <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2.0
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def geohash_bounds(cell: str) -> Tuple[float, float, float, float]:
+    """(lat_min, lat_max, lng_min, lng_max) of a geohash cell"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for char in cell:
+        value = _GEOHASH_DECODE[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2.0
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2.0
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lat_hi, lng_lo, lng_hi
+
+
+def geohash_center(cell: str) -> Tuple[float, float]:
+    """(lat, lng) centroid of a geohash cell"""
+    lat_lo, lat_hi, lng_lo, lng_hi = geohash_bounds(cell)
+    return (lat_lo + lat_hi) / 2.0, (lng_lo + lng_hi) / 2.0
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance (km) between two points in degrees; plain ``math`` for single pairs"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    sin_dlat = math.sin((lat2_rad - lat1_rad) / 2.0)
+    sin_dlng = math.sin(math.radians(lng2 - lng1) / 2.0)
+    a = sin_dlat * sin_dlat + math.cos(lat1_rad) * math.cos(lat2_rad) * sin_dlng * sin_dlng
+    return 2.0 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+
+
+def haversine_km_rad(
+    lat_rad: np.ndarray,
+    lng_rad: np.ndarray,
+    lat0_rad,
+    lng0_rad,
+    cos_lat: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Great-circle distance (km) between broadcastable arrays of points in radians.
+
+    Pass ``cos_lat`` (``np.cos(lat_rad)``) when it is precomputed, as the
+    catalog does, to skip one transcendental per point.
+    """
+    if cos_lat is None:
+        cos_lat = np.cos(lat_rad)
+    sin_dlat = np.sin((lat_rad - lat0_rad) / 2.0)
+    sin_dlng = np.sin((lng_rad - lng0_rad) / 2.0)
+    a = sin_dlat * sin_dlat + np.cos(lat0_rad) * cos_lat * sin_dlng * sin_dlng
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def one_to_many_km(lat: float, lng: float, lats: Sequence[float], lngs: Sequence[float]) -> np.ndarray:
+    """Distances (km) from one point to each of many, all in degrees"""
+    return haversine_km_rad(
+        np.radians(np.asarray(lats, dtype=np.float64)),
+        np.radians(np.asarray(lngs, dtype=np.float64)),
+        math.radians(lat),
+        math.radians(lng),
+    )
+
+
+def many_to_many_km(
+    lats: Sequence[float],
+    lngs: Sequence[float],
+    to_lats: Optional[Sequence[float]] = None,
+    to_lngs: Optional[Sequence[float]] = None,
+) -> np.ndarray:
+    """(n, m) distance matrix (km) from each point to each target; the points themselves by default"""
+    lat_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lng_rad = np.radians(np.asarray(lngs, dtype=np.float64))
+    if to_lats is None or to_lngs is None:
+        to_lat_rad, to_lng_rad = lat_rad, lng_rad
+    else:
+        to_lat_rad = np.radians(np.asarray(to_lats, dtype=np.float64))
+        to_lng_rad = np.radians(np.asarray(to_lngs, dtype=np.float64))
+    return haversine_km_rad(
+        to_lat_rad[np.newaxis, :], to_lng_rad[np.newaxis, :], lat_rad[:, np.newaxis], lng_rad[:, np.newaxis]
+    )
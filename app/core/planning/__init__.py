@@ -0,0 +1,9 @@
+from .routing import solve_route, path_cost
+from .clustering import cluster_days
+from .orienteering import solve_orienteering
+from .road_network import ContractionHierarchy, RoadGraph, load_road_network
+
+__all__ = [
+    'solve_route', 'path_cost', 'cluster_days', 'solve_orienteering',
+    'ContractionHierarchy', 'RoadGraph', 'load_road_network',
+]
@@ -0,0 +1,106 @@
+"""
+Geographic assignment of stops to trip days
+"""
+
+from typing import List, Optional, Sequence, Tuple
+import math
+
+import numpy as np
+
+from ..geo import many_to_many_km
+from .routing import solve_route
+
+
+def _initial_medoids(distances: np.ndarray, k: int) -> np.ndarray:
+    """Farthest-point seeding from the first (highest ranked) point"""
+    medoids = [0]
+    nearest = distances[0].copy()
+    for _ in range(1, k):
+        candidate = int(np.argmax(nearest))
+        medoids.append(candidate)
+        np.minimum(nearest, distances[candidate], out=nearest)
+    return np.asarray(medoids, dtype=np.int64)
+
+
+def _assign(distances: np.ndarray, medoids: np.ndarray, capacity: int, minimum: int) -> np.ndarray:
+    """Label each point with a medoid, cheapest pairs first, without exceeding ``capacity``"""
+    n, k = distances.shape[0], len(medoids)
+    to_medoid = distances[:, medoids]
+    labels = np.full(n, -1, dtype=np.int64)
+    sizes = np.zeros(k, dtype=np.int64)
+    assigned = 0
+    for flat in np.argsort(to_medoid, axis=None, kind='stable'):
+        point, cluster = divmod(int(flat), k)
+        if labels[point] >= 0 or sizes[cluster] >= capacity:
+            continue
+        labels[point] = cluster
+        sizes[cluster] += 1
+        assigned += 1
+        if assigned == n:
+            break
+
+    # Top up clusters left below the balanced minimum with the nearest spare points
+    for cluster in np.flatnonzero(sizes < minimum):
+        while sizes[cluster] < minimum:
+            donors = (sizes[labels] > minimum) & (labels != cluster)
+            point = int(np.flatnonzero(donors)[np.argmin(to_medoid[donors, cluster])])
+            sizes[labels[point]] -= 1
+            labels[point] = cluster
+            sizes[cluster] += 1
+    return labels
+
+
+def _update_medoids(distances: np.ndarray, labels: np.ndarray, k: int) -> np.ndarray:
+    medoids = np.empty(k, dtype=np.int64)
+    for cluster in range(k):
+        members = np.flatnonzero(labels == cluster)
+        within = distances[np.ix_(members, members)].sum(axis=1)
+        medoids[cluster] = members[int(np.argmin(within))]
+    return medoids
+
+
+def cluster_days(
+    lat: Sequence[float],
+    lng: Sequence[float],
+    n_days: int,
+    start: Optional[Tuple[float, float]] = None,
+    max_iterations: int = 20,
+) -> List[List[int]]:
+    """Split points into ``n_days`` balanced, geographically compact groups.
+
+    Capacity-constrained k-medoids: every group holds ``floor(n / days)`` or
+    ``ceil(n / days)`` points. Groups are returned in travel order (a route
+    from ``start`` through the medoids) and list their point indices in
+    ascending order, so earlier-ranked points stay first within a day.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    n = len(lat)
+    k = min(max(int(n_days), 1), n)
+    if n == 0:
+        return []
+
+    distances = many_to_many_km(lat, lng)
+    capacity = math.ceil(n / k)
+    minimum = n // k
+
+    medoids = _initial_medoids(distances, k)
+    labels = _assign(distances, medoids, capacity, minimum)
+    for _ in range(max_iterations):
+        updated = _update_medoids(distances, labels, k)
+        if np.array_equal(np.sort(updated), np.sort(medoids)):
+            break
+        medoids = updated
+        labels = _assign(distances, medoids, capacity, minimum)
+
+    # Visit the groups in a sensible order: a short path through the medoids
+    points_lat = lat[medoids]
+    points_lng = lng[medoids]
+    if start is not None:
+        points_lat = np.concatenate([[start[0]], points_lat])
+        points_lng = np.concatenate([[start[1]], points_lng])
+    order = solve_route(many_to_many_km(points_lat, points_lng).tolist(), start=0 if start is not None else None)
+    if start is not None:
+        order = [node - 1 for node in order if node > 0]
+
+    return [np.flatnonzero(labels == cluster).tolist() for cluster in order]
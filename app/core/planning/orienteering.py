@@ -0,0 +1,147 @@
+"""
+Multi-day orienteering: pick and order stops to maximise score within daily time
+"""
+
+from typing import List, Sequence, Tuple
+import time
+
+import numpy as np
+
+from .routing import or_opt, two_opt
+
+_EPSILON = 1e-9
+
+
+class _Plan:
+    """Day routes over candidate nodes 1..n, with node 0 the daily start (depot)"""
+
+    def __init__(self, travel: np.ndarray, service: np.ndarray, n_days: int, day_minutes: float):
+        self.travel = travel
+        self.travel_rows = travel.tolist()
+        self.service = service
+        self.day_minutes = day_minutes
+        self.routes: List[List[int]] = [[] for _ in range(n_days)]
+        self.visited = np.zeros(len(travel), dtype=bool)
+        self.visited[0] = True
+
+    def route_minutes(self, route: Sequence[int]) -> float:
+        path = [0, *route]
+        travel = sum(self.travel_rows[a][b] for a, b in zip(path, path[1:]))
+        return travel + float(self.service[list(route)].sum()) if route else 0.0
+
+    def insertion_costs(self, route: Sequence[int], nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cheapest added minutes and position for inserting each of ``nodes`` into ``route``"""
+        path = np.asarray([0, *route], dtype=np.int64)
+        before = self.travel[path][:, nodes].T            # (nodes, positions): prev -> node
+        after = np.zeros_like(before)
+        after[:, :-1] = self.travel[nodes][:, path[1:]]    # node -> next; nothing after the last stop
+        removed = np.zeros(len(path))
+        removed[:-1] = self.travel[path[:-1], path[1:]]
+        added = before + after - removed[np.newaxis, :] + self.service[nodes][:, np.newaxis]
+        positions = np.argmin(added, axis=1)
+        return added[np.arange(len(nodes)), positions], positions + 1
+
+
+def _greedy_insert(plan: _Plan, scores: np.ndarray, deadline: float) -> bool:
+    """Insert unvisited nodes by best score per added minute until nothing fits"""
+    inserted = False
+    while time.perf_counter() < deadline:
+        unvisited = np.flatnonzero(~plan.visited)
+        if not len(unvisited):
+            break
+        best = None
+        for day, route in enumerate(plan.routes):
+            slack = plan.day_minutes - plan.route_minutes(route)
+            added, positions = plan.insertion_costs(route, unvisited)
+            feasible = added <= slack + _EPSILON
+            if not feasible.any():
+                continue
+            ratio = np.where(feasible, scores[unvisited] / np.maximum(added, 1.0), -np.inf)
+            i = int(np.argmax(ratio))
+            if best is None or ratio[i] > best[0]:
+                best = (ratio[i], day, int(unvisited[i]), int(positions[i]))
+        if best is None:
+            break
+        _, day, node, position = best
+        plan.routes[day].insert(position - 1, node)
+        plan.visited[node] = True
+        inserted = True
+    return inserted
+
+
+def _shorten_routes(plan: _Plan, deadline: float) -> None:
+    """Reorder each day with 2-opt / Or-opt to free time for more stops"""
+    for day, route in enumerate(plan.routes):
+        if len(route) < 2:
+            continue
+        path = [0, *route]
+        while time.perf_counter() < deadline:
+            changed = two_opt(plan.travel_rows, path, 1, deadline)
+            changed = or_opt(plan.travel_rows, path, 1, deadline) or changed
+            if not changed:
+                break
+        plan.routes[day] = path[1:]
+
+
+def _swap_in(plan: _Plan, scores: np.ndarray, deadline: float) -> bool:
+    """Replace a visited stop with a higher-scoring unvisited one when the day still fits"""
+    unvisited = np.flatnonzero(~plan.visited)
+    for node in unvisited[np.argsort(-scores[unvisited], kind='stable')]:
+        for day, route in enumerate(plan.routes):
+            for position in np.argsort([scores[v] for v in route], kind='stable'):
+                if time.perf_counter() >= deadline:
+                    return False
+                victim = route[position]
+                if scores[victim] >= scores[node] - _EPSILON:
+                    break
+                reduced = route[:position] + route[position + 1:]
+                added, positions = plan.insertion_costs(reduced, np.asarray([node]))
+                if plan.route_minutes(reduced) + added[0] <= plan.day_minutes + _EPSILON:
+                    reduced.insert(int(positions[0]) - 1, int(node))
+                    plan.routes[day] = reduced
+                    plan.visited[victim] = False
+                    plan.visited[node] = True
+                    return True
+    return False
+
+
+def solve_orienteering(
+    scores: Sequence[float],
+    service_minutes: Sequence[float],
+    travel_minutes: Sequence[Sequence[float]],
+    n_days: int,
+    day_minutes: float,
+    time_budget: float = 0.2,
+    depot: bool = True,
+) -> List[List[int]]:
+    """Choose and order candidates over ``n_days`` to maximise total score.
+
+    ``travel_minutes`` is an (n + 1) x (n + 1) matrix whose node 0 is the
+    daily start and node ``i + 1`` is candidate ``i``; pass ``depot=False``
+    when there is no base, so days may start anywhere. Each day's travel and
+    visit time stays within ``day_minutes``. Greedy insertion by score per
+    added minute builds a first plan; route shortening, re-insertion and
+    swaps then improve it until no move helps or ``time_budget`` seconds
+    (a hard deadline) run out. Returns candidate indices per day, in visit
+    order.
+    """
+    deadline = time.perf_counter() + time_budget
+    travel = np.asarray(travel_minutes, dtype=np.float64).copy()
+    if not depot:
+        travel[0, :] = 0.0
+        travel[:, 0] = 0.0
+    node_scores = np.concatenate([[0.0], np.asarray(scores, dtype=np.float64)])
+    service = np.concatenate([[0.0], np.asarray(service_minutes, dtype=np.float64)])
+
+    plan = _Plan(travel, service, max(int(n_days), 0), float(day_minutes))
+    if not plan.routes:
+        return []
+    _greedy_insert(plan, node_scores, deadline)
+    while time.perf_counter() < deadline:
+        _shorten_routes(plan, deadline)
+        improved = _greedy_insert(plan, node_scores, deadline)
+        improved = _swap_in(plan, node_scores, deadline) or improved
+        if not improved:
+            break
+
+    return [[node - 1 for node in route] for route in plan.routes]
@@ -0,0 +1,255 @@
+"""
+Offline road routing: contraction hierarchies over a local road graph
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import gzip
+import heapq
+import json
+import math
+
+import numpy as np
+
+from ..recommendation.spatial import GeoGridIndex
+
+# Witness searches give up after settling this many nodes (a missed witness only adds a redundant shortcut)
+WITNESS_SETTLE_LIMIT = 200
+
+# Grid cell for snapping points to road nodes (~5.5 km of latitude)
+SNAP_CELL_DEG = 0.05
+
+# (minutes, km) along an edge; routes minimise minutes and carry km alongside
+Weight = Tuple[float, float]
+
+
+class RoadGraph:
+    """Directed road graph with node coordinates in degrees.
+
+    Edges are ``(u, v, minutes, km)``. In the file format an edge may carry a
+    fifth ``oneway`` flag; edges without it are usable in both directions.
+    """
+
+    def __init__(self, lat: Sequence[float], lng: Sequence[float], edges: Sequence[Tuple[int, int, float, float]]):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.edges = [(int(u), int(v), float(minutes), float(km)) for u, v, minutes, km in edges]
+        self._index = GeoGridIndex(np.radians(self.lat), np.radians(self.lng), cell_deg=SNAP_CELL_DEG)
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RoadGraph":
+        nodes = data.get("nodes", [])
+        edges: List[Tuple[int, int, float, float]] = []
+        for edge in data.get("edges", []):
+            u, v, minutes, km = edge[:4]
+            edges.append((u, v, minutes, km))
+            if not (len(edge) > 4 and edge[4]):
+                edges.append((v, u, minutes, km))
+        return cls([node[0] for node in nodes], [node[1] for node in nodes], edges)
+
+    def snap(self, lat: float, lng: float, max_km: float) -> Optional[Tuple[int, float]]:
+        """Nearest node within ``max_km`` of the point and its distance, or None"""
+        rows, distances = self._index.query_radius(lat, lng, max_km)
+        if not len(rows):
+            return None
+        best = int(np.argmin(distances))
+        return int(rows[best]), float(distances[best])
+
+
+def _witness_distances(
+    out: List[Dict[int, Weight]], source: int, skip: int, limit: float, targets: set
+) -> Dict[int, float]:
+    """Bounded Dijkstra from ``source`` that avoids ``skip``; stops once every target is settled"""
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    remaining = set(targets)
+    while heap and remaining and settled < WITNESS_SETTLE_LIMIT:
+        d, node = heapq.heappop(heap)
+        if d > dist.get(node, math.inf) or d > limit:
+            continue
+        settled += 1
+        remaining.discard(node)
+        for nxt, (minutes, _) in out[node].items():
+            if nxt == skip:
+                continue
+            candidate = d + minutes
+            if candidate < dist.get(nxt, math.inf):
+                dist[nxt] = candidate
+                heapq.heappush(heap, (candidate, nxt))
+    return dist
+
+
+def _shortcuts(out: List[Dict[int, Weight]], inn: List[Dict[int, Weight]], node: int) -> List[Tuple[int, int, Weight]]:
+    """Shortcuts needed to keep shortest paths through ``node`` once it is removed"""
+    added = []
+    targets = set(out[node])
+    for source, (in_minutes, in_km) in inn[node].items():
+        if source == node or not targets - {source}:
+            continue
+        limit = in_minutes + max(minutes for minutes, _ in out[node].values())
+        witness = _witness_distances(out, source, node, limit, targets - {source})
+        for target, (out_minutes, out_km) in out[node].items():
+            if target == source:
+                continue
+            via = in_minutes + out_minutes
+            if witness.get(target, math.inf) > via:
+                added.append((source, target, (via, in_km + out_km)))
+    return added
+
+
+def _add_edge(adjacency: Dict[Tuple[int, int], Weight], u: int, v: int, weight: Weight) -> bool:
+    if u == v or (u, v) in adjacency and adjacency[(u, v)][0] <= weight[0]:
+        return False
+    adjacency[(u, v)] = weight
+    return True
+
+
+class ContractionHierarchy:
+    """Road graph preprocessed for fast many-to-many shortest-path queries.
+
+    Nodes are contracted in order of importance (edge difference plus the
+    number of contracted neighbours, updated lazily); each contraction adds
+    shortcuts that preserve shortest paths among the remaining nodes. A query
+    then only searches "upward" from both ends, visiting a few hundred nodes
+    instead of the whole network.
+    """
+
+    def __init__(self, graph: RoadGraph, rank: Sequence[int], edges: Dict[Tuple[int, int], Weight]):
+        self.graph = graph
+        self.rank = np.asarray(rank, dtype=np.int64)
+        self.edges = edges
+        # Forward searches follow edges to higher ranks; backward searches follow them in reverse
+        self._up: List[List[Tuple[int, float, float]]] = [[] for _ in range(len(graph))]
+        self._down: List[List[Tuple[int, float, float]]] = [[] for _ in range(len(graph))]
+        for (u, v), (minutes, km) in edges.items():
+            if self.rank[u] < self.rank[v]:
+                self._up[u].append((v, minutes, km))
+            else:
+                self._down[v].append((u, minutes, km))
+
+    @classmethod
+    def build(cls, graph: RoadGraph) -> "ContractionHierarchy":
+        n = len(graph)
+        edges: Dict[Tuple[int, int], Weight] = {}
+        for u, v, minutes, km in graph.edges:
+            _add_edge(edges, u, v, (minutes, km))
+
+        # Working graph of the nodes not yet contracted
+        out: List[Dict[int, Weight]] = [{} for _ in range(n)]
+        inn: List[Dict[int, Weight]] = [{} for _ in range(n)]
+        for (u, v), weight in edges.items():
+            out[u][v] = weight
+            inn[v][u] = weight
+
+        contracted_neighbours = [0] * n
+
+        def priority(node: int, shortcuts: List[Tuple[int, int, Weight]]) -> int:
+            return len(shortcuts) - len(out[node]) - len(inn[node]) + contracted_neighbours[node]
+
+        heap = [(priority(node, _shortcuts(out, inn, node)), node) for node in range(n)]
+        heapq.heapify(heap)
+        rank = [0] * n
+        order = 0
+        while heap:
+            _, node = heapq.heappop(heap)
+            shortcuts = _shortcuts(out, inn, node)
+            current = priority(node, shortcuts)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, node))
+                continue
+
+            for u, v, weight in shortcuts:
+                if _add_edge(edges, u, v, weight):
+                    out[u][v] = weight
+                    inn[v][u] = weight
+            for neighbour in set(out[node]) | set(inn[node]):
+                out[neighbour].pop(node, None)
+                inn[neighbour].pop(node, None)
+                contracted_neighbours[neighbour] += 1
+            out[node] = {}
+            inn[node] = {}
+            rank[node] = order
+            order += 1
+        return cls(graph, rank, edges)
+
+    def _search(self, source: int, adjacency: List[List[Tuple[int, float, float]]]) -> Dict[int, Weight]:
+        """Upward Dijkstra from ``source``: (minutes, km) to every node reached"""
+        best: Dict[int, Weight] = {source: (0.0, 0.0)}
+        heap = [(0.0, 0.0, source)]
+        while heap:
+            minutes, km, node = heapq.heappop(heap)
+            if minutes > best[node][0]:
+                continue
+            for nxt, edge_minutes, edge_km in adjacency[node]:
+                candidate = minutes + edge_minutes
+                if nxt not in best or candidate < best[nxt][0]:
+                    best[nxt] = (candidate, km + edge_km)
+                    heapq.heappush(heap, (candidate, km + edge_km, nxt))
+        return best
+
+    def many_to_many(self, sources: Sequence[int], targets: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """(minutes, km) matrices of shortest paths; ``inf`` where a target is unreachable.
+
+        Bucket algorithm: one backward search per target leaves (target,
+        distance) entries at every node it reaches, then one forward search
+        per source combines its distances with the buckets it meets.
+        """
+        minutes = np.full((len(sources), len(targets)), np.inf)
+        km = np.full((len(sources), len(targets)), np.inf)
+        buckets: Dict[int, List[Tuple[int, float, float]]] = defaultdict(list)
+        for t, target in enumerate(targets):
+            for node, (to_minutes, to_km) in self._search(target, self._down).items():
+                buckets[node].append((t, to_minutes, to_km))
+
+        for s, source in enumerate(sources):
+            row_minutes = minutes[s]
+            row_km = km[s]
+            for node, (from_minutes, from_km) in self._search(source, self._up).items():
+                for t, to_minutes, to_km in buckets.get(node, ()):
+                    total = from_minutes + to_minutes
+                    if total < row_minutes[t]:
+                        row_minutes[t] = total
+                        row_km[t] = from_km + to_km
+        return minutes, km
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "nodes": [[float(lat), float(lng)] for lat, lng in zip(self.graph.lat, self.graph.lng)],
+            "rank": self.rank.tolist(),
+            "shortcut_edges": [[u, v, minutes, km] for (u, v), (minutes, km) in self.edges.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ContractionHierarchy":
+        nodes = data["nodes"]
+        edges = {(int(u), int(v)): (float(minutes), float(km)) for u, v, minutes, km in data["shortcut_edges"]}
+        graph = RoadGraph([node[0] for node in nodes], [node[1] for node in nodes], [])
+        return cls(graph, data["rank"], edges)
+
+
+def load_road_network(path: str, contract: bool = True) -> ContractionHierarchy:
+    """Read a road graph file (JSON, optionally gzipped) and return its contraction hierarchy.
+
+    Files written by ``ContractionHierarchy.to_dict`` load directly; a raw
+    ``{"nodes": [[lat, lng], ...], "edges": [[u, v, minutes, km(, oneway)], ...]}``
+    graph is contracted on load, which takes minutes for a regional graph.
+    With ``contract=False`` a raw graph raises ``ValueError`` instead.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as handle:
+        data = json.load(handle)
+    if "shortcut_edges" in data:
+        return ContractionHierarchy.from_dict(data)
+    if not contract:
+        raise ValueError(f"{path} is a raw road graph; contract it with scripts/build_road_graph.py")
+    return ContractionHierarchy.build(RoadGraph.from_dict(data))
+
+
+def save_road_network(hierarchy: ContractionHierarchy, path: str) -> None:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as handle:
+        json.dump(hierarchy.to_dict(), handle)
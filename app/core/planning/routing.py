@@ -0,0 +1,177 @@
+"""
+Visit ordering for a day's stops (small open-path TSP)
+"""
+
+from typing import List, Optional, Sequence
+import time
+
+# Smallest improvement accepted by local search, to avoid float churn
+_EPSILON = 1e-9
+
+# Routes up to this many nodes are solved exactly (Held-Karp) instead
+EXACT_MAX_NODES = 8
+
+
+def path_cost(cost: Sequence[Sequence[float]], path: Sequence[int]) -> float:
+    """Total cost of visiting ``path`` in order (no return leg)"""
+    return sum(cost[a][b] for a, b in zip(path, path[1:]))
+
+
+def nearest_neighbour(cost: Sequence[Sequence[float]], start: int) -> List[int]:
+    """Greedy path from ``start`` that always moves to the cheapest unvisited node"""
+    remaining = set(range(len(cost)))
+    remaining.discard(start)
+    path = [start]
+    while remaining:
+        current = path[-1]
+        nxt = min(remaining, key=lambda node: (cost[current][node], node))
+        path.append(nxt)
+        remaining.remove(nxt)
+    return path
+
+
+def held_karp(cost: Sequence[Sequence[float]], start: Optional[int]) -> List[int]:
+    """Optimal open path by dynamic programming over visited subsets; O(2^n n^2)"""
+    n = len(cost)
+    starts = [start] if start is not None else range(n)
+    # best[(mask, last)] = (cost, previous node)
+    best = {(1 << s, s): (0.0, None) for s in starts}
+    for mask in range(1, 1 << n):
+        for last in range(n):
+            entry = best.get((mask, last))
+            if entry is None:
+                continue
+            for nxt in range(n):
+                if mask & (1 << nxt):
+                    continue
+                key = (mask | (1 << nxt), nxt)
+                candidate = entry[0] + cost[last][nxt]
+                if key not in best or candidate < best[key][0] - _EPSILON:
+                    best[key] = (candidate, last)
+
+    full = (1 << n) - 1
+    last = min((node for node in range(n) if (full, node) in best), key=lambda node: best[(full, node)][0])
+    path = []
+    mask = full
+    while last is not None:
+        path.append(last)
+        previous = best[(mask, last)][1]
+        mask &= ~(1 << last)
+        last = previous
+    return path[::-1]
+
+
+def two_opt(cost: Sequence[Sequence[float]], path: List[int], first: int, deadline: float) -> bool:
+    """Reverse sub-paths that shorten the route; positions before ``first`` stay fixed.
+
+    Costs may be asymmetric (travel durations usually are), so the reversed
+    segment's internal cost is accumulated alongside the forward cost.
+    """
+    improved = False
+    n = len(path)
+    for i in range(first, n - 1):
+        forward = 0.0
+        backward = 0.0
+        for j in range(i + 1, n):
+            forward += cost[path[j - 1]][path[j]]
+            backward += cost[path[j]][path[j - 1]]
+            before = path[i - 1] if i > 0 else None
+            after = path[j + 1] if j + 1 < n else None
+            old = forward
+            new = backward
+            if before is not None:
+                old += cost[before][path[i]]
+                new += cost[before][path[j]]
+            if after is not None:
+                old += cost[path[j]][after]
+                new += cost[path[i]][after]
+            if new < old - _EPSILON:
+                path[i:j + 1] = path[i:j + 1][::-1]
+                improved = True
+                forward, backward = backward, forward
+            if time.perf_counter() > deadline:
+                return improved
+    return improved
+
+
+def or_opt(cost: Sequence[Sequence[float]], path: List[int], first: int, deadline: float, max_segment: int = 3) -> bool:
+    """Move runs of up to ``max_segment`` consecutive stops to a cheaper position"""
+    improved = False
+    n = len(path)
+    for length in range(1, max_segment + 1):
+        i = first
+        while i + length <= n:
+            segment = path[i:i + length]
+            prev = path[i - 1] if i > 0 else None
+            nxt = path[i + length] if i + length < n else None
+            removal_gain = 0.0
+            if prev is not None:
+                removal_gain += cost[prev][segment[0]]
+            if nxt is not None:
+                removal_gain += cost[segment[-1]][nxt]
+            if prev is not None and nxt is not None:
+                removal_gain -= cost[prev][nxt]
+
+            rest = path[:i] + path[i + length:]
+            best_delta = -_EPSILON
+            best_position = None
+            # Insert between rest[p - 1] and rest[p]
+            for p in range(first, len(rest) + 1):
+                if p == i:
+                    continue
+                left = rest[p - 1] if p > 0 else None
+                right = rest[p] if p < len(rest) else None
+                added = 0.0
+                if left is not None:
+                    added += cost[left][segment[0]]
+                if right is not None:
+                    added += cost[segment[-1]][right]
+                if left is not None and right is not None:
+                    added -= cost[left][right]
+                delta = added - removal_gain
+                if delta < best_delta:
+                    best_delta = delta
+                    best_position = p
+            if best_position is not None:
+                path[:] = rest[:best_position] + segment + rest[best_position:]
+                improved = True
+            else:
+                i += 1
+            if time.perf_counter() > deadline:
+                return improved
+    return improved
+
+
+def solve_route(
+    cost: Sequence[Sequence[float]],
+    start: Optional[int] = 0,
+    time_budget: float = 0.05,
+) -> List[int]:
+    """Order of all nodes minimising travel cost along an open path.
+
+    With ``start`` set (the base location) that node is visited first;
+    otherwise every node is tried as the starting point. Small routes are
+    solved exactly. Larger ones start from a nearest-neighbour path improved
+    with 2-opt and Or-opt moves until neither helps or ``time_budget``
+    seconds have passed.
+    """
+    n = len(cost)
+    if n <= 1:
+        return list(range(n))
+    if n <= EXACT_MAX_NODES:
+        return held_karp(cost, start)
+
+    deadline = time.perf_counter() + time_budget
+    if start is not None:
+        path = nearest_neighbour(cost, start)
+        first = 1
+    else:
+        path = min((nearest_neighbour(cost, s) for s in range(n)), key=lambda p: path_cost(cost, p))
+        first = 0
+
+    while time.perf_counter() <= deadline:
+        changed = two_opt(cost, path, first, deadline)
+        changed = or_opt(cost, path, first, deadline) or changed
+        if not changed:
+            break
+    return path
@@ -0,0 +1,68 @@
+"""
+Day scheduling: visit durations, opening windows and day overflow
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+# Days start at 09:00; times are minutes after midnight
+DAY_START_MINUTES = 9 * 60.0
+
+
+@dataclass(frozen=True)
+class Visit:
+    """A stop to schedule: how long it takes and when it is open"""
+    service_minutes: float
+    window: Optional[Tuple[float, float]] = None  # (opens, closes); closes may pass 1440 for late venues
+
+
+@dataclass(frozen=True)
+class ScheduledVisit:
+    arrival: float
+    start: float  # Arrival, or opening time when arriving early
+    departure: float
+    wait_minutes: float
+    late_minutes: float  # Visit time falling after closing (all of it when arriving after close)
+
+
+@dataclass(frozen=True)
+class DaySchedule:
+    visits: List[ScheduledVisit]
+    end: float
+    overflow_minutes: float  # Time past the end of the day
+
+    @property
+    def late_minutes(self) -> float:
+        return sum(visit.late_minutes for visit in self.visits)
+
+
+def schedule_day(
+    travel_minutes: Sequence[float],
+    visits: Sequence[Visit],
+    day_minutes: float,
+    day_start: float = DAY_START_MINUTES,
+) -> DaySchedule:
+    """Arrival and departure times for ``visits`` in order.
+
+    ``travel_minutes[i]`` is the drive into visit ``i`` (from the base or
+    the previous stop). The clock advances by travel, any wait for opening,
+    and the visit itself, so every stay delays the stops after it. Overflow
+    past ``day_start + day_minutes`` is reported rather than trimmed, so a
+    caller can move stops to another day and reschedule just those days.
+    """
+    clock = day_start
+    scheduled: List[ScheduledVisit] = []
+    for travel, visit in zip(travel_minutes, visits):
+        arrival = clock + (travel or 0.0)
+        start = arrival
+        late = 0.0
+        if visit.window is not None:
+            opens, closes = visit.window
+            start = max(arrival, opens)
+            late = min(visit.service_minutes, max(0.0, start + visit.service_minutes - closes))
+        clock = start + visit.service_minutes
+        scheduled.append(ScheduledVisit(arrival, start, clock, start - arrival, late))
+
+    overflow = max(0.0, clock - (day_start + day_minutes)) if scheduled else 0.0
+    return DaySchedule(scheduled, clock, overflow)
+
@@ -0,0 +1,235 @@
+"""
+Columnar attraction store used by the recommender
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+import hashlib
+import logging
+
+import numpy as np
+
+from ..geo import haversine_km_rad
+from .features import AttractionFeatures, extract_features, feature_matrix
+from .spatial import GeoGridIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATING = 3.0
+
+# SWAR popcount constants
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Count set bits per row of a (n, words) uint64 array"""
+    x = np.array(words, dtype=np.uint64, copy=True)
+    y = x >> np.uint64(1)
+    y &= _M1
+    x -= y
+    y = x >> np.uint64(2)
+    y &= _M2
+    x &= _M2
+    x += y
+    x += x >> np.uint64(4)
+    x &= _M4
+    x *= _H01
+    x >>= np.uint64(56)
+    if x.ndim == 1:
+        return x.astype(np.int64)
+    return x.sum(axis=1, dtype=np.int64)
+
+
+def _as_float(value: Any, default: float) -> float:
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return default
+    return result if np.isfinite(result) else default
+
+
+def _build_inverted_index(rows: Iterable[int], keys: Iterable[str]) -> Dict[str, np.ndarray]:
+    postings: Dict[str, List[int]] = {}
+    for row, key in zip(rows, keys):
+        postings.setdefault(key, []).append(row)
+    return {key: np.unique(np.asarray(values, dtype=np.int64)) for key, values in postings.items()}
+
+
+def stable_hash(value: str) -> int:
+    """64-bit hash of a string that is identical across processes and restarts"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _categories_of(attraction: Dict[str, Any]) -> List[str]:
+    categories = attraction.get('categories') or []
+    if isinstance(categories, str):
+        return [categories]
+    return [str(c) for c in categories]
+
+
+class AttractionCatalog:
+    """Immutable column-oriented view over a list of attraction dictionaries.
+
+    Built once per dataset load. Every per-attraction value the recommender
+    needs at request time lives in a NumPy array indexed by row, so distance
+    filtering and scoring run over the whole catalog in a few array operations
+    instead of a Python loop over dicts.
+    """
+
+    def __init__(self, attractions: Iterable[Dict[str, Any]]):
+        self.attractions: List[Dict[str, Any]] = list(attractions)
+        size = len(self.attractions)
+
+        self.ids: List[str] = [str(a.get('id')) for a in self.attractions]
+        self._rows_by_id: Dict[str, List[int]] = {}
+        for row, attraction_id in enumerate(self.ids):
+            self._rows_by_id.setdefault(attraction_id, []).append(row)
+        # Keys for per-attraction deterministic noise, independent of row order
+        self.id_hashes = np.fromiter((stable_hash(i) for i in self.ids), dtype=np.uint64, count=size)
+
+        lat = np.full(size, np.nan, dtype=np.float64)
+        lng = np.full(size, np.nan, dtype=np.float64)
+        rating = np.full(size, DEFAULT_RATING, dtype=np.float64)
+        review_count = np.zeros(size, dtype=np.float64)
+
+        self.category_bits: Dict[str, int] = {}
+        self._category_names: List[str] = []
+        bit_rows: List[int] = []
+        bit_positions: List[int] = []
+        self.features: List[AttractionFeatures] = []
+
+        for row, attraction in enumerate(self.attractions):
+            location = attraction.get('location') or {}
+            if isinstance(location, dict):
+                lat[row] = _as_float(location.get('lat'), np.nan)
+                lng[row] = _as_float(location.get('lng'), np.nan)
+
+            raw_rating = attraction.get('rating')
+            if isinstance(raw_rating, dict):
+                raw_rating = raw_rating.get('average')
+            rating[row] = _as_float(raw_rating, DEFAULT_RATING)
+            review_count[row] = _as_float(attraction.get('review_count'), 0.0)
+
+            categories = _categories_of(attraction)
+            self.features.append(extract_features(attraction, categories))
+            for category in categories:
+                bit = self.category_bits.setdefault(category, len(self.category_bits))
+                if bit == len(self._category_names):
+                    self._category_names.append(category)
+                bit_rows.append(row)
+                bit_positions.append(bit)
+
+        self.has_location = ~(np.isnan(lat) | np.isnan(lng))
+        self.lat_rad = np.radians(lat)
+        self.lng_rad = np.radians(lng)
+        self.cos_lat = np.cos(self.lat_rad)  # Reused by every distance computation
+        self.rating = rating
+        self.review_count = review_count
+        self.spatial_index = GeoGridIndex(self.lat_rad, self.lng_rad)
+
+        # Static score terms that do not depend on the request
+        self.rating_norm = rating / 5.0
+        self.popularity = np.minimum(review_count / 1000.0, 1.0)
+        self.feature_matrix = feature_matrix(self.features, self.rating_norm, self.popularity)
+
+        self.mask_words = max(1, -(-len(self.category_bits) // 64))
+        self.category_mask = np.zeros((size, self.mask_words), dtype=np.uint64)
+        if bit_rows:
+            positions = np.asarray(bit_positions, dtype=np.int64)
+            values = np.left_shift(np.uint64(1), (positions % 64).astype(np.uint64))
+            np.bitwise_or.at(self.category_mask, (np.asarray(bit_rows), positions // 64), values)
+
+        # Inverted indexes: category / region -> sorted row array
+        self.category_index = _build_inverted_index(bit_rows, [self._category_names[b] for b in bit_positions])
+        self._categories_by_lower: Dict[str, List[str]] = {}
+        for category in self.category_index:
+            self._categories_by_lower.setdefault(category.lower(), []).append(category)
+        regions = [str(a.get('region') or '').lower() for a in self.attractions]
+        self.region_index = _build_inverted_index(range(size), regions)
+
+        for array in (
+            self.id_hashes, self.has_location, self.lat_rad, self.lng_rad, self.cos_lat, self.rating, self.review_count,
+            self.rating_norm, self.popularity, self.feature_matrix, self.category_mask,
+            *self.category_index.values(), *self.region_index.values(),
+        ):
+            array.setflags(write=False)
+
+        logger.info(
+            f"AttractionCatalog built: {size} attractions, {len(self.category_bits)} categories"
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row_for_id(self, attraction_id: str) -> Optional[int]:
+        """Row of the first attraction with this id"""
+        rows = self._rows_by_id.get(str(attraction_id))
+        return rows[0] if rows else None
+
+    def get(self, attraction_id: str) -> Optional[Dict[str, Any]]:
+        """Attraction dict for an id in O(1), or None"""
+        row = self.row_for_id(attraction_id)
+        return self.attractions[row] if row is not None else None
+
+    def rows_for_ids(self, attraction_ids: Optional[Iterable[str]]) -> np.ndarray:
+        """Row indices of every attraction whose id is in ``attraction_ids``"""
+        rows: List[int] = []
+        for attraction_id in attraction_ids or []:
+            rows.extend(self._rows_by_id.get(str(attraction_id), ()))
+        return np.asarray(rows, dtype=np.int64)
+
+    def available_mask(self, exclude_ids: Optional[Iterable[str]] = None) -> np.ndarray:
+        """Boolean row mask with excluded attraction ids switched off"""
+        mask = np.ones(len(self), dtype=bool)
+        excluded = self.rows_for_ids(exclude_ids)
+        if excluded.size:
+            mask[excluded] = False
+        return mask
+
+    def distances_from(self, lat: float, lng: float, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Haversine distance (km) from a point to each row; NaN where location is unknown"""
+        lat_rad = self.lat_rad if rows is None else self.lat_rad[rows]
+        lng_rad = self.lng_rad if rows is None else self.lng_rad[rows]
+        cos_lat = self.cos_lat if rows is None else self.cos_lat[rows]
+        return haversine_km_rad(lat_rad, lng_rad, np.radians(lat), np.radians(lng), cos_lat=cos_lat)
+
+    def within_radius(self, lat: float, lng: float, radius_km: float):
+        """Rows within ``radius_km`` of a point and their distances, via the spatial index"""
+        return self.spatial_index.query_radius(lat, lng, radius_km)
+
+    def category_query_mask(self, categories: Iterable[str]) -> np.ndarray:
+        """Bitmask of the known categories in ``categories``"""
+        query = np.zeros(self.mask_words, dtype=np.uint64)
+        for category in categories or []:
+            bit = self.category_bits.get(category)
+            if bit is not None:
+                query[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return query
+
+    def rows_with_category(self, category: str, ignore_case: bool = False) -> np.ndarray:
+        """Sorted rows carrying ``category``"""
+        names = self._categories_by_lower.get(category.lower(), []) if ignore_case else [category]
+        return self.rows_with_any_category(names)
+
+    def rows_with_any_category(self, categories: Iterable[str]) -> np.ndarray:
+        """Sorted rows carrying at least one of ``categories`` (union of postings)"""
+        postings = [self.category_index[c] for c in categories or [] if c in self.category_index]
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+        if len(postings) == 1:
+            return postings[0]
+        return np.unique(np.concatenate(postings))
+
+    def rows_in_region(self, region: str) -> np.ndarray:
+        """Sorted rows whose region matches ``region`` case-insensitively"""
+        return self.region_index.get(region.lower(), np.zeros(0, dtype=np.int64))
+
+    def matches_any_category(self, rows: np.ndarray, query_mask: np.ndarray) -> np.ndarray:
+        """Whether each row shares at least one category with the query bitmask"""
+        return (self.category_mask[rows] & query_mask).any(axis=1)
+
+    def category_overlap(self, rows: np.ndarray, query_mask: np.ndarray) -> np.ndarray:
+        """Number of query categories each row carries (popcount of the bitmask AND)"""
+        return popcount(self.category_mask[rows] & query_mask)
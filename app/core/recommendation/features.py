@@ -0,0 +1,182 @@
+"""
+Static attraction features materialized once at catalog load
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import re
+
+import numpy as np
+
+DEFAULT_PRICE_LEVEL = 3
+FULL_DAY_MINUTES = 480.0
+HALF_DAY_MINUTES = 240.0
+
+# Categorical durations, only for records that say so literally (e.g. "full_day")
+DURATION_FULL_DAY = 'full_day'
+DURATION_HALF_DAY = 'half_day'
+
+# Column order of AttractionCatalog.feature_matrix; NaN marks a missing value
+FEATURE_NAMES: Tuple[str, ...] = (
+    'rating_norm',
+    'popularity',
+    'price_level',
+    'duration_minutes',
+    'is_outdoor',
+)
+
+_DURATION_PATTERN = re.compile(
+    r'(\d+(?:\.\d+)?)\s*(?:-|–|to)?\s*(\d+(?:\.\d+)?)?\s*(hours?|hrs?|h|minutes?|mins?|m)\b'
+)
+
+
+def parse_duration(text: Any) -> Optional[float]:
+    """Minutes for strings like "2-3 hours", "90 minutes" or "full_day" (range midpoint)"""
+    if not isinstance(text, str):
+        return None
+    value = text.strip().lower()
+    if not value:
+        return None
+    if 'full' in value and 'day' in value:
+        return FULL_DAY_MINUTES
+    if 'half' in value and 'day' in value:
+        return HALF_DAY_MINUTES
+
+    match = _DURATION_PATTERN.search(value)
+    if not match:
+        return None
+    low = float(match.group(1))
+    high = float(match.group(2)) if match.group(2) else low
+    minutes = (low + high) / 2.0
+    if match.group(3).startswith('h'):
+        minutes *= 60.0
+    return minutes
+
+
+def duration_kind(text: Any) -> Optional[str]:
+    """``DURATION_FULL_DAY`` / ``DURATION_HALF_DAY`` for "full_day" / "half_day" records, else None.
+
+    Kept apart from ``parse_duration`` so "8 hours" or "3-5 hours" are never
+    labelled full- or half-day just because their minutes match.
+    """
+    if not isinstance(text, str):
+        return None
+    value = text.lower()
+    if DURATION_FULL_DAY in value:
+        return DURATION_FULL_DAY
+    if DURATION_HALF_DAY in value:
+        return DURATION_HALF_DAY
+    return None
+
+
+_CLOCK_PATTERN = re.compile(r'(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?')
+
+
+def _clock_minutes(text: str) -> Optional[float]:
+    match = _CLOCK_PATTERN.fullmatch(text.strip().lower())
+    if not match:
+        return None
+    hours = int(match.group(1))
+    minutes = int(match.group(2) or 0)
+    suffix = match.group(3)
+    if suffix == 'pm' and hours < 12:
+        hours += 12
+    elif suffix == 'am' and hours == 12:
+        hours = 0
+    if hours > 24 or minutes >= 60:
+        return None
+    return hours * 60.0 + minutes
+
+
+def parse_opening_hours(value: Any) -> Optional[Tuple[float, float]]:
+    """(opens, closes) in minutes after midnight for "09:00-17:00", "9am - 5pm" or {"open", "close"}.
+
+    None means no restriction (unknown or always open). Venues closing after
+    midnight get a closing time past 1440.
+    """
+    if isinstance(value, dict):
+        opens, closes = value.get('open'), value.get('close')
+    elif isinstance(value, str):
+        if any(word in value.lower() for word in ('24', 'always')) and ':' not in value:
+            return None
+        parts = re.split(r'\s*(?:-|–|to)\s*', value.strip(), maxsplit=1)
+        if len(parts) != 2:
+            return None
+        opens, closes = parts
+    else:
+        return None
+    if not isinstance(opens, str) or not isinstance(closes, str):
+        return None
+
+    open_minutes = _clock_minutes(opens)
+    close_minutes = _clock_minutes(closes)
+    if open_minutes is None or close_minutes is None:
+        return None
+    if close_minutes <= open_minutes:
+        close_minutes += 1440.0
+    return open_minutes, close_minutes
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+@dataclass(frozen=True)
+class AttractionFeatures:
+    """Per-attraction values derived from the raw record, shared by every request"""
+    primary_category: Optional[str]
+    price_level: Optional[float]
+    price_range: List[float]  # Range quoted with recommendations
+    display_price_range: Optional[List[float]]  # Range shown by /api/attractions
+    estimated_duration: Optional[str]
+    duration_minutes: Optional[float]
+    duration_kind: Optional[str]  # DURATION_FULL_DAY, DURATION_HALF_DAY or None
+    is_outdoor: Optional[bool]
+    opening_window: Optional[Tuple[float, float]]  # Minutes after midnight
+
+
+def extract_features(attraction: Dict[str, Any], categories: List[str]) -> AttractionFeatures:
+    """Derive the static features of one attraction record"""
+    raw_features = attraction.get('features')
+    raw_features = raw_features if isinstance(raw_features, dict) else {}
+
+    raw_level = raw_features.get('price_level')
+    price_level = float(raw_level) if _is_number(raw_level) else None
+    base_price = 50 * (raw_level if _is_number(raw_level) else DEFAULT_PRICE_LEVEL)
+
+    display_price_range = attraction.get('price_range') or None
+    if display_price_range is None and isinstance(raw_level, int) and not isinstance(raw_level, bool):
+        base = max(raw_level * 40, 40)
+        display_price_range = [base, base + 120]
+
+    is_outdoor = raw_features.get('is_outdoor')
+    estimated_duration = attraction.get('estimated_duration')
+
+    return AttractionFeatures(
+        primary_category=categories[0] if categories else None,
+        price_level=price_level,
+        price_range=[base_price, base_price * 2],
+        display_price_range=display_price_range,
+        estimated_duration=estimated_duration if isinstance(estimated_duration, str) else None,
+        duration_minutes=parse_duration(estimated_duration),
+        duration_kind=duration_kind(estimated_duration),
+        is_outdoor=bool(is_outdoor) if isinstance(is_outdoor, bool) else None,
+        opening_window=parse_opening_hours(attraction.get('opening_hours')),
+    )
+
+
+def feature_matrix(
+    features: List[AttractionFeatures], rating_norm: np.ndarray, popularity: np.ndarray
+) -> np.ndarray:
+    """Stack the numeric features into an (n, len(FEATURE_NAMES)) float matrix"""
+    matrix = np.full((len(features), len(FEATURE_NAMES)), np.nan, dtype=np.float64)
+    matrix[:, 0] = rating_norm
+    matrix[:, 1] = popularity
+    for row, item in enumerate(features):
+        if item.price_level is not None:
+            matrix[row, 2] = item.price_level
+        if item.duration_minutes is not None:
+            matrix[row, 3] = item.duration_minutes
+        if item.is_outdoor is not None:
+            matrix[row, 4] = float(item.is_outdoor)
+    return matrix
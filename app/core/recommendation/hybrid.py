@@ -1,23 +1,156 @@
-from typing import List, Dict, Any, Tuple
-import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Tuple, Optional
+import asyncio
+import json
 import logging
 import math
 
+import numpy as np
+
+from .catalog import AttractionCatalog, popcount, stable_hash
+
 logger = logging.getLogger(__name__)
 
+# Variety modes for the random score term
+VARIETY_SEEDED = 'seeded'  # Noise fixed per (user, UTC day, request)
+VARIETY_RANDOM = 'random'  # Fresh noise on every call
+VARIETY_OFF = 'off'        # No noise; rankings depend on the request only
+VARIETY_MODES = (VARIETY_SEEDED, VARIETY_RANDOM, VARIETY_OFF)
+
+_MASK64 = (1 << 64) - 1
+
+
+def variety_seed(
+    user_id: str,
+    preferences: Dict[str, Any],
+    current_location: Optional[Dict[str, Any]] = None,
+    exclude_visited: Optional[List[str]] = None,
+    top_k: int = 6,
+    day: Optional[str] = None,
+) -> int:
+    """Seed for the variety term, stable for the same request on the same UTC day"""
+    if day is None:
+        day = datetime.now(timezone.utc).date().isoformat()
+    location = None
+    if current_location:
+        location = [current_location.get('lat'), current_location.get('lng')]
+    request = json.dumps(
+        [preferences, location, sorted(str(i) for i in exclude_visited or []), top_k],
+        sort_keys=True,
+        default=str,
+    )
+    return stable_hash(f"{user_id}|{day}|{request}")
+
+
+def seeded_noise(keys: np.ndarray, seed) -> np.ndarray:
+    """Uniform [0, 1) values from a counter-based hash (splitmix64) of ``keys`` and ``seed``.
+
+    ``seed`` may be an int or an array broadcasting against ``keys``.
+    """
+    if isinstance(seed, int):
+        seed = seed & _MASK64
+    x = keys.astype(np.uint64) ^ np.asarray(seed, dtype=np.uint64)
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+@dataclass(frozen=True)
+class RecommendationCandidate:
+    """One scored attraction, local to a single recommend call"""
+    attraction_id: str
+    row: int
+    score: float
+    distance_km: Optional[float] = None
+
+
+@dataclass
+class _Segment:
+    """One batched request's candidate rows and the inputs to score them"""
+    index: int  # Position in the batch
+    rows: np.ndarray
+    distances: Optional[np.ndarray]  # Set when the rows came from a radius query
+    max_distance: Optional[float]
+    preferences: Dict[str, Any]
+    top_k: int
+    seed: Optional[int]
+
+
+class _ScoringState:
+    """Catalog plus the request-independent arrays derived from it.
+
+    Built once per load and never mutated afterwards, so concurrent requests
+    can share it without locks and a reload swaps it in one assignment.
+    """
+
+    def __init__(self, catalog: AttractionCatalog, static_scores: np.ndarray):
+        self.catalog = catalog
+        self.static_scores = static_scores
+        # Rows by descending static score, so catalog-wide top-k can stop early
+        self.static_order = np.argsort(-static_scores, kind='stable')
+        self.static_sorted = static_scores[self.static_order]
+        # Category postings expressed as sorted positions in static order
+        rank = np.empty(len(catalog), dtype=np.int64)
+        rank[self.static_order] = np.arange(len(catalog))
+        self.category_ranks = {
+            category: np.sort(rank[rows]) for category, rows in catalog.category_index.items()
+        }
+        for array in (self.static_scores, self.static_order, self.static_sorted, *self.category_ranks.values()):
+            array.setflags(write=False)
+
+
 class HybridRecommender:
-    def __init__(self):
+    # Score weights
+    BASE_SCORE = 0.15  # Base score for all attractions
+    CATEGORY_WEIGHT = 0.30
+    CATEGORY_MISS_BONUS = 0.08  # Small bonus for non-matching but potentially interesting
+    RATING_WEIGHT = 0.25
+    POPULARITY_WEIGHT = 0.15
+    DISTANCE_WEIGHT = 0.15
+    RANDOM_WEIGHT = 0.15
+    MIN_SCORE = 0.1  # Lower threshold for more variety
+
+    # Upper-bound pruning: catalog-wide requests score blocks of at least this
+    # many times top_k, stopping once no remaining row can reach the top k
+    PRUNING_FACTOR = 4
+    PRUNING_MIN_CANDIDATES = 256
+
+    # Upper bound on candidate rows (summed over requests) scored at once by recommend_batch
+    BATCH_MAX_ELEMENTS = 1 << 22
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config or {}
+        self.pruning = self.config.get('pruning', True)
+        self.variety_mode = self.config.get('variety_mode', VARIETY_SEEDED)
+        if self.variety_mode not in VARIETY_MODES:
+            raise ValueError(f"Unknown variety_mode {self.variety_mode!r}, expected one of {VARIETY_MODES}")
         self._attractions = []
+        self._state: Optional[_ScoringState] = None
         self._initialized = False
 
-    async def load_data(self, attractions: List[Dict[str, Any]]):
-        """Load attractions data"""
-        self._attractions = attractions
+    async def load_data(self, attractions: List[Dict[str, Any]], catalog: Optional[AttractionCatalog] = None):
+        """Load attractions data, building the columnar catalog unless one is supplied"""
+        if catalog is None:
+            catalog = AttractionCatalog(attractions)
+        static_scores = (
+            self.BASE_SCORE
+            + self.RATING_WEIGHT * catalog.rating_norm
+            + self.POPULARITY_WEIGHT * catalog.popularity
+        )
+        self._state = _ScoringState(catalog, static_scores)
+        self._attractions = catalog.attractions
         self._initialized = True
         logger.info(f"HybridRecommender loaded {len(attractions)} attractions")
 
+    @property
+    def catalog(self) -> Optional[AttractionCatalog]:
+        return self._state.catalog if self._state else None
+
     async def recommend(
-        self, 
+        self,
         user_id: str,
         preferences: Dict[str, Any],
         current_location: Dict[str, Any] = None,
@@ -26,120 +159,437 @@ class HybridRecommender:
         **kwargs
     ) -> List[Tuple[str, float]]:
         """Generate recommendations with distance filtering"""
+        candidates = await self.recommend_candidates(
+            user_id, preferences, current_location, exclude_visited, top_k, **kwargs
+        )
+        return [(c.attraction_id, c.score) for c in candidates]
+
+    async def recommend_candidates(
+        self,
+        user_id: str,
+        preferences: Dict[str, Any],
+        current_location: Dict[str, Any] = None,
+        exclude_visited: List[str] = None,
+        top_k: int = 6,
+        **kwargs
+    ) -> List[RecommendationCandidate]:
+        """Generate recommendations carrying their catalog row and distance from the user.
+
+        Pass ``distance_origin`` when ``current_location`` is only where to
+        score from (e.g. a geocell centre): candidate distances are then
+        measured from that exact point instead.
+        """
         if not self._initialized:
             logger.warning("HybridRecommender not initialized")
             return []
 
-        # Filter out visited attractions
-        available_attractions = [
-            a for a in self._attractions 
-            if str(a['id']) not in (exclude_visited or [])
-        ]
+        # Everything below reads this snapshot only, never shared mutable state
+        state = self._state
+        origin = kwargs.get('distance_origin')
+        seed = self._resolve_seed(
+            user_id, preferences, current_location, exclude_visited, top_k, kwargs.get('seed')
+        )
+        catalog = state.catalog
+        excluded = catalog.rows_for_ids(exclude_visited)
+        candidates = None
+        distances = None
 
-        if not available_attractions:
-            logger.warning("No available attractions after filtering")
-            return []
+        max_distance = preferences.get('max_travel_distance', 50)
+        nearby = self._radius_candidates(catalog, preferences, current_location, excluded)
+        if nearby is not None:
+            candidates, distances = nearby
+
+        if candidates is None:
+            # Filter out visited attractions
+            if len(np.unique(excluded)) >= len(catalog):
+                logger.warning("No available attractions after filtering")
+                return []
+            if self.pruning:
+                rows, scores = self._top_k_catalog_wide(state, excluded, preferences, top_k, seed)
+                logger.info(f"Generated {len(rows)} recommendations from the full catalog")
+                return self._build_candidates(state, rows, scores, None, origin or current_location)
+            candidates = np.flatnonzero(catalog.available_mask(exclude_visited))
 
-        # Apply distance filter (default 50km if not specified)
+        # Score candidates and keep the top k
+        positions, scores = self._top_k(state, candidates, preferences, distances, max_distance, top_k, seed)
+        result = self._build_candidates(
+            state,
+            candidates[positions],
+            scores,
+            distances[positions] if distances is not None and origin is None else None,
+            origin or current_location,
+        )
+
+        logger.info(f"Generated {len(result)} recommendations from {len(candidates)} available attractions")
+        return result
+
+    def _resolve_seed(
+        self,
+        user_id: str,
+        preferences: Dict[str, Any],
+        current_location: Optional[Dict[str, Any]],
+        exclude_visited: Optional[List[str]],
+        top_k: int,
+        seed: Optional[int],
+    ) -> Optional[int]:
+        """Seed for the variety term; an explicit ``seed`` pins it in seeded and random modes"""
+        if seed is None and self.variety_mode == VARIETY_SEEDED:
+            seed = variety_seed(user_id, preferences, current_location, exclude_visited, top_k)
+        return seed
+
+    @staticmethod
+    def _radius_candidates(
+        catalog: AttractionCatalog,
+        preferences: Dict[str, Any],
+        current_location: Optional[Dict[str, Any]],
+        excluded: np.ndarray,
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Unvisited rows within ``max_travel_distance`` (default 50km) and their distances, via the spatial index.
+
+        ``None`` when the request has no location or radius, or nothing is in
+        range: the caller then falls back to the whole catalog.
+        """
         max_distance = preferences.get('max_travel_distance', 50)
-        if current_location and max_distance:
-            filtered = self._filter_by_distance(
-                available_attractions, current_location, max_distance
+        if not (current_location and max_distance):
+            return None
+        rows, distances = catalog.within_radius(current_location['lat'], current_location['lng'], max_distance)
+        if excluded.size:
+            keep = ~np.isin(rows, excluded)
+            rows, distances = rows[keep], distances[keep]
+        logger.info(f"After distance filtering ({max_distance}km): {len(rows)} attractions")
+        if not len(rows):
+            logger.info("No attractions found within %.1f km; falling back to broader list", max_distance)
+            return None
+        return rows, distances
+
+    async def recommend_batch(self, requests: List[Dict[str, Any]]) -> List[List[RecommendationCandidate]]:
+        """Recommendations for many requests, scored together in one pass over their candidate rows.
+
+        Each request is a dict of ``recommend_candidates`` keyword arguments
+        (``user_id``, ``preferences``, ``current_location``, ``exclude_visited``,
+        ``top_k`` and optionally ``seed`` and ``distance_origin``); results come
+        back in the same order and match what ``recommend_candidates`` returns
+        for each request. Scoring runs in a worker thread.
+        """
+        if not self._initialized:
+            logger.warning("HybridRecommender not initialized")
+            return [[] for _ in requests]
+
+        results = await asyncio.to_thread(self._recommend_batch_sync, self._state, requests)
+        logger.info(f"Generated batch recommendations for {len(requests)} requests")
+        return results
+
+    def _recommend_batch_sync(
+        self, state: _ScoringState, requests: List[Dict[str, Any]]
+    ) -> List[List[RecommendationCandidate]]:
+        """Candidate rows per request, then every request's rows scored as one flat array.
+
+        Requests with a radius score only the rows the spatial index returns
+        for them; unbounded ones take the pruned catalog-wide top-k, exactly
+        as ``recommend_candidates`` does. The flat arrays are scored in chunks
+        of at most ``BATCH_MAX_ELEMENTS`` rows.
+        """
+        catalog = state.catalog
+        results: List[List[RecommendationCandidate]] = [[] for _ in requests]
+        segments: List[_Segment] = []
+        for i, request in enumerate(requests):
+            preferences = request.get('preferences') or {}
+            location = request.get('current_location')
+            top_k = int(request.get('top_k', 6))
+            if top_k <= 0:
+                continue
+            excluded = catalog.rows_for_ids(request.get('exclude_visited'))
+            seed = self._resolve_seed(
+                request.get('user_id', ''), preferences, location, request.get('exclude_visited'), top_k,
+                request.get('seed'),
             )
-            logger.info(f"After distance filtering ({max_distance}km): {len(filtered)} attractions")
-            if filtered:
-                available_attractions = filtered
+            nearby = self._radius_candidates(catalog, preferences, location, excluded)
+            if nearby is not None:
+                rows, distances = nearby
+                max_distance = preferences.get('max_travel_distance', 50)
+            elif len(np.unique(excluded)) >= len(catalog):
+                continue
+            elif self.pruning:
+                rows, scores = self._top_k_catalog_wide(state, excluded, preferences, top_k, seed)
+                origin = request.get('distance_origin') or location
+                results[i] = self._build_candidates(state, rows, scores, None, origin)
+                continue
             else:
-                logger.info("No attractions found within %.1f km; falling back to broader list", max_distance)
-        if not available_attractions:
-            logger.warning("No attractions available after distance fallback")
-            return []
+                rows = np.flatnonzero(catalog.available_mask(request.get('exclude_visited')))
+                distances, max_distance = None, None
+            segments.append(_Segment(i, rows, distances, max_distance, preferences, top_k, seed))
+
+        chunk: List[_Segment] = []
+        size = 0
+        for segment in segments:
+            if chunk and size + len(segment.rows) > self.BATCH_MAX_ELEMENTS:
+                self._score_segments(state, chunk, requests, results)
+                chunk, size = [], 0
+            chunk.append(segment)
+            size += len(segment.rows)
+        if chunk:
+            self._score_segments(state, chunk, requests, results)
+        return results
+
+    def _score_segments(
+        self,
+        state: _ScoringState,
+        segments: List['_Segment'],
+        requests: List[Dict[str, Any]],
+        results: List[List[RecommendationCandidate]],
+    ) -> None:
+        """Score the concatenated candidate rows of several requests with ``_top_k``'s arithmetic"""
+        catalog = state.catalog
+        lengths = np.array([len(segment.rows) for segment in segments])
+        owner = np.repeat(np.arange(len(segments)), lengths)
+        bounds = np.concatenate([[0], np.cumsum(lengths)])
+        rows = np.concatenate([segment.rows for segment in segments])
+
+        # Same term order as _partial_scores + _complete_scores, so scores match single requests exactly
+        scores = state.static_scores[rows]
+        in_radius = np.zeros(len(rows), dtype=bool)
+        distance_score = np.zeros(len(rows))
+        for j, segment in enumerate(segments):
+            if segment.distances is not None and segment.max_distance:
+                in_radius[bounds[j]:bounds[j + 1]] = True
+                distance_score[bounds[j]:bounds[j + 1]] = np.nan_to_num(
+                    np.clip(1.0 - segment.distances / segment.max_distance, 0.0, None)
+                )
+        if in_radius.any():
+            scores = np.where(in_radius, scores + self.DISTANCE_WEIGHT * distance_score, scores)
+
+        # Category matching: popcount of each row's bitmask AND its own request's query mask
+        activity_types = [segment.preferences.get('activity_types', []) or [] for segment in segments]
+        query_masks = np.stack([catalog.category_query_mask(types) for types in activity_types])
+        overlap = popcount(catalog.category_mask[rows] & query_masks[owner])
+        type_counts = np.array([max(len(types), 1) for types in activity_types], dtype=np.float64)[owner]
+        category_score = np.where(
+            overlap > 0,
+            self.CATEGORY_WEIGHT * np.minimum(overlap / type_counts, 1.0),
+            self.CATEGORY_MISS_BONUS,
+        )
+        has_types = np.array([bool(types) for types in activity_types])[owner]
+        scores = scores + np.where(has_types, category_score, self.CATEGORY_WEIGHT)
 
-        # Calculate scores for all attractions within distance
-        matched_attractions = []
-        
-        for attraction in available_attractions:
-            base_score = self._calculate_base_score(attraction, preferences, current_location)
-            if base_score >= 0.1:  # Lower threshold for more variety
-                matched_attractions.append((str(attraction['id']), base_score))
-
-        # Sort and return top k results
-        matched_attractions.sort(key=lambda x: x[1], reverse=True)
-        result = matched_attractions[:top_k]
-        
-        logger.info(f"Generated {len(result)} recommendations from {len(available_attractions)} available attractions")
+        # Variety term, seeded per request
+        if self.variety_mode != VARIETY_OFF:
+            seeded = np.array([segment.seed is not None for segment in segments])
+            seeds = np.array([(segment.seed or 0) & _MASK64 for segment in segments], dtype=np.uint64)
+            noise = seeded_noise(catalog.id_hashes[rows], seeds[owner])
+            for j in np.flatnonzero(~seeded):
+                noise[bounds[j]:bounds[j + 1]] = np.random.random(lengths[j])
+            scores = scores + self.RANDOM_WEIGHT * noise
+        scores = np.minimum(scores, 1.0)
+
+        for j, segment in enumerate(segments):
+            segment_rows = rows[bounds[j]:bounds[j + 1]]
+            segment_scores = scores[bounds[j]:bounds[j + 1]]
+            positions = np.flatnonzero(segment_scores >= self.MIN_SCORE)
+            best = positions[
+                self._select_top_k(segment_scores[positions], segment.top_k, tiebreak=segment_rows[positions])
+            ]
+            request = requests[segment.index]
+            origin = request.get('distance_origin')
+            results[segment.index] = self._build_candidates(
+                state,
+                segment_rows[best],
+                segment_scores[best],
+                segment.distances[best] if segment.distances is not None and origin is None else None,
+                origin or request.get('current_location'),
+            )
+
+    @staticmethod
+    def _build_candidates(
+        state: _ScoringState,
+        rows: np.ndarray,
+        scores: np.ndarray,
+        distances: Optional[np.ndarray],
+        current_location: Optional[Dict[str, Any]],
+    ) -> List[RecommendationCandidate]:
+        """Attach ids and user distances to the selected rows"""
+        if distances is None and current_location and len(rows):
+            distances = state.catalog.distances_from(current_location['lat'], current_location['lng'], rows)
+        result = []
+        for i, row in enumerate(rows):
+            distance = float(distances[i]) if distances is not None else None
+            result.append(RecommendationCandidate(
+                attraction_id=state.catalog.ids[row],
+                row=int(row),
+                score=float(scores[i]),
+                distance_km=distance if distance is not None and not math.isnan(distance) else None,
+            ))
         return result
-    
-    def _filter_by_distance(self, attractions: List[Dict[str, Any]], user_location: Dict[str, Any], max_distance: float) -> List[Dict[str, Any]]:
-        """Filter attractions by distance from user location"""
-        filtered = []
-        
-        for attraction in attractions:
-            distance = self._calculate_distance(attraction, user_location)
-            if distance is not None and distance <= max_distance:
-                # Store distance in attraction for later use
-                attraction['_calculated_distance'] = distance
-                filtered.append(attraction)
-        
-        return filtered
-    
-    def _calculate_base_score(self, attraction: Dict[str, Any], preferences: Dict[str, Any], user_location: Dict[str, Any] = None) -> float:
-        """Calculate base score for an attraction"""
-        score = 0.15  # Base score for all attractions
-        
+
+    def _top_k_catalog_wide(
+        self,
+        state: _ScoringState,
+        excluded: np.ndarray,
+        preferences: Dict[str, Any],
+        top_k: int,
+        seed: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k over the whole catalog without a distance term.
+
+        Without distances a candidate's best possible score is its static score
+        plus the category and variety terms. Rows matching an activity type
+        (found through the inverted category index) and the remaining rows are
+        walked as two streams in precomputed static order, in blocks of doubling
+        size. Each stream stops once its next row cannot beat the current k-th
+        best; non-matching rows can gain at most the small miss bonus, so that
+        stream usually stops early.
+        """
+        if top_k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        catalog = state.catalog
+        order = state.static_order
+        size = len(order)
+
+        activity_types = preferences.get('activity_types', [])
+        query_categories = [c for c in dict.fromkeys(activity_types or []) if c in state.category_ranks]
+        query_mask = catalog.category_query_mask(query_categories)
+        noise_slack = 0.0 if self.variety_mode == VARIETY_OFF else self.RANDOM_WEIGHT
+        matched_slack = self.CATEGORY_WEIGHT + noise_slack
+        other_slack = (self.CATEGORY_MISS_BONUS if activity_types else self.CATEGORY_WEIGHT) + noise_slack
+
+        rows = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0)
+        threshold = self.MIN_SCORE - 1e-12
+        matched_start = 0 if query_categories else size
+        other_start = 0
+        block = max(top_k * self.PRUNING_FACTOR, self.PRUNING_MIN_CANDIDATES)
+        while True:
+            chunks = []
+            if matched_start < size and state.static_sorted[matched_start] + matched_slack > threshold:
+                end = matched_start + block
+                chunks.append(order[self._matched_ranks(state, query_categories, matched_start, end)])
+                matched_start = end
+            if other_start < size and state.static_sorted[other_start] + other_slack > threshold:
+                chunk = order[other_start:other_start + block]
+                if query_categories:
+                    chunk = chunk[~catalog.matches_any_category(chunk, query_mask)]
+                chunks.append(chunk)
+                other_start += block
+            if not chunks:
+                break
+
+            chunk = np.concatenate(chunks)
+            if len(excluded):
+                chunk = chunk[~np.isin(chunk, excluded)]
+            rows = np.concatenate([rows, chunk])
+            scores = np.concatenate(
+                [scores, self._complete_scores(state, chunk, state.static_scores[chunk], preferences, seed)]
+            )
+            threshold = self._kth_best(scores, top_k)
+            block *= 2
+        logger.debug(f"Top-k pruning scored {len(rows)} of {size} attractions")
+
+        keep = scores >= self.MIN_SCORE
+        rows, scores = rows[keep], scores[keep]
+        best = self._select_top_k(scores, top_k, tiebreak=rows)
+        return rows[best], scores[best]
+
+    @staticmethod
+    def _matched_ranks(state: _ScoringState, categories: List[str], start: int, end: int) -> np.ndarray:
+        """Static-order positions in [start, end) of rows carrying any of ``categories``"""
+        spans = []
+        for category in categories:
+            ranks = state.category_ranks[category]
+            lo, hi = np.searchsorted(ranks, [start, end], side='left')
+            spans.append(ranks[lo:hi])
+        if len(spans) == 1:
+            return spans[0]
+        return np.unique(np.concatenate(spans))
+
+    def _kth_best(self, scores: np.ndarray, top_k: int) -> float:
+        """Score a candidate must exceed to enter the top k, given the scores seen so far"""
+        qualified = scores[scores >= self.MIN_SCORE]
+        if len(qualified) < top_k:
+            return self.MIN_SCORE - 1e-12
+        return float(np.partition(qualified, len(qualified) - top_k)[len(qualified) - top_k])
+
+    def _top_k(
+        self,
+        state: _ScoringState,
+        rows: np.ndarray,
+        preferences: Dict[str, Any],
+        distances: Optional[np.ndarray],
+        max_distance: Optional[float],
+        top_k: int,
+        seed: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions into ``rows`` of the best ``top_k`` candidates and their scores, best first"""
+        if top_k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        partial = self._partial_scores(state, rows, distances, max_distance)
+        scores = self._complete_scores(state, rows, partial, preferences, seed)
+        positions = np.flatnonzero(scores >= self.MIN_SCORE)
+        best = self._select_top_k(scores[positions], top_k, tiebreak=rows[positions])
+        return positions[best], scores[positions[best]]
+
+    @staticmethod
+    def _select_top_k(scores: np.ndarray, top_k: int, tiebreak: Optional[np.ndarray] = None) -> np.ndarray:
+        """Indices of the ``top_k`` highest scores, best first; ties go to the lowest ``tiebreak``"""
+        if tiebreak is None:
+            tiebreak = np.arange(len(scores))
+        if top_k < len(scores):
+            kth = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+            above = np.flatnonzero(scores > kth)
+            ties = np.flatnonzero(scores == kth)
+            ties = ties[np.argsort(tiebreak[ties], kind='stable')][: top_k - len(above)]
+            chosen = np.concatenate([above, ties])
+        else:
+            chosen = np.arange(len(scores))
+        return chosen[np.lexsort((tiebreak[chosen], -scores[chosen]))]
+
+    def _partial_scores(
+        self,
+        state: _ScoringState,
+        rows: np.ndarray,
+        distances: Optional[np.ndarray] = None,
+        max_distance: Optional[float] = None,
+    ) -> np.ndarray:
+        """Score terms that are cheap to evaluate: static terms and distance bonus"""
+        # Rating (25%) and popularity (15%) are precomputed at load time
+        scores = state.static_scores[rows]
+
+        # Distance bonus (15%) - closer attractions get higher scores
+        if distances is not None and max_distance:
+            distance_score = np.nan_to_num(np.clip(1.0 - distances / max_distance, 0.0, None))
+            scores = scores + self.DISTANCE_WEIGHT * distance_score
+
+        return scores
+
+    def _complete_scores(
+        self,
+        state: _ScoringState,
+        rows: np.ndarray,
+        partial: np.ndarray,
+        preferences: Dict[str, Any],
+        seed: Optional[int] = None,
+    ) -> np.ndarray:
+        """Add category matching and the variety factor to partial scores"""
+        catalog = state.catalog
+        scores = partial.copy()
+
         # Category matching (30%)
-        attraction_categories = set(attraction.get('categories', []))
         activity_types = preferences.get('activity_types', [])
         if activity_types:
-            category_overlap = len(attraction_categories & set(activity_types))
-            if category_overlap > 0:
-                score += 0.30 * min(category_overlap / len(activity_types), 1.0)
-            else:
-                score += 0.08  # Small bonus for non-matching but potentially interesting
+            overlap = catalog.category_overlap(rows, catalog.category_query_mask(activity_types))
+            scores += np.where(
+                overlap > 0,
+                self.CATEGORY_WEIGHT * np.minimum(overlap / len(activity_types), 1.0),
+                self.CATEGORY_MISS_BONUS,
+            )
         else:
-            score += 0.30
-        
-        # Rating influence (25%)
-        rating = attraction.get('rating', {}).get('average', 3.0)
-        score += 0.25 * (rating / 5.0)
-        
-        # Popularity influence (15%)
-        review_count = attraction.get('review_count', 0)
-        popularity_score = min(review_count / 1000, 1.0)
-        score += 0.15 * popularity_score
-        
-        # Distance bonus (15%) - closer attractions get higher scores
-        if user_location and '_calculated_distance' in attraction:
-            distance = attraction['_calculated_distance']
-            max_distance = preferences.get('max_travel_distance', 50)
-            # Closer attractions get bonus points
-            distance_score = max(0, 1 - (distance / max_distance))
-            score += 0.15 * distance_score
-        
-        # Random factor for variety (15%)
-        score += 0.15 * random.uniform(0, 1)
-        
-        return min(score, 1.0)
-
-    def _calculate_distance(self, attraction: Dict[str, Any], user_location: Dict[str, Any]) -> float:
-        """Calculate distance between attraction and user location"""
-        if not user_location or 'location' not in attraction:
-            return None
-            
-        attraction_location = attraction['location']
-        if 'lat' not in attraction_location or 'lng' not in attraction_location:
-            return None
-            
-        R = 6371  # Earth radius in kilometers
-
-        lat1 = math.radians(user_location['lat'])
-        lat2 = math.radians(attraction_location['lat'])
-        delta_lat = math.radians(attraction_location['lat'] - user_location['lat'])
-        delta_lng = math.radians(attraction_location['lng'] - user_location['lng'])
-        
-        a = (math.sin(delta_lat/2) * math.sin(delta_lat/2) +
-             math.cos(lat1) * math.cos(lat2) *
-             math.sin(delta_lng/2) * math.sin(delta_lng/2))
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
\ No newline at end of file
+            scores += self.CATEGORY_WEIGHT
+
+        # Random factor for variety (15%); seeded noise is keyed by attraction id
+        # so the same request ranks identically however the candidates were found
+        if self.variety_mode == VARIETY_OFF:
+            pass
+        elif seed is None:
+            scores += self.RANDOM_WEIGHT * np.random.random(len(rows))
+        else:
+            scores += self.RANDOM_WEIGHT * seeded_noise(catalog.id_hashes[rows], seed)
+
+        return np.minimum(scores, 1.0)
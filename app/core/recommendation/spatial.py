@@ -0,0 +1,105 @@
+"""
+Spatial index for radius queries over the attraction catalog
+"""
+
+from typing import List, Tuple
+import math
+
+import numpy as np
+
+from ..geo import EARTH_RADIUS_KM, haversine_km_rad
+
+
+class GeoGridIndex:
+    """Uniform lat/lng grid over a set of points.
+
+    Points are sorted by cell key (``row * n_cols + col``), so every grid row
+    of a query's bounding box is one contiguous key range found with two
+    binary searches. A radius query only touches the points in those cells and
+    runs the exact haversine check on them, instead of scanning every point.
+    """
+
+    DEFAULT_CELL_DEG = 0.25  # ~28 km of latitude
+
+    def __init__(self, lat_rad: np.ndarray, lng_rad: np.ndarray, cell_deg: float = DEFAULT_CELL_DEG):
+        self.cell_deg = float(cell_deg)
+        self.n_rows = int(math.ceil(180.0 / self.cell_deg))
+        self.n_cols = int(math.ceil(360.0 / self.cell_deg))
+
+        lat_rad = np.asarray(lat_rad, dtype=np.float64)
+        lng_rad = np.asarray(lng_rad, dtype=np.float64)
+        valid = np.flatnonzero(~(np.isnan(lat_rad) | np.isnan(lng_rad)))
+
+        keys = self._cell_keys(np.degrees(lat_rad[valid]), np.degrees(lng_rad[valid]))
+        order = np.argsort(keys, kind='stable')
+        self._keys = keys[order]
+        self._rows = valid[order]
+        self._lat_rad = lat_rad[self._rows]
+        self._lng_rad = lng_rad[self._rows]
+        self._cos_lat = np.cos(self._lat_rad)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _cell_row(self, lat_deg):
+        return np.clip(np.floor((lat_deg + 90.0) / self.cell_deg), 0, self.n_rows - 1).astype(np.int64)
+
+    def _cell_col(self, lng_deg):
+        return np.floor((lng_deg + 180.0) / self.cell_deg).astype(np.int64)
+
+    def _cell_keys(self, lat_deg: np.ndarray, lng_deg: np.ndarray) -> np.ndarray:
+        return self._cell_row(lat_deg) * self.n_cols + self._cell_col(lng_deg) % self.n_cols
+
+    def _key_ranges(self, lat: float, lng: float, radius_km: float) -> List[Tuple[int, int]]:
+        """Half-open cell key ranges covering the bounding box of the search circle"""
+        angular = radius_km / EARTH_RADIUS_KM
+        if angular >= math.pi:
+            return [(0, self.n_rows * self.n_cols)]
+
+        dlat = math.degrees(angular)
+        row_lo = int(self._cell_row(lat - dlat))
+        row_hi = int(self._cell_row(lat + dlat))
+
+        # Longitude half-width of a spherical cap; the whole band when it covers a pole
+        cos_lat = math.cos(math.radians(lat))
+        if lat + dlat >= 90.0 or lat - dlat <= -90.0 or math.sin(angular) >= cos_lat:
+            return [(row_lo * self.n_cols, (row_hi + 1) * self.n_cols)]
+        dlng = math.degrees(math.asin(math.sin(angular) / cos_lat))
+
+        col_lo = int(self._cell_col(lng - dlng))
+        col_hi = int(self._cell_col(lng + dlng))
+        if col_hi - col_lo + 1 >= self.n_cols:
+            return [(row_lo * self.n_cols, (row_hi + 1) * self.n_cols)]
+
+        col_lo_wrapped = col_lo % self.n_cols
+        col_hi_wrapped = col_hi % self.n_cols
+        if col_lo_wrapped <= col_hi_wrapped:
+            col_spans = [(col_lo_wrapped, col_hi_wrapped)]
+        else:  # Box crosses the antimeridian
+            col_spans = [(col_lo_wrapped, self.n_cols - 1), (0, col_hi_wrapped)]
+
+        return [
+            (row * self.n_cols + first, row * self.n_cols + last + 1)
+            for row in range(row_lo, row_hi + 1)
+            for first, last in col_spans
+        ]
+
+    def candidate_positions(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        """Positions (in index order) of points in cells intersecting the circle's bounding box"""
+        ranges = np.asarray(self._key_ranges(lat, lng, radius_km), dtype=np.int64)
+        starts = np.searchsorted(self._keys, ranges[:, 0], side='left')
+        ends = np.searchsorted(self._keys, ranges[:, 1], side='left')
+        spans = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        if not spans:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(spans)
+
+    def query_radius(self, lat: float, lng: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows within ``radius_km`` of the point and their distances, in index order"""
+        positions = self.candidate_positions(lat, lng, radius_km)
+        distances = haversine_km_rad(
+            self._lat_rad[positions], self._lng_rad[positions], math.radians(lat), math.radians(lng),
+            cos_lat=self._cos_lat[positions],
+        )
+        inside = distances <= radius_km
+        return self._rows[positions[inside]], distances[inside]
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 import uuid
@@ -6,7 +7,8 @@ import logging
 import traceback
 from typing import List, Optional
 
-from fastapi import FastAPI, Depends, HTTPException, Query
+import httpx
+from fastapi import BackgroundTasks, FastAPI, Depends, HTTPException, Query
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from starlette.responses import JSONResponse
 from pydantic import BaseModel
@@ -15,12 +17,16 @@ from mangum import Mangum
 
 from app.api.routes.recommendations import init_recommendation_service, recommendation_service
 from app.aws_services import aws_services
-from app.schemas.itinerary import ItineraryPlanRequest, ItineraryPlan
+from app.config import settings
+from app.schemas.itinerary import ItineraryPlanRequest, ItineraryPlan, ItineraryReplanRequest
 from app.schemas.recommendation import RecommendationRequest
 from app.services.dynamodb_repository import itinerary_repository
 from app.services.itinerary_planner import itinerary_planner
+from app.services.maps_service import REQUEST_TIMEOUT_S, maps_service
 from app.services.notification_service import notification_service
+from app.services.road_routing import road_router
 from app.services.attraction_service import attraction_service
+from app.services.weather_service import weather_service
 
 
 log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -167,24 +173,38 @@ logger.info("? CORS middleware added")
 
 
 @app.get("/api/attractions")
-def list_attractions_api(
+async def list_attractions_api(
     region: Optional[str] = Query(None, description="Filter by region"),
     category: Optional[str] = Query(None, description="Filter by category"),
     limit: Optional[int] = Query(None, ge=1, le=50, description="Maximum number of results")
 ):
     """Return curated attraction data for the frontend."""
+    await init_recommendation_service()
     items = attraction_service.list_attractions(region=region, category=category, limit=limit)
     return items
 
 
 @app.get("/api/attractions/{attraction_id}")
-def get_attraction_api(attraction_id: str):
+async def get_attraction_api(attraction_id: str):
+    await init_recommendation_service()
     item = attraction_service.get_attraction(attraction_id)
     if not item:
         raise HTTPException(status_code=404, detail="Attraction not found")
     return item
 
 
+@app.get("/api/maps/cache/stats")
+def maps_cache_stats_api():
+    """Travel-time cache hit rates and Distance Matrix usage."""
+    return maps_service.cache_stats()
+
+
+@app.get("/api/weather/cache/stats")
+def weather_cache_stats_api():
+    """Weather cache occupancy, hit rate, evictions and coalesced lookups."""
+    return weather_service.cache_stats()
+
+
 if HAS_RECOMMENDATIONS:
     try:
         app.include_router(recommendation_router)
@@ -196,18 +216,50 @@ if HAS_RECOMMENDATIONS:
         print(f"Failed to include recommendation router: {e}")
 
 
+def _persist_itinerary(user: dict, payload: dict, itinerary_id: str) -> None:
+    """Save a planned itinerary and notify its owner; runs after the response is sent"""
+    try:
+        itinerary_repository.save_itinerary(user["id"], payload)
+        notification_service.send_itinerary_notification(user.get("email"), itinerary_id)
+    except Exception as exc:
+        logger.error(f"Saving itinerary {itinerary_id} failed: {exc}")
+
+
 @app.post("/api/itineraries/plan", response_model=ItineraryPlan)
 async def plan_itinerary_endpoint(
     request: ItineraryPlanRequest,
+    background_tasks: BackgroundTasks,
     current_user=Depends(get_optional_user),
 ):
     try:
-        recommendation_request = RecommendationRequest(**request.model_dump(exclude={"save"}))
+        recommendation_request = RecommendationRequest(**request.model_dump(exclude={"save", "solver"}))
+        solver = request.solver or itinerary_planner.default_solver
+        if solver not in itinerary_planner.SOLVERS:
+            raise HTTPException(status_code=400, detail=f"Unknown itinerary solver: {solver}")
+
+        # The orienteering solver chooses its stops from a larger candidate pool
+        pool_request = recommendation_request
+        if solver == itinerary_planner.SOLVER_ORIENTEERING:
+            pool_request = recommendation_request.model_copy(
+                update={"top_k": max(recommendation_request.top_k, settings.ORIENTEERING_CANDIDATE_POOL)}
+            )
         await init_recommendation_service()
-        recommendation_response = await recommendation_service.get_recommendations(recommendation_request)
+
+        # Weather at the base only depends on the request, so fetch it while recommendations are scored
+        weather = None
+        location = recommendation_request.current_location
+        if location:
+            weather, recommendation_response = await asyncio.gather(
+                itinerary_planner.weather.get_current_weather_async(location.lat, location.lng),
+                recommendation_service.get_recommendations(pool_request),
+            )
+        else:
+            recommendation_response = await recommendation_service.get_recommendations(pool_request)
 
         recommendation_dicts = [rec.model_dump() for rec in recommendation_response.recommendations]
-        plan_payload = itinerary_planner.build_itinerary(recommendation_request, recommendation_dicts)
+        plan_payload = await itinerary_planner.build_itinerary_async(
+            recommendation_request, recommendation_dicts, solver=solver, weather=weather
+        )
 
         context_message = (
             recommendation_response.context.get("message")
@@ -215,24 +267,64 @@ async def plan_itinerary_endpoint(
             else None
         )
         plan_payload["context"] = context_message
-        plan_payload["recommendations"] = recommendation_response.recommendations
+        plan_payload["recommendations"] = recommendation_response.recommendations[: recommendation_request.top_k]
 
         itinerary_plan = ItineraryPlan(**plan_payload)
 
         if request.save and current_user:
             stored_payload = itinerary_plan.model_dump()
             stored_payload["user_id"] = current_user["id"]
-            itinerary_repository.save_itinerary(current_user["id"], stored_payload)
-            notification_service.send_itinerary_notification(
-                current_user.get("email"), itinerary_plan.itinerary_id
+            background_tasks.add_task(
+                _persist_itinerary, current_user, stored_payload, itinerary_plan.itinerary_id
             )
 
         return itinerary_plan
+    except HTTPException:
+        raise
     except Exception as exc:
         logger.error(f"Itinerary planning failed: {exc}")
         raise HTTPException(status_code=500, detail="Failed to generate itinerary")
 
 
+@app.patch("/api/itineraries/plan", response_model=ItineraryPlan)
+async def replan_itinerary_endpoint(
+    request: ItineraryReplanRequest,
+    background_tasks: BackgroundTasks,
+    current_user=Depends(get_optional_user),
+):
+    """Apply stop edits to an existing plan; only the edited days are re-routed"""
+    try:
+        # Ids come from /recommendations and the plan itself, so resolve them in the catalog those were served from
+        await init_recommendation_service()
+        edits = []
+        for edit in request.edits:
+            item = edit.model_dump()
+            if item["new_attraction"] is None and edit.new_attraction_id:
+                item["new_attraction"] = recommendation_service.get_attraction(edit.new_attraction_id)
+                if item["new_attraction"] is None:
+                    raise HTTPException(status_code=400, detail=f"Unknown attraction: {edit.new_attraction_id}")
+            edits.append(item)
+
+        plan_payload = await itinerary_planner.replan_async(request.plan.model_dump(), edits)
+        itinerary_plan = ItineraryPlan(**plan_payload)
+
+        if request.save and current_user:
+            stored_payload = itinerary_plan.model_dump()
+            stored_payload["user_id"] = current_user["id"]
+            background_tasks.add_task(
+                _persist_itinerary, current_user, stored_payload, itinerary_plan.itinerary_id
+            )
+
+        return itinerary_plan
+    except HTTPException:
+        raise
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception as exc:
+        logger.error(f"Itinerary replanning failed: {exc}")
+        raise HTTPException(status_code=500, detail="Failed to update itinerary")
+
+
 class RegisterRequest(BaseModel):
     email: str
     password: str
@@ -262,9 +354,8 @@ async def startup_event():
     
     if HAS_RECOMMENDATIONS:
         try:
-            from app.api.routes.recommendations import recommendation_service
-            from app.data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
-            await recommendation_service.initialize(SAMPLE_NZ_ATTRACTIONS)
+            # Builds the one attraction catalog shared by recommendations and the attraction API
+            await init_recommendation_service()
             logger.info("? Recommendation system initialized successfully")
             print("Recommendation system initialized successfully")
         except Exception as e:
@@ -272,10 +363,27 @@ async def startup_event():
             logger.error(f"Traceback: {traceback.format_exc()}")
             print(f"Warning: Recommendation system initialization failed: {e}")
     
+    # One pooled HTTP client for every async Maps and weather call, closed on shutdown
+    http_client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT_S)
+    maps_service.http_client = http_client
+    weather_service.http_client = http_client
+    weather_service.start_refresher()
+    # Parse the offline road graph before serving rather than inside the first routed request
+    await road_router.load()
+
     logger.info("? API startup completed successfully")
     print("API startup completed successfully")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await weather_service.stop_refresher()
+    http_client = maps_service.http_client
+    maps_service.http_client = weather_service.http_client = None
+    if http_client is not None:
+        await http_client.aclose()
+
+
 @app.get("/")
 def read_root():
     logger.info("Root endpoint accessed")
@@ -10,6 +10,10 @@ class TravelSegment(BaseModel):
     travel: Dict[str, Optional[float]]
     arrival_time: str
     departure_time: str
+    wait_minutes: float = 0.0  # Arrived before opening
+    late_minutes: float = 0.0  # Visit time after closing
+    weather: Optional[Dict[str, Any]] = None  # Current weather at the stop
+    forecast: Optional[Dict[str, Any]] = None  # Daily forecast at the stop for the day's date
 
 
 class DayPlan(BaseModel):
@@ -18,6 +22,8 @@ class DayPlan(BaseModel):
     segments: List[TravelSegment]
     total_distance_km: float
     total_duration_minutes: float
+    overflow_minutes: float = 0.0  # Time past the end of the planned day
+    forecast: Optional[Dict[str, Any]] = None  # Daily forecast at the base (or first stop)
 
 
 class ItineraryPlan(BaseModel):
@@ -31,4 +37,20 @@ class ItineraryPlan(BaseModel):
 
 class ItineraryPlanRequest(RecommendationRequest):
     save: bool = True
+    solver: Optional[str] = None  # "cluster" or "orienteering"; server default when omitted
 
+
+
+class ItineraryEdit(BaseModel):
+    op: str  # "remove", "add", "move" or "replace"
+    day_index: int
+    attraction_id: Optional[str] = None  # Stop to remove, move or replace
+    new_attraction_id: Optional[str] = None  # Catalog attraction to add or swap in
+    new_attraction: Optional[Dict[str, Any]] = None  # Or the attraction itself
+    to_day_index: Optional[int] = None  # Destination day for "move"
+
+
+class ItineraryReplanRequest(BaseModel):
+    plan: ItineraryPlan
+    edits: List[ItineraryEdit]
+    save: bool = False
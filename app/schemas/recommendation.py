@@ -42,6 +42,8 @@ class AttractionRecommendation(BaseModel):
     distance: Optional[float] = Field(None, description="Distance (km)")
     price_range: List[float] = Field(default=[0, 100], description="Price range [min, max]")
     estimated_time: Optional[str] = Field(None, description="Estimated visit time")
+    duration_minutes: Optional[float] = Field(None, description="Estimated visit time in minutes, parsed at load")
+    opening_window: Optional[List[float]] = Field(None, description="Opening hours [opens, closes] in minutes after midnight")
     weather_suitable: bool = Field(default=True, description="Is current weather suitable")
     features: Dict[str, Any] = Field(default={}, description="Attraction features")
 
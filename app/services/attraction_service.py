@@ -2,16 +2,35 @@
 
 from __future__ import annotations
 
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, List, Optional
 
-from app.data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
+import numpy as np
+
+from app.core.recommendation.catalog import AttractionCatalog
 
 
 class AttractionService:
-    """Simple in-memory service backed by the sample attraction dataset."""
+    """In-memory view over the attraction catalog the recommender loaded.
+
+    The catalog is built once at startup and injected with ``use_catalog``,
+    so ids listed here are the ones recommendations and itineraries use.
+    """
+
+    def __init__(self, catalog: Optional[AttractionCatalog] = None) -> None:
+        self._catalog = catalog
+
+    @property
+    def catalog(self) -> Optional[AttractionCatalog]:
+        return self._catalog
 
-    def __init__(self, attractions: Optional[Iterable[Dict]] = None) -> None:
-        self._attractions: List[Dict] = list(attractions or SAMPLE_NZ_ATTRACTIONS)
+    def use_catalog(self, catalog: Optional[AttractionCatalog]) -> None:
+        """Serve ``catalog``, shared with the recommendation service"""
+        self._catalog = catalog
+
+    def _loaded(self) -> AttractionCatalog:
+        if self._catalog is None:
+            raise RuntimeError("Attraction catalog has not been loaded")
+        return self._catalog
 
     def list_attractions(
         self,
@@ -22,63 +41,52 @@ class AttractionService:
     ) -> List[Dict]:
         """Return attractions optionally filtered by region/category."""
 
-        filtered: List[Dict] = []
-        region_lower = region.lower() if region else None
-        category_lower = category.lower() if category else None
-
-        for attraction in self._attractions:
-            if region_lower and attraction.get("region", "").lower() != region_lower:
-                continue
-
-            categories = attraction.get("categories", []) or []
-            if category_lower and category_lower not in {c.lower() for c in categories}:
-                continue
-
-            filtered.append(self._normalise(attraction))
+        catalog = self._loaded()
+        rows: Optional[np.ndarray] = None
+        if region:
+            rows = catalog.rows_in_region(region)
+        if category:
+            category_rows = catalog.rows_with_category(category, ignore_case=True)
+            rows = category_rows if rows is None else np.intersect1d(rows, category_rows, assume_unique=True)
 
-            if limit and len(filtered) >= limit:
-                break
+        if rows is None:
+            rows = np.arange(len(catalog.attractions))
+        filtered = [normalise_attraction(catalog, row) for row in rows[: limit or None]]
 
         if not filtered:
             # Still normalise the data so the response shape is consistent
-            return [self._normalise(item) for item in self._attractions[: limit or None]]
+            return [normalise_attraction(catalog, row) for row in range(len(catalog.attractions))[: limit or None]]
 
         return filtered
 
     def get_attraction(self, attraction_id: str) -> Optional[Dict]:
         """Return a single attraction by id if it exists."""
 
-        for attraction in self._attractions:
-            if attraction.get("id") == attraction_id:
-                return self._normalise(attraction)
-        return None
+        catalog = self._loaded()
+        row = catalog.row_for_id(attraction_id)
+        return normalise_attraction(catalog, row) if row is not None else None
 
-    def _normalise(self, attraction: Dict) -> Dict:
-        """Enrich raw dictionaries with friendly fields for clients."""
 
-        rating = attraction.get("rating", {}) or {}
-        average_rating = rating.get("average") if isinstance(rating, dict) else rating
-        rating_count = rating.get("count") if isinstance(rating, dict) else None
+def normalise_attraction(catalog: AttractionCatalog, row: int) -> Dict:
+    """Enrich a catalog row with friendly fields for clients."""
 
-        categories = attraction.get("categories") or []
-        primary_category = categories[0] if categories else None
+    attraction = catalog.attractions[row]
+    features = catalog.features[row]
 
-        price_range = attraction.get("price_range")
-        if not price_range:
-            price_level = attraction.get("features", {}).get("price_level")
-            if isinstance(price_level, int):
-                base = max(price_level * 40, 40)
-                price_range = [base, base + 120]
-            else:
-                price_range = None
+    rating = attraction.get("rating", {}) or {}
+    average_rating = rating.get("average") if isinstance(rating, dict) else rating
+    rating_count = rating.get("count") if isinstance(rating, dict) else None
 
-        return {
-            **attraction,
-            "category": primary_category,
-            "rating": round(float(average_rating), 1) if average_rating else None,
-            "rating_count": rating_count,
-            "price_range": price_range,
-        }
+    return {
+        **attraction,
+        "category": features.primary_category,
+        "rating": round(float(average_rating), 1) if average_rating else None,
+        "rating_count": rating_count,
+        "price_range": features.display_price_range,
+        "duration_minutes": features.duration_minutes,
+        "opening_window": list(features.opening_window) if features.opening_window else None,
+        "features": attraction.get("features") or {},
+    }
 
 
-attraction_service = AttractionService()
\ No newline at end of file
+attraction_service = AttractionService()
@@ -1,179 +1,692 @@
+import asyncio
 import datetime
 import logging
+import math
 import uuid
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Tuple
 
+from ..config import settings
+from ..core.planning import cluster_days, solve_orienteering, solve_route
+from ..core.planning.scheduling import Visit, schedule_day
+from ..core.recommendation.features import parse_duration
 from ..schemas.recommendation import RecommendationRequest
 from .maps_service import maps_service
+from .road_routing import road_router
+from .travel_matrix import TravelMatrix, TravelMatrixBuilder
 from .weather_service import weather_service
 
 logger = logging.getLogger(__name__)
 
+# Default for ``build_itinerary_async``'s ``weather``: look it up alongside the travel matrix
+_FETCH_WEATHER: Any = object()
+
+
+@dataclass
+class _PlanInputs:
+    """Everything a solver needs once the travel matrix and weather are known"""
+
+    solver: str
+    duration: int
+    base_location: Optional[Tuple[float, float]]
+    recommendations: List[Dict[str, Any]]
+    day_groups: List[List[Dict[str, Any]]]
+    matrix_groups: List[List[Tuple[float, float]]]
+
+
+@dataclass
+class _StopWeather:
+    """Current weather per stop and daily forecasts (by ISO date) per stop and base"""
+
+    current: Dict[Tuple[float, float], Optional[Dict[str, Any]]] = field(default_factory=dict)
+    daily: Dict[Tuple[float, float], Dict[str, Optional[Dict[str, Any]]]] = field(default_factory=dict)
+
+    def forecast(self, point: Tuple[float, float], day: str) -> Optional[Dict[str, Any]]:
+        return self.daily.get(point, {}).get(day)
+
+    def dry(self, point: Tuple[float, float], day: str) -> Optional[bool]:
+        """Whether ``day`` is forecast fit for outdoor visits at ``point``; None when unknown"""
+        forecast = self.forecast(point, day)
+        return None if forecast is None else bool(forecast.get("suitable_for_outdoor", True))
+
 
 class ItineraryPlanner:
     """Generate day-by-day itineraries using recommendations and map data."""
 
+    SOLVER_CLUSTER = "cluster"  # Top recommendations, clustered into days and routed
+    SOLVER_ORIENTEERING = "orienteering"  # Choose stops to maximise score within daily hours
+    SOLVERS = (SOLVER_CLUSTER, SOLVER_ORIENTEERING)
+
+    AVERAGE_SPEED_KMH = 50.0  # Used when neither the Distance Matrix API nor the road graph has an answer
+    ROUTE_TIME_BUDGET_S = 0.05  # Local search budget per day route
+    DEFAULT_VISIT_MINUTES = 120.0  # When estimated_time cannot be parsed
+    EDIT_OPS = ("remove", "add", "move", "replace")  # Edits accepted by replan
+
     def __init__(self) -> None:
         self.maps = maps_service
         self.weather = weather_service
+        self.matrix_builder = TravelMatrixBuilder(self.maps, self.AVERAGE_SPEED_KMH, road_router)
+        self.default_solver = settings.ITINERARY_SOLVER
+        self.day_minutes = float(settings.ITINERARY_DAY_MINUTES)
+        self.orienteering_time_budget = settings.ORIENTEERING_TIME_BUDGET_SECONDS
 
     def build_itinerary(
         self,
         request: RecommendationRequest,
         recommendations: List[Dict[str, Any]],
+        solver: Optional[str] = None,
     ) -> Dict[str, Any]:
+        inputs = self._prepare(request, recommendations, solver)
+        if inputs is None:
+            return self._empty_itinerary()
+
+        weather = None
+        if inputs.base_location:
+            weather = self.weather.get_current_weather(*inputs.base_location)
+        trip_matrix = self.matrix_builder.build(inputs.matrix_groups)
+        stop_weather = self._stop_weather(
+            self._stop_points(inputs), inputs.base_location, self._trip_dates(inputs.duration)
+        )
+        return self._plan_days(inputs, trip_matrix, weather, stop_weather)
+
+    async def build_itinerary_async(
+        self,
+        request: RecommendationRequest,
+        recommendations: List[Dict[str, Any]],
+        solver: Optional[str] = None,
+        weather: Optional[Dict[str, Any]] = _FETCH_WEATHER,
+    ) -> Dict[str, Any]:
+        """``build_itinerary`` without blocking the event loop.
+
+        Pass ``weather`` when the caller already looked it up (for example
+        concurrently with recommendation scoring); otherwise it is fetched at
+        the same time as the travel matrix and the batched per-stop weather
+        and forecasts. The solvers are CPU-bound and run in a worker thread.
+        """
+        inputs = self._prepare(request, recommendations, solver)
+        if inputs is None:
+            return self._empty_itinerary()
+
+        matrix_task = self.matrix_builder.build_async(inputs.matrix_groups)
+        stop_weather_task = self._stop_weather_async(
+            self._stop_points(inputs), inputs.base_location, self._trip_dates(inputs.duration)
+        )
+        if weather is _FETCH_WEATHER and inputs.base_location:
+            trip_matrix, stop_weather, weather = await asyncio.gather(
+                matrix_task, stop_weather_task, self.weather.get_current_weather_async(*inputs.base_location)
+            )
+        else:
+            trip_matrix, stop_weather = await asyncio.gather(matrix_task, stop_weather_task)
+            if weather is _FETCH_WEATHER:
+                weather = None
+        return await asyncio.to_thread(self._plan_days, inputs, trip_matrix, weather, stop_weather)
+
+    def _prepare(
+        self,
+        request: RecommendationRequest,
+        recommendations: List[Dict[str, Any]],
+        solver: Optional[str],
+    ) -> Optional[_PlanInputs]:
+        """Validate the solver and choose which points need travel legs; None when there is nothing to plan"""
         logger.info(f"Building itinerary for request with {len(recommendations) if recommendations else 0} recommendations")
-        
+        solver = solver or self.default_solver
+        if solver not in self.SOLVERS:
+            raise ValueError(f"Unknown itinerary solver {solver!r}, expected one of {self.SOLVERS}")
+
         if not recommendations:
             logger.warning("No recommendations available to build itinerary")
-            return {
-                "itinerary_id": str(uuid.uuid4()),
-                "days": [],
-                "summary": {"total_attractions": 0},
-                "weather": None,
-                "message": "No attractions found matching your preferences"
-            }
+            return None
 
         duration = max(1, request.preferences.duration)
-        attractions_per_day = max(1, min(4, len(recommendations) // duration or 1))
-        selected = recommendations[: duration * attractions_per_day]
 
         base_location: Optional[Tuple[float, float]] = None
         if request.current_location:
             base_location = (request.current_location.lat, request.current_location.lng)
+        base = [base_location] if base_location else []
 
-        weather = None
-        if base_location:
-            weather = self.weather.get_current_weather(*base_location)
+        day_groups: List[List[Dict[str, Any]]] = []
+        if solver == self.SOLVER_ORIENTEERING:
+            matrix_groups = [base + self._coords(recommendations)]
+        else:
+            attractions_per_day = max(1, min(4, len(recommendations) // duration or 1))
+            selected = recommendations[: duration * attractions_per_day]
+            n_days = min(duration, math.ceil(len(selected) / attractions_per_day))
+            day_groups = self._assign_days(selected, n_days, base_location)
+            # One deduplicated, concurrently fetched matrix feeds every day
+            matrix_groups = [base + self._coords(day_items) for day_items in day_groups]
 
-        itinerary_days: List[Dict[str, Any]] = []
-        totals = {"distance_km": 0.0, "duration_minutes": 0.0}
-        current_index = 0
+        return _PlanInputs(solver, duration, base_location, recommendations, day_groups, matrix_groups)
 
-        for day_index in range(1, duration + 1):
-            day_items = selected[current_index : current_index + attractions_per_day]
-            if not day_items:
-                break
+    @staticmethod
+    def _empty_itinerary() -> Dict[str, Any]:
+        return {
+            "itinerary_id": str(uuid.uuid4()),
+            "days": [],
+            "summary": {"total_attractions": 0},
+            "weather": None,
+            "message": "No attractions found matching your preferences"
+        }
+
+    def _plan_days(
+        self,
+        inputs: _PlanInputs,
+        trip_matrix: TravelMatrix,
+        weather: Optional[Dict[str, Any]],
+        stop_weather: Optional[_StopWeather] = None,
+    ) -> Dict[str, Any]:
+        stop_weather = stop_weather or _StopWeather()
+        if inputs.solver == self.SOLVER_ORIENTEERING:
+            itinerary_days = self._build_orienteering_days(
+                inputs.recommendations, inputs.duration, inputs.base_location, trip_matrix
+            )
+        else:
+            itinerary_days = self._route_days(inputs.base_location, inputs.day_groups, trip_matrix)
+        itinerary_days = self._swap_for_weather(inputs.base_location, itinerary_days, trip_matrix, stop_weather)
+        self._attach_stop_weather(itinerary_days, stop_weather, inputs.base_location)
+
+        return {
+            "itinerary_id": str(uuid.uuid4()),
+            "days": itinerary_days,
+            "summary": self._summary(itinerary_days, inputs.solver, inputs.base_location),
+            "weather": weather,
+        }
 
-            route = self._build_daily_route(day_index, base_location, day_items)
-            itinerary_days.append(route)
+    @staticmethod
+    def _summary(
+        itinerary_days: List[Dict[str, Any]],
+        solver: Optional[str],
+        base_location: Optional[Tuple[float, float]],
+    ) -> Dict[str, Any]:
+        totals = {"distance_km": 0.0, "duration_minutes": 0.0}
+        for route in itinerary_days:
             totals["distance_km"] += route.get("total_distance_km", 0)
             totals["duration_minutes"] += route.get("total_duration_minutes", 0)
-            current_index += attractions_per_day
 
-        summary = {
+        return {
             "total_days": len(itinerary_days),
-            "total_attractions": len(selected),
+            "total_attractions": sum(len(route["segments"]) for route in itinerary_days),
+            "solver": solver,
             "total_distance_km": round(totals["distance_km"], 2),
             "total_travel_time_minutes": round(totals["duration_minutes"], 1),
+            # Lets a later replan route edited days from the same start
+            "base_location": list(base_location) if base_location else None,
         }
 
-        return {
-            "itinerary_id": str(uuid.uuid4()),
-            "days": itinerary_days,
-            "summary": summary,
-            "weather": weather,
+    def replan(self, plan: Dict[str, Any], edits: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Apply ``edits`` to an existing plan, re-routing and re-timing only the days they touch"""
+        base_location, groups, touched = self._apply_edits(plan, edits)
+        trip_matrix = self.matrix_builder.build(self._edited_points(base_location, groups, touched))
+        stop_weather = self._stop_weather(
+            self._edited_stops(groups, touched), base_location, self._edited_dates(plan, touched)
+        )
+        return self._replanned(plan, base_location, groups, touched, trip_matrix, stop_weather)
+
+    async def replan_async(self, plan: Dict[str, Any], edits: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """``replan`` without blocking the event loop"""
+        base_location, groups, touched = self._apply_edits(plan, edits)
+        trip_matrix, stop_weather = await asyncio.gather(
+            self.matrix_builder.build_async(self._edited_points(base_location, groups, touched)),
+            self._stop_weather_async(
+                self._edited_stops(groups, touched), base_location, self._edited_dates(plan, touched)
+            ),
+        )
+        return await asyncio.to_thread(
+            self._replanned, plan, base_location, groups, touched, trip_matrix, stop_weather
+        )
+
+    def _apply_edits(
+        self, plan: Dict[str, Any], edits: List[Dict[str, Any]]
+    ) -> Tuple[Optional[Tuple[float, float]], Dict[int, List[Dict[str, Any]]], List[int]]:
+        """Each day's stops after the edits, and the days whose stops changed"""
+        base = (plan.get("summary") or {}).get("base_location")
+        base_location = (float(base[0]), float(base[1])) if base else None
+        groups = {
+            day["day_index"]: [segment["attraction"] for segment in day["segments"]]
+            for day in plan.get("days") or []
         }
+        touched: List[int] = []
+
+        def stop_position(day_index: int, attraction_id: Optional[str]) -> int:
+            for position, attraction in enumerate(groups[day_index]):
+                if str(attraction.get("id")) == str(attraction_id):
+                    return position
+            raise ValueError(f"Attraction {attraction_id!r} is not on day {day_index}")
+
+        for edit in edits:
+            op = edit.get("op")
+            day_index = edit.get("day_index")
+            if op not in self.EDIT_OPS:
+                raise ValueError(f"Unknown edit {op!r}, expected one of {self.EDIT_OPS}")
+            if day_index not in groups:
+                raise ValueError(f"Plan has no day {day_index}")
+            if op in ("add", "replace") and not edit.get("new_attraction"):
+                raise ValueError(f"{op!r} edits need the attraction to insert")
+
+            if op == "add":
+                groups[day_index].append(edit["new_attraction"])
+            else:
+                position = stop_position(day_index, edit.get("attraction_id"))
+                removed = groups[day_index].pop(position)
+                if op == "replace":
+                    groups[day_index].insert(position, edit["new_attraction"])
+                elif op == "move":
+                    target = edit.get("to_day_index")
+                    if target not in groups:
+                        raise ValueError(f"Plan has no day {target}")
+                    groups[target].append(removed)
+                    touched.append(target)
+            touched.append(day_index)
+        return base_location, groups, sorted(set(touched))
+
+    def _edited_points(
+        self,
+        base_location: Optional[Tuple[float, float]],
+        groups: Dict[int, List[Dict[str, Any]]],
+        touched: List[int],
+    ) -> List[List[Tuple[float, float]]]:
+        base = [base_location] if base_location else []
+        return [base + self._coords(groups[day_index]) for day_index in touched]
+
+    def _edited_stops(self, groups: Dict[int, List[Dict[str, Any]]], touched: List[int]) -> List[Tuple[float, float]]:
+        return list(dict.fromkeys(point for day_index in touched for point in self._coords(groups[day_index])))
+
+    @staticmethod
+    def _edited_dates(plan: Dict[str, Any], touched: List[int]) -> List[datetime.date]:
+        return [
+            datetime.date.fromisoformat(day["date"]) for day in plan.get("days") or [] if day["day_index"] in touched
+        ]
+
+    def _replanned(
+        self,
+        plan: Dict[str, Any],
+        base_location: Optional[Tuple[float, float]],
+        groups: Dict[int, List[Dict[str, Any]]],
+        touched: List[int],
+        trip_matrix: TravelMatrix,
+        stop_weather: Optional[_StopWeather] = None,
+    ) -> Dict[str, Any]:
+        days = []
+        for day in plan.get("days") or []:
+            day_index = day["day_index"]
+            if day_index in touched:
+                day_date = datetime.date.fromisoformat(day["date"])
+                day = self._build_daily_route(day_index, base_location, groups[day_index], trip_matrix, day_date)
+                self._attach_stop_weather([day], stop_weather or _StopWeather(), base_location)
+            days.append(day)
+        solver = (plan.get("summary") or {}).get("solver")
+        return {**plan, "days": days, "summary": self._summary(days, solver, base_location)}
+
+    def _assign_days(
+        self,
+        attractions: List[Dict[str, Any]],
+        n_days: int,
+        start: Optional[Tuple[float, float]],
+    ) -> List[List[Dict[str, Any]]]:
+        """Group attractions into geographically compact, balanced days in travel order"""
+        located: List[int] = []
+        lat: List[float] = []
+        lng: List[float] = []
+        for idx, attraction in enumerate(attractions):
+            loc = attraction.get("location", {})
+            if loc.get("lat") is not None and loc.get("lng") is not None:
+                located.append(idx)
+                lat.append(loc["lat"])
+                lng.append(loc["lng"])
+
+        groups = [[located[i] for i in cluster] for cluster in cluster_days(lat, lng, n_days, start)]
+        groups += [[] for _ in range(n_days - len(groups))]
+
+        # Stops without coordinates go to the lightest days
+        located_set = set(located)
+        for idx in range(len(attractions)):
+            if idx not in located_set:
+                min(groups, key=len).append(idx)
+        return [[attractions[idx] for idx in group] for group in groups if group]
 
     def _build_daily_route(
         self,
         day_index: int,
         start: Optional[Tuple[float, float]],
         attractions: List[Dict[str, Any]],
+        matrix: Optional[TravelMatrix] = None,
+        day_date: Optional[datetime.date] = None,
     ) -> Dict[str, Any]:
+        located: List[Dict[str, Any]] = []
+        unlocated: List[Dict[str, Any]] = []
         coords: List[Tuple[float, float]] = []
-        coord_index_map: Dict[int, int] = {}
-        for idx, attraction in enumerate(attractions):
+        for attraction in attractions:
             loc = attraction.get("location", {})
             lat = loc.get("lat")
             lng = loc.get("lng")
             if lat is None or lng is None:
                 logger.debug("Attraction %s missing location", attraction.get("name"))
+                unlocated.append(attraction)
                 continue
-            coord_index_map[idx] = len(coords)
+            located.append(attraction)
             coords.append((lat, lng))
 
-        origins: List[Tuple[float, float]] = []
-        destinations: List[Tuple[float, float]] = []
-        if coords:
-            if start:
-                origins = [start] + coords[:-1]
+        # Order the located stops to minimise travel time from the base
+        points = ([start] if start else []) + coords
+        travel = matrix.block(points) if matrix is not None else self._travel_matrix(points)
+        cost = [[leg["duration_minutes"] for leg in row] for row in travel]
+        order = solve_route(cost, start=0 if start else None, time_budget=self.ROUTE_TIME_BUDGET_S)
+        offset = 1 if start else 0
+        visits = [node for node in order if node >= offset]
+
+        previous: Optional[int] = 0 if start else None
+        stops: List[Tuple[Dict[str, Any], Dict[str, Optional[float]], float]] = []
+        for node in visits:
+            travel_info: Dict[str, Optional[float]] = {"distance_km": None, "duration_minutes": None}
+            if previous is not None:
+                travel_info = dict(travel[previous][node])
+            previous = node
+            attraction = located[node - offset]
+            stops.append((attraction, travel_info, self._visit_minutes(attraction)))
+        for attraction in unlocated:
+            stops.append((attraction, {"distance_km": None, "duration_minutes": None}, self._visit_minutes(attraction)))
+        return self._timed_day(day_index, stops, day_date)
+
+    def _route_days(
+        self,
+        start: Optional[Tuple[float, float]],
+        day_groups: List[List[Dict[str, Any]]],
+        matrix: TravelMatrix,
+    ) -> List[Dict[str, Any]]:
+        """Route each day, then move stops off days that run past the daily hours.
+
+        The last stop of the most overflowing day goes to a day that can
+        take it without overflowing itself; only those two days are
+        re-routed, never the whole trip. Targets are tried on estimated legs
+        first, so the Maps API is only asked for the day actually chosen.
+        """
+        groups = [list(items) for items in day_groups]
+        days = [
+            self._build_daily_route(day_index, start, items, matrix)
+            for day_index, items in enumerate(groups, start=1)
+        ]
+        base = [start] if start else []
+        stuck = set()
+        for _ in range(sum(len(items) for items in groups)):
+            overflowing = [d for d in range(len(days)) if days[d]["overflow_minutes"] > 0 and d not in stuck]
+            if not overflowing:
+                break
+            source = max(overflowing, key=lambda d: days[d]["overflow_minutes"])
+            moving = days[source]["segments"][-1]["attraction"]
+            remaining = [a for a in groups[source] if a is not moving]
+            fitting = []
+            for target in range(len(days)):
+                if target == source:
+                    continue
+                trial = self.matrix_builder.estimated(matrix, base + self._coords(groups[target] + [moving]))
+                if self._build_daily_route(target + 1, start, groups[target] + [moving], trial)["overflow_minutes"] <= 0:
+                    fitting.append(target)
+            for target in sorted(fitting, key=lambda d: len(groups[d])):
+                self.matrix_builder.extend(matrix, base + self._coords(groups[target] + [moving]))
+                candidate = self._build_daily_route(target + 1, start, groups[target] + [moving], matrix)
+                if candidate["overflow_minutes"] <= 0:
+                    groups[target].append(moving)
+                    groups[source] = remaining
+                    days[target] = candidate
+                    days[source] = self._build_daily_route(source + 1, start, remaining, matrix)
+                    break
             else:
-                origins = coords[:-1]
-            destinations = coords
+                stuck.add(source)
+        if all(groups):
+            return days
+        # A day that gave away its only stop disappears; renumber the rest
+        return [
+            self._build_daily_route(day_index, start, items, matrix)
+            for day_index, items in enumerate((items for items in groups if items), start=1)
+        ]
 
-        travel_matrix = None
-        if self.maps.is_configured() and origins and destinations:
-            travel_matrix = self.maps.distance_matrix(origins, destinations)
+    def _build_orienteering_days(
+        self,
+        recommendations: List[Dict[str, Any]],
+        n_days: int,
+        start: Optional[Tuple[float, float]],
+        matrix: Optional[TravelMatrix] = None,
+    ) -> List[Dict[str, Any]]:
+        """Pick and order stops from the candidate pool to maximise total confidence within daily hours"""
+        candidates: List[Dict[str, Any]] = []
+        coords: List[Tuple[float, float]] = []
+        for attraction in recommendations:
+            loc = attraction.get("location", {})
+            if loc.get("lat") is None or loc.get("lng") is None:
+                logger.debug("Attraction %s missing location; not routable", attraction.get("name"))
+                continue
+            candidates.append(attraction)
+            coords.append((loc["lat"], loc["lng"]))
+        if not candidates:
+            return []
 
-        segments: List[Dict[str, Any]] = []
-        total_distance = 0.0
-        total_duration = 0.0
-        start_time = datetime.datetime.combine(
-            datetime.date.today(), datetime.time(hour=9, minute=0)
+        # Node 0 is the daily start; without a base it is a zero-cost placeholder
+        offset = 1 if start else 0
+        points = ([start] if start else []) + coords
+        travel = matrix.block(points) if matrix is not None else self._travel_matrix(points)
+        minutes = [[0.0] * (len(coords) + 1) for _ in range(len(coords) + 1)]
+        for i, row in enumerate(travel):
+            for j, leg in enumerate(row):
+                minutes[i + 1 - offset][j + 1 - offset] = leg["duration_minutes"]
+
+        scores = [float(a.get("confidence_score", a.get("score", 0.0)) or 0.0) for a in candidates]
+        service = [self._visit_minutes(a) for a in candidates]
+        routes = solve_orienteering(
+            scores, service, minutes, n_days, self.day_minutes,
+            time_budget=self.orienteering_time_budget, depot=start is not None,
         )
 
-        for idx, attraction in enumerate(attractions):
-            travel_info = self._resolve_segment_travel(idx, coords, coord_index_map, start, travel_matrix)
+        days: List[Dict[str, Any]] = []
+        for route in routes:
+            if not route:
+                continue
+            stops = []
+            previous = 0 if start else None
+            for candidate in route:
+                node = candidate + offset
+                travel_info: Dict[str, Optional[float]] = {"distance_km": None, "duration_minutes": None}
+                if previous is not None:
+                    travel_info = dict(travel[previous][node])
+                stops.append((candidates[candidate], travel_info, service[candidate]))
+                previous = node
+            days.append(self._timed_day(len(days) + 1, stops))
+        return days
+
+    def _visit_minutes(self, attraction: Dict[str, Any]) -> float:
+        # Parsed once when the catalog was loaded; raw strings only for records built elsewhere
+        if attraction.get("duration_minutes"):
+            return float(attraction["duration_minutes"])
+        duration = attraction.get("estimated_time") or attraction.get("estimated_duration")
+        return parse_duration(duration) or self.DEFAULT_VISIT_MINUTES
 
-            if travel_info.get("distance_km") is not None:
-                total_distance += travel_info["distance_km"]
-            if travel_info.get("duration_minutes") is not None:
-                total_duration += travel_info["duration_minutes"]
+    @staticmethod
+    def _opening_window(attraction: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+        window = attraction.get("opening_window")
+        return (float(window[0]), float(window[1])) if window else None
 
-            arrival = start_time + datetime.timedelta(minutes=total_duration)
-            leave = arrival + datetime.timedelta(hours=2)
+    def _timed_day(
+        self,
+        day_index: int,
+        stops: List[Tuple[Dict[str, Any], Dict[str, Optional[float]], float]],
+        day_date: Optional[datetime.date] = None,
+    ) -> Dict[str, Any]:
+        """Day payload timed by travel, waits for opening and visit durations"""
+        schedule = schedule_day(
+            [travel_info.get("duration_minutes") or 0.0 for _, travel_info, _ in stops],
+            [Visit(visit_minutes, self._opening_window(attraction)) for attraction, _, visit_minutes in stops],
+            self.day_minutes,
+        )
 
+        if day_date is None:
+            day_date = datetime.date.today() + datetime.timedelta(days=day_index - 1)
+        midnight = datetime.datetime.combine(day_date, datetime.time())
+        segments: List[Dict[str, Any]] = []
+        total_distance = 0.0
+        total_duration = 0.0
+        for (attraction, travel_info, _), visit in zip(stops, schedule.visits):
+            total_distance += travel_info.get("distance_km") or 0.0
+            total_duration += travel_info.get("duration_minutes") or 0.0
             segments.append(
                 {
                     "attraction": attraction,
                     "travel": travel_info,
-                    "arrival_time": arrival.isoformat(),
-                    "departure_time": leave.isoformat(),
+                    "arrival_time": (midnight + datetime.timedelta(minutes=visit.arrival)).isoformat(),
+                    "departure_time": (midnight + datetime.timedelta(minutes=visit.departure)).isoformat(),
+                    "wait_minutes": round(visit.wait_minutes, 1),
+                    "late_minutes": round(visit.late_minutes, 1),
                 }
             )
 
-        day_date = datetime.date.today() + datetime.timedelta(days=day_index - 1)
         return {
             "day_index": day_index,
             "date": day_date.isoformat(),
             "segments": segments,
             "total_distance_km": round(total_distance, 2),
             "total_duration_minutes": round(total_duration, 1),
+            "overflow_minutes": round(schedule.overflow_minutes, 1),
         }
 
-    def _resolve_segment_travel(
+    def _stop_points(self, inputs: _PlanInputs) -> List[Tuple[float, float]]:
+        """Distinct coordinates of every attraction the solver may schedule"""
+        candidates = inputs.recommendations if inputs.solver == self.SOLVER_ORIENTEERING else [
+            attraction for day_items in inputs.day_groups for attraction in day_items
+        ]
+        return list(dict.fromkeys(self._coords(candidates)))
+
+    @staticmethod
+    def _trip_dates(n_days: int) -> List[datetime.date]:
+        today = datetime.date.today()
+        return [today + datetime.timedelta(days=offset) for offset in range(n_days)]
+
+    def _stop_weather(
+        self,
+        points: List[Tuple[float, float]],
+        base_location: Optional[Tuple[float, float]],
+        dates: List[datetime.date],
+    ) -> _StopWeather:
+        """Current weather at each stop and forecasts for each trip date, from one batched lookup of each"""
+        if not points:
+            return _StopWeather()
+        forecast_points = list(dict.fromkeys(points + ([base_location] if base_location else [])))
+        return _StopWeather(
+            dict(zip(points, self.weather.get_weather_batch(points))),
+            dict(zip(forecast_points, self.weather.get_daily_forecast_batch(forecast_points, dates))),
+        )
+
+    async def _stop_weather_async(
+        self,
+        points: List[Tuple[float, float]],
+        base_location: Optional[Tuple[float, float]],
+        dates: List[datetime.date],
+    ) -> _StopWeather:
+        if not points:
+            return _StopWeather()
+        forecast_points = list(dict.fromkeys(points + ([base_location] if base_location else [])))
+        current, daily = await asyncio.gather(
+            self.weather.get_weather_batch_async(points),
+            self.weather.get_daily_forecast_batch_async(forecast_points, dates),
+        )
+        return _StopWeather(dict(zip(points, current)), dict(zip(forecast_points, daily)))
+
+    def _attach_stop_weather(
+        self,
+        itinerary_days: List[Dict[str, Any]],
+        stop_weather: _StopWeather,
+        base_location: Optional[Tuple[float, float]],
+    ) -> None:
+        for day in itinerary_days:
+            anchor = base_location
+            for segment in day["segments"]:
+                coords = self._coords([segment["attraction"]])
+                point = coords[0] if coords else None
+                anchor = anchor or point
+                segment["weather"] = stop_weather.current.get(point)
+                segment["forecast"] = stop_weather.forecast(point, day["date"])
+            day["forecast"] = stop_weather.forecast(anchor, day["date"]) if anchor else None
+
+    @staticmethod
+    def _is_outdoor(attraction: Dict[str, Any]) -> Optional[bool]:
+        value = (attraction.get("features") or {}).get("is_outdoor")
+        return value if isinstance(value, bool) else None
+
+    def _swap_for_weather(
         self,
-        attraction_idx: int,
-        coords: List[Tuple[float, float]],
-        coord_index_map: Dict[int, int],
         start: Optional[Tuple[float, float]],
-        travel_matrix: Optional[List[List[Dict[str, float]]]],
-    ) -> Dict[str, Optional[float]]:
-        coord_idx = coord_index_map.get(attraction_idx)
-        if coord_idx is None or coord_idx >= len(coords):
-            return {"distance_km": None, "duration_minutes": None}
-
-        if travel_matrix and coord_idx < len(travel_matrix):
-            row = travel_matrix[coord_idx]
-            if coord_idx < len(row):
-                result = row[coord_idx]
-                if result:
-                    return result
-
-        previous_point: Optional[Tuple[float, float]] = None
-        if coord_idx == 0:
-            previous_point = start
-        elif coord_idx - 1 < len(coords):
-            previous_point = coords[coord_idx - 1]
-
-        if not previous_point:
-            return {"distance_km": None, "duration_minutes": None}
-
-        distance = self.maps.haversine_distance(previous_point, coords[coord_idx])
-        estimated_speed_kmh = 50.0
-        duration = round((distance / estimated_speed_kmh) * 60, 1) if distance is not None else None
-        return {"distance_km": distance, "duration_minutes": duration}
+        itinerary_days: List[Dict[str, Any]],
+        matrix: TravelMatrix,
+        stop_weather: _StopWeather,
+    ) -> List[Dict[str, Any]]:
+        """Trade outdoor stops on days forecast wet for indoor stops on days forecast dry there.
+
+        Each trade re-routes only the two days involved and is kept only when
+        neither day runs further past the daily hours than it did before;
+        trades are vetted on estimated legs before any are fetched.
+        """
+        days = list(itinerary_days)
+        groups = [[segment["attraction"] for segment in day["segments"]] for day in days]
+        base = [start] if start else []
+        for wet in range(len(days)):
+            for outdoor in list(groups[wet]):
+                coords = self._coords([outdoor])
+                if not coords or self._is_outdoor(outdoor) is not True:
+                    continue
+                if stop_weather.dry(coords[0], days[wet]["date"]) is not False:
+                    continue
+                for dry in range(len(days)):
+                    if dry == wet or stop_weather.dry(coords[0], days[dry]["date"]) is not True:
+                        continue
+                    indoor = next((a for a in groups[dry] if self._is_outdoor(a) is False), None)
+                    if indoor is None:
+                        continue
+                    wet_items = [indoor if a is outdoor else a for a in groups[wet]]
+                    dry_items = [outdoor if a is indoor else a for a in groups[dry]]
+                    day_points = (base + self._coords(wet_items), base + self._coords(dry_items))
+                    trial = self.matrix_builder.estimated(matrix, *day_points)
+                    if not self._no_worse(
+                        days, wet, dry,
+                        self._rebuilt_day(days[wet], start, wet_items, trial),
+                        self._rebuilt_day(days[dry], start, dry_items, trial),
+                    ):
+                        continue
+                    self.matrix_builder.extend(matrix, *day_points)
+                    wet_day = self._rebuilt_day(days[wet], start, wet_items, matrix)
+                    dry_day = self._rebuilt_day(days[dry], start, dry_items, matrix)
+                    if self._no_worse(days, wet, dry, wet_day, dry_day):
+                        groups[wet], groups[dry] = wet_items, dry_items
+                        days[wet], days[dry] = wet_day, dry_day
+                        break
+        return days
+
+    @staticmethod
+    def _no_worse(
+        days: List[Dict[str, Any]], wet: int, dry: int, wet_day: Dict[str, Any], dry_day: Dict[str, Any]
+    ) -> bool:
+        return (
+            wet_day["overflow_minutes"] <= days[wet]["overflow_minutes"]
+            and dry_day["overflow_minutes"] <= days[dry]["overflow_minutes"]
+        )
+
+    def _rebuilt_day(
+        self,
+        day: Dict[str, Any],
+        start: Optional[Tuple[float, float]],
+        attractions: List[Dict[str, Any]],
+        matrix: TravelMatrix,
+    ) -> Dict[str, Any]:
+        day_date = datetime.date.fromisoformat(day["date"])
+        return self._build_daily_route(day["day_index"], start, attractions, matrix, day_date)
+
+    def _travel_matrix(self, points: List[Tuple[float, float]]) -> List[List[Dict[str, float]]]:
+        """Pairwise travel between points, chunked to the Distance Matrix limits"""
+        return self.matrix_builder.build([points]).block(points)
+
+    @staticmethod
+    def _coords(attractions: List[Dict[str, Any]]) -> List[Tuple[float, float]]:
+        coords = []
+        for attraction in attractions:
+            loc = attraction.get("location", {})
+            if loc.get("lat") is not None and loc.get("lng") is not None:
+                coords.append((loc["lat"], loc["lng"]))
+        return coords
 
 
 itinerary_planner = ItineraryPlanner()
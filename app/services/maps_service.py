@@ -1,56 +1,325 @@
+import asyncio
 import logging
-from typing import Dict, List, Optional, Tuple
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+import httpx
 import requests
 
 from ..config import settings
+from ..core.cache import TTLCache
+from ..core.geo import haversine_km
 from ..security.secrets_manager import get_api_keys
 
 logger = logging.getLogger(__name__)
 
+LegKey = Tuple[int, int, int, int, str]
+Matrix = List[List[Dict[str, float]]]
+
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+REQUEST_TIMEOUT_S = 10
+STORE_LOOKUP_CHUNK = 150  # Keys per SELECT: 5 bound values each stays under SQLite's 999-variable limit
+STORE_BUSY_TIMEOUT_S = 5  # Wait this long for another worker's write lock before giving up on the store
+
+
+def leg_key(
+    origin: Tuple[float, float], destination: Tuple[float, float], mode: str, precision: int = 5
+) -> LegKey:
+    """Cache key for a leg: coordinates rounded to ``precision`` decimals (about 1 m at 5)"""
+    scale = 10 ** precision
+    return (
+        int(round(origin[0] * scale)),
+        int(round(origin[1] * scale)),
+        int(round(destination[0] * scale)),
+        int(round(destination[1] * scale)),
+        mode,
+    )
+
+
+class TravelTimeStore:
+    """SQLite-backed travel legs that survive restarts.
+
+    Legs older than ``ttl`` seconds are ignored on read (and replaced by the
+    next write), so traffic-dependent durations are eventually re-fetched.
+    The store is only a cache shared between workers: a locked, read-only
+    or full database is logged and reads as empty, never failing a request.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None) -> None:
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=STORE_BUSY_TIMEOUT_S, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS travel_legs (
+                    origin_lat INTEGER, origin_lng INTEGER,
+                    dest_lat INTEGER, dest_lng INTEGER, mode TEXT,
+                    distance_km REAL, duration_minutes REAL, updated_at REAL,
+                    PRIMARY KEY (origin_lat, origin_lng, dest_lat, dest_lng, mode)
+                )
+                """
+            )
+
+    def get_many(self, keys: Iterable[LegKey]) -> Dict[LegKey, Dict[str, float]]:
+        """Unexpired legs for ``keys``, read with one query per ``STORE_LOOKUP_CHUNK`` keys"""
+        keys = list(keys)
+        oldest = time.time() - self.ttl if self.ttl else float("-inf")
+        found: Dict[LegKey, Dict[str, float]] = {}
+        try:
+            with self._lock:
+                for start in range(0, len(keys), STORE_LOOKUP_CHUNK):
+                    chunk = keys[start:start + STORE_LOOKUP_CHUNK]
+                    rows = self._conn.execute(
+                        "SELECT origin_lat, origin_lng, dest_lat, dest_lng, mode, distance_km, duration_minutes "
+                        "FROM travel_legs WHERE updated_at >= ? AND "
+                        "(origin_lat, origin_lng, dest_lat, dest_lng, mode) IN "
+                        f"(VALUES {', '.join(['(?, ?, ?, ?, ?)'] * len(chunk))})",
+                        [oldest, *(value for key in chunk for value in key)],
+                    ).fetchall()
+                    for row in rows:
+                        found[tuple(row[:5])] = {"distance_km": row[5], "duration_minutes": row[6]}
+        except sqlite3.Error as exc:
+            logger.error("Travel time store read failed for %d legs: %s", len(keys), exc)
+        return found
+
+    def put_many(self, legs: Dict[LegKey, Dict[str, float]]) -> None:
+        """Save ``legs``; a failed write is logged and dropped, the legs stay in the memory cache"""
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO travel_legs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(*key, leg["distance_km"], leg["duration_minutes"], now) for key, leg in legs.items()],
+                )
+        except sqlite3.Error as exc:
+            logger.error("Travel time store write failed for %d legs: %s", len(legs), exc)
+
+    def __len__(self) -> int:
+        try:
+            with self._lock:
+                return self._conn.execute("SELECT COUNT(*) FROM travel_legs").fetchone()[0]
+        except sqlite3.Error as exc:
+            logger.error("Travel time store count failed: %s", exc)
+            return 0
+
 
 class MapsService:
-    """Interact with Google Maps Distance Matrix API to estimate travel times."""
+    """Interact with Google Maps Distance Matrix API to estimate travel times.
 
-    def __init__(self) -> None:
+    Legs are cached by (rounded origin, rounded destination, mode): an
+    in-process LRU in front of an optional SQLite store. Only the cache misses
+    are sent to the API.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None) -> None:
         api_keys = get_api_keys()
         self.api_key = settings.GOOGLE_MAPS_API_KEY or api_keys.get("maps")
+        self._memory = TTLCache(
+            maxsize=settings.TRAVEL_CACHE_MEMORY_SIZE, ttl=settings.TRAVEL_CACHE_TTL_SECONDS
+        )
+        self._store_path = settings.TRAVEL_CACHE_PATH if cache_path is None else cache_path
+        self._store: Optional[TravelTimeStore] = None
+        self._store_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "store_hits": 0, "misses": 0, "api_requests": 0, "api_elements": 0}
+        # App-lifetime pooled client, set at startup; async calls open their own when it is None
+        self.http_client: Optional[httpx.AsyncClient] = None
 
     def is_configured(self) -> bool:
         return bool(self.api_key)
 
+    @property
+    def store(self) -> Optional[TravelTimeStore]:
+        """Persistent leg store, opened on first use"""
+        if self._store is None and self._store_path:
+            with self._store_lock:
+                if self._store is None and self._store_path:
+                    try:
+                        self._store = TravelTimeStore(self._store_path, ttl=settings.TRAVEL_CACHE_TTL_SECONDS)
+                    except (sqlite3.Error, OSError) as exc:
+                        logger.error("Travel time store unavailable at %s: %s", self._store_path, exc)
+                        self._store_path = ""
+        return self._store
+
     def distance_matrix(
         self,
         origins: List[Tuple[float, float]],
         destinations: List[Tuple[float, float]],
         mode: str = "driving",
-    ) -> Optional[List[List[Dict[str, float]]]]:
+    ) -> Optional[Matrix]:
         if not self.api_key:
             logger.warning("Google Maps API key not configured")
             return None
 
-        params = {
+        keys, legs, miss_origins, miss_destinations = self._lookup(origins, destinations, mode)
+        if miss_origins:
+            fetched = self._request_matrix(
+                [origins[i] for i in miss_origins], [destinations[j] for j in miss_destinations], mode
+            )
+            if fetched is None and not legs:
+                return None
+            if fetched is not None:
+                self._absorb(keys, legs, miss_origins, miss_destinations, fetched)
+        # After a failed request the cached legs are still returned; only the missed ones stay empty
+        return self._assemble(keys, legs)
+
+    async def distance_matrix_async(
+        self,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+        mode: str = "driving",
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> Optional[Matrix]:
+        """Non-blocking ``distance_matrix`` over the same leg cache"""
+        if not self.api_key:
+            logger.warning("Google Maps API key not configured")
+            return None
+
+        # The SQLite store blocks, so it is read and written from a worker thread
+        keys, legs, miss_origins, miss_destinations = await asyncio.to_thread(
+            self._lookup, origins, destinations, mode
+        )
+        if miss_origins:
+            fetched = await self._request_matrix_async(
+                [origins[i] for i in miss_origins], [destinations[j] for j in miss_destinations], mode, client
+            )
+            if fetched is None and not legs:
+                return None
+            if fetched is not None:
+                await asyncio.to_thread(self._absorb, keys, legs, miss_origins, miss_destinations, fetched)
+        return self._assemble(keys, legs)
+
+    def _lookup(
+        self,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+        mode: str,
+    ) -> Tuple[List[List[LegKey]], Dict[LegKey, Dict[str, float]], List[int], List[int]]:
+        """Cached legs plus the origin and destination indices that still need the API"""
+        keys = [[leg_key(o, d, mode) for d in destinations] for o in origins]
+        legs: Dict[LegKey, Dict[str, float]] = {}
+        missing: List[LegKey] = []
+        for key in {key for row in keys for key in row}:
+            leg = self._memory.get(key)
+            if leg is not None:
+                legs[key] = leg
+            else:
+                missing.append(key)
+        memory_hits = len(legs)
+        store = self.store
+        if missing and store is not None:
+            stored = store.get_many(missing)
+            for key, leg in stored.items():
+                self._memory.set(key, leg)
+            legs.update(stored)
+        store_hits = len(legs) - memory_hits
+
+        # Request only the origins and destinations that still have a missing leg
+        miss_origins = [i for i, row in enumerate(keys) if any(key not in legs for key in row)]
+        miss_destinations = [
+            j for j in range(len(destinations)) if any(keys[i][j] not in legs for i in miss_origins)
+        ]
+        self._record(memory_hits, store_hits, len({key for row in keys for key in row}) - len(legs))
+        return keys, legs, miss_origins, miss_destinations
+
+    def _absorb(
+        self,
+        keys: List[List[LegKey]],
+        legs: Dict[LegKey, Dict[str, float]],
+        miss_origins: List[int],
+        miss_destinations: List[int],
+        fetched: Matrix,
+    ) -> None:
+        """Merge a fetched sub-matrix into ``legs`` and both cache layers"""
+        new_legs: Dict[LegKey, Dict[str, float]] = {}
+        for a, i in enumerate(miss_origins):
+            for b, j in enumerate(miss_destinations):
+                leg = fetched[a][b] if a < len(fetched) and b < len(fetched[a]) else None
+                if leg and leg.get("distance_km") is not None:
+                    new_legs[keys[i][j]] = leg
+        for key, leg in new_legs.items():
+            self._memory.set(key, leg)
+        store = self.store
+        if new_legs and store is not None:
+            store.put_many(new_legs)
+        legs.update(new_legs)
+
+    @staticmethod
+    def _assemble(keys: List[List[LegKey]], legs: Dict[LegKey, Dict[str, float]]) -> Matrix:
+        empty = {"distance_km": None, "duration_minutes": None}
+        return [[dict(legs.get(key, empty)) for key in row] for row in keys]
+
+    def _matrix_params(
+        self,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+        mode: str,
+    ) -> Dict[str, str]:
+        with self._stats_lock:
+            self._stats["api_requests"] += 1
+            self._stats["api_elements"] += len(origins) * len(destinations)
+
+        return {
             "origins": "|".join(f"{lat},{lng}" for lat, lng in origins),
             "destinations": "|".join(f"{lat},{lng}" for lat, lng in destinations),
             "key": self.api_key,
             "mode": mode,
         }
 
-        url = "https://maps.googleapis.com/maps/api/distancematrix/json"
-
+    def _request_matrix(
+        self,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+        mode: str,
+    ) -> Optional[Matrix]:
+        params = self._matrix_params(origins, destinations, mode)
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = requests.get(DISTANCE_MATRIX_URL, params=params, timeout=REQUEST_TIMEOUT_S)
             response.raise_for_status()
             payload = response.json()
         except requests.RequestException as exc:
             logger.error("Google Distance Matrix error: %s", exc)
             return None
 
+        return self._parse_matrix(payload)
+
+    async def _request_matrix_async(
+        self,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+        mode: str,
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> Optional[Matrix]:
+        client = client or self.http_client
+        if client is None:
+            async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT_S) as own_client:
+                return await self._request_matrix_async(origins, destinations, mode, own_client)
+
+        params = self._matrix_params(origins, destinations, mode)
+        try:
+            response = await client.get(DISTANCE_MATRIX_URL, params=params)
+            response.raise_for_status()
+            payload = response.json()
+        except (httpx.HTTPError, ValueError) as exc:
+            logger.error("Google Distance Matrix error: %s", exc)
+            return None
+
+        return self._parse_matrix(payload)
+
+    @staticmethod
+    def _parse_matrix(payload: Dict[str, Any]) -> Optional[Matrix]:
         if payload.get("status") != "OK":
             logger.error("Distance Matrix API returned status %s", payload.get("status"))
             return None
 
-        matrix: List[List[Dict[str, float]]] = []
+        matrix: Matrix = []
         for row in payload.get("rows", []):
             elements: List[Dict[str, float]] = []
             for element in row.get("elements", []):
@@ -66,20 +335,25 @@ class MapsService:
             matrix.append(elements)
         return matrix
 
+    def _record(self, memory_hits: int, store_hits: int, misses: int) -> None:
+        with self._stats_lock:
+            self._stats["memory_hits"] += memory_hits
+            self._stats["store_hits"] += store_hits
+            self._stats["misses"] += misses
+
+    def cache_stats(self) -> Dict[str, float]:
+        """Travel-time cache hit rates and Distance Matrix usage"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["store_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["store_hits"]) / lookups, 4) if lookups else 0.0
+        stats["memory_size"] = len(self._memory)
+        stats["store_size"] = len(self._store) if self._store is not None else 0
+        return stats
+
     @staticmethod
     def haversine_distance(origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
         """Fallback distance calculation in kilometers."""
-        from math import radians, cos, sin, asin, sqrt
-
-        lat1, lon1 = origin
-        lat2, lon2 = destination
-        lon_diff = radians(lon2 - lon1)
-        lat_diff = radians(lat2 - lat1)
-
-        a = sin(lat_diff / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(lon_diff / 2) ** 2
-        c = 2 * asin(sqrt(a))
-        radius_earth_km = 6371
-        return round(radius_earth_km * c, 2)
-
+        return round(haversine_km(origin[0], origin[1], destination[0], destination[1]), 2)
 
 maps_service = MapsService()
@@ -1,12 +1,25 @@
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Set, Tuple
+import asyncio
+import json
 import logging
+
+import numpy as np
+
+from ..config import settings
+from ..core.cache import TTLCache
+from ..core.geo import geohash_center, geohash_encode
 from ..core.recommendation import HybridRecommender
+from ..core.recommendation.catalog import AttractionCatalog, stable_hash
+from ..core.recommendation.features import DURATION_FULL_DAY, DURATION_HALF_DAY
 from ..schemas.recommendation import (
     RecommendationRequest,
     RecommendationResponse,
     AttractionRecommendation,
 )
+from .attraction_service import normalise_attraction
 from .open_data_service import load_default_sources
+from .weather_service import weather_service
 
 logger = logging.getLogger(__name__)
 
@@ -14,41 +27,80 @@ class RecommendationService:
     """Recommendation Service Layer with Distance Filtering"""
     
     def __init__(self):
-        self.recommender = HybridRecommender()
+        self.recommender = HybridRecommender({'variety_mode': settings.RECOMMENDATION_VARIETY_MODE})
+        self.weather = weather_service
+        self.weather_timeout = settings.RECOMMENDATION_WEATHER_TIMEOUT_SECONDS
+        self._weather_lookups: Set[asyncio.Task] = set()  # Lookups that outlived their response
         self._attractions_cache = []
+        self._catalog: Optional[AttractionCatalog] = None
+        self._generation = 0
+        self.variety_mode = settings.RECOMMENDATION_VARIETY_MODE
+        self.cache_precision = settings.RECOMMENDATION_CACHE_GEOHASH_PRECISION
+        self.cache_per_user = settings.RECOMMENDATION_CACHE_PER_USER
+        self._result_cache: Optional[TTLCache] = None
+        if settings.RECOMMENDATION_CACHE_SIZE > 0:
+            self._result_cache = TTLCache(
+                maxsize=settings.RECOMMENDATION_CACHE_SIZE,
+                ttl=settings.RECOMMENDATION_CACHE_TTL_SECONDS,
+            )
         self.is_initialized = False
         
-    async def initialize(self, attractions_data: List[Dict[str, Any]]):
-        """Initialize the service"""
+    async def initialize(self, attractions_data: List[Dict[str, Any]], catalog: Optional[AttractionCatalog] = None):
+        """Initialize the service, indexing ``attractions_data`` unless its ``catalog`` is passed in"""
         try:
-            await self.recommender.load_data(attractions_data)
-            self._attractions_cache = attractions_data
+            # One catalog (with its id index) is shared with the recommender and
+            # swapped in whole, so lookups always match the loaded dataset
+            if catalog is None:
+                catalog = AttractionCatalog(attractions_data)
+            await self.recommender.load_data(attractions_data, catalog=catalog)
+            self._catalog = catalog
+            self._attractions_cache = catalog.attractions
+            # Cached results refer to the previous dataset
+            self._generation += 1
+            if self._result_cache is not None:
+                self._result_cache.clear()
             self.is_initialized = True
             logger.info(f"Recommendation service initialized successfully, loaded {len(attractions_data)} attractions")
         except Exception as e:
             logger.error(f"Recommendation service initialization failed: {str(e)}")
             raise
     
+    @property
+    def catalog(self) -> Optional[AttractionCatalog]:
+        """The loaded catalog, shared with the attraction API; ``None`` before initialization"""
+        return self._catalog
+
+    def get_attraction(self, attraction_id: str) -> Optional[Dict[str, Any]]:
+        """A loaded attraction by id, in the attraction API's shape; ``None`` when unknown"""
+        catalog = self._catalog
+        row = catalog.row_for_id(attraction_id) if catalog is not None else None
+        return normalise_attraction(catalog, row) if row is not None else None
+
+    async def _ensure_initialized(self):
+        """Load attractions on first use if initialize was never called"""
+        if self.is_initialized:
+            return
+        logger.warning("Recommendation service not initialized, initializing now...")
+        # Try to load from configured open-data sources first
+        try:
+            open_data = load_default_sources()
+            if open_data:
+                logger.info(f"Loaded {len(open_data)} attractions from open-data sources")
+                await self.initialize(open_data)
+            else:
+                from ..data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
+                if not SAMPLE_NZ_ATTRACTIONS:
+                    logger.error("No sample attractions data available")
+                    raise ValueError("No attractions data available")
+                logger.info(f"Loading {len(SAMPLE_NZ_ATTRACTIONS)} sample attractions")
+                await self.initialize(SAMPLE_NZ_ATTRACTIONS)
+        except Exception as e:
+            logger.error(f"Failed to initialize recommendation service: {str(e)}")
+            raise
+
     async def get_recommendations(self, request: RecommendationRequest) -> RecommendationResponse:
         """Get personalized recommendations with distance filtering"""
-        if not self.is_initialized:
-            logger.warning("Recommendation service not initialized, initializing now...")
-            # Try to load from configured open-data sources first
-            try:
-                open_data = load_default_sources()
-                if open_data:
-                    logger.info(f"Loaded {len(open_data)} attractions from open-data sources")
-                    await self.initialize(open_data)
-                else:
-                    from ..data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
-                    if not SAMPLE_NZ_ATTRACTIONS:
-                        logger.error("No sample attractions data available")
-                        raise ValueError("No attractions data available")
-                    logger.info(f"Loading {len(SAMPLE_NZ_ATTRACTIONS)} sample attractions")
-                    await self.initialize(SAMPLE_NZ_ATTRACTIONS)
-            except Exception as e:
-                logger.error(f"Failed to initialize recommendation service: {str(e)}")
-                raise
+        await self._ensure_initialized()
 
         try:
             logger.info(f"Processing recommendation request for user {request.user_id}")
@@ -56,97 +108,254 @@ class RecommendationService:
             logger.info(f"Max travel distance: {request.preferences.max_travel_distance}km")
 
             # Prepare location data for the recommender
-            current_location = None
-            if request.current_location:
-                current_location = {
-                    'lat': request.current_location.lat,
-                    'lng': request.current_location.lng,
-                    'address': request.current_location.address
-                }
+            current_location = self._location_of(request)
+            if current_location:
                 logger.info(f"User location: {current_location}")
 
-            # Get recommendations from the hybrid recommender
-            raw_recommendations = await self.recommender.recommend(
-                user_id=request.user_id,
-                preferences=request.preferences.dict(),
-                current_location=current_location,
-                exclude_visited=request.exclude_visited,
-                top_k=request.top_k
-            )
+            catalog = self._catalog
+            key, query = self._scoring_query(request, current_location)
+            scored = self._result_cache.get(key) if key is not None else None
+            if scored is None:
+                scored = (self._point(current_location), await self.recommender.recommend_candidates(**query))
+                if key is not None:
+                    self._result_cache.set(key, scored)
+            measured_from, candidates = scored
+            logger.info(f"Got {len(candidates)} raw recommendations")
 
-            logger.info(f"Got {len(raw_recommendations)} raw recommendations")
-
-            # Convert to detailed recommendation results
-            detailed_recommendations = []
-            for attraction_id, score in raw_recommendations:
-                attraction_info = self._find_attraction_by_id(attraction_id)
-                if attraction_info:
-                    # Calculate price range based on price level
-                    price_level = attraction_info.get('features', {}).get('price_level', 3)
-                    base_price = 50 * price_level
-                    price_range = [base_price, base_price * 2]
-
-                    # Extract main category
-                    categories = attraction_info.get('categories', [])
-                    main_category = categories[0] if categories else 'general'
-
-                    # Calculate distance (use cached distance if available)
-                    distance = attraction_info.get('_calculated_distance')
-                    if distance is None and request.current_location:
-                        distance = self._calculate_distance_to_user(
-                            attraction_info, 
-                            request.current_location
-                        )
-
-                    recommendation = AttractionRecommendation(
-                        id=str(attraction_id),
-                        name=attraction_info.get('name', 'Unknown Attraction'),
-                        description=attraction_info.get('description', ''),
-                        category=main_category,
-                        categories=categories,
-                        location=attraction_info.get('location', {}),
-                        rating=attraction_info.get('rating', {}).get('average', 4.0),
-                        confidence_score=score,
-                        reasons=self._generate_reasons(attraction_info, request.preferences, distance),
-                        distance=round(distance, 1) if distance else None,
-                        price_range=price_range,
-                        estimated_time=attraction_info.get('estimated_duration', '2-3 hours'),
-                        weather_suitable=True,
-                        features=attraction_info.get('features', {})
-                    )
-                    detailed_recommendations.append(recommendation)
-                    
-            logger.info(f"Generated {len(detailed_recommendations)} detailed recommendations")
-            
-            # Generate context message based on distance filtering
-            context_message = self._generate_context_message(
-                len(detailed_recommendations), 
-                request.preferences.max_travel_distance,
-                request.current_location.address if request.current_location else None
-            )
-            
-            return RecommendationResponse(
-                recommendations=detailed_recommendations,
-                total_count=len(detailed_recommendations),
-                algorithm_used="hybrid_with_distance",
-                context={
-                    "user_preferences": request.preferences.dict(),
-                    "location_provided": request.current_location is not None,
-                    "excluded_count": len(request.exclude_visited),
-                    "max_distance_km": request.preferences.max_travel_distance,
-                    "message": context_message
-                }
+            outdoor_weather = await self._outdoor_weather(catalog, [candidates])
+            return self._build_response(
+                request, current_location, candidates, catalog, outdoor_weather, measured_from
             )
-            
+
         except Exception as e:
             logger.error(f"Error occurred while generating recommendations: {str(e)}")
-            return RecommendationResponse(
-                recommendations=[],
-                total_count=0,
-                algorithm_used="error",
-                context={"error": str(e)}
+            return self._error_response(e)
+
+    async def get_recommendations_batch(self, requests: List[RecommendationRequest]) -> List[RecommendationResponse]:
+        """Recommendations for many requests; cache misses are scored together in one pass"""
+        await self._ensure_initialized()
+
+        try:
+            catalog = self._catalog
+            locations = [self._location_of(request) for request in requests]
+            plans = [self._scoring_query(request, location) for request, location in zip(requests, locations)]
+            results: List[Any] = [
+                self._result_cache.get(key) if key is not None else None for key, _ in plans
+            ]
+
+            misses = [i for i, scored in enumerate(results) if scored is None]
+            if misses:
+                scored = await self.recommender.recommend_batch([plans[i][1] for i in misses])
+                for i, candidates in zip(misses, scored):
+                    results[i] = (self._point(locations[i]), candidates)
+                    key = plans[i][0]
+                    if key is not None:
+                        self._result_cache.set(key, results[i])
+            logger.info(f"Batch of {len(requests)} recommendation requests, {len(misses)} scored")
+
+            outdoor_weather = await self._outdoor_weather(catalog, [candidates for _, candidates in results])
+            return [
+                self._build_response(request, location, candidates, catalog, outdoor_weather, measured_from)
+                for request, location, (measured_from, candidates) in zip(requests, locations, results)
+            ]
+
+        except Exception as e:
+            logger.error(f"Error occurred while generating batch recommendations: {str(e)}")
+            return [self._error_response(e) for _ in requests]
+
+    async def _outdoor_weather(
+        self, catalog: Optional[AttractionCatalog], candidate_lists: List[Any]
+    ) -> Dict[int, Optional[Dict[str, Any]]]:
+        """Current weather for every outdoor candidate's catalog row, from one batched lookup.
+
+        The response waits at most ``weather_timeout`` for it; after that
+        cached readings (stale ones included) are used and the lookup
+        finishes in the background, warming the cache for later requests.
+        """
+        if catalog is None:
+            return {}
+        rows = []
+        for candidates in candidate_lists:
+            for candidate in candidates:
+                row = catalog.row_for_id(candidate.attraction_id)
+                if row is not None and catalog.features[row].is_outdoor and catalog.has_location[row]:
+                    rows.append(row)
+        rows = list(dict.fromkeys(rows))
+        if not rows:
+            return {}
+        points = [
+            (catalog.attractions[row]['location']['lat'], catalog.attractions[row]['location']['lng'])
+            for row in rows
+        ]
+        lookup = asyncio.ensure_future(self.weather.get_weather_batch_async(points))
+        try:
+            weather = await asyncio.wait_for(asyncio.shield(lookup), self.weather_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Weather for {len(points)} outdoor attractions not ready, using cached readings")
+            self._weather_lookups.add(lookup)
+            lookup.add_done_callback(self._weather_lookup_done)
+            weather = self.weather.get_cached_weather_batch(points)
+        return dict(zip(rows, weather))
+
+    def _weather_lookup_done(self, lookup: asyncio.Task) -> None:
+        self._weather_lookups.discard(lookup)
+        if not lookup.cancelled() and lookup.exception() is not None:
+            logger.error(f"Background weather lookup failed: {lookup.exception()}")
+
+    @staticmethod
+    def _point(location: Optional[Dict[str, Any]]) -> Optional[Tuple[float, float]]:
+        return (location['lat'], location['lng']) if location else None
+
+    @staticmethod
+    def _location_of(request: RecommendationRequest) -> Optional[Dict[str, Any]]:
+        if not request.current_location:
+            return None
+        return {
+            'lat': request.current_location.lat,
+            'lng': request.current_location.lng,
+            'address': request.current_location.address
+        }
+
+    @staticmethod
+    def _error_response(error: Exception) -> RecommendationResponse:
+        return RecommendationResponse(
+            recommendations=[],
+            total_count=0,
+            algorithm_used="error",
+            context={"error": str(error)}
+        )
+
+    def _build_response(
+        self,
+        request: RecommendationRequest,
+        current_location: Optional[Dict[str, Any]],
+        candidates,
+        catalog: Optional[AttractionCatalog],
+        outdoor_weather: Optional[Dict[int, Optional[Dict[str, Any]]]] = None,
+        measured_from: Optional[Tuple[float, float]] = None,
+    ) -> RecommendationResponse:
+        """Turn ranked candidates into the API response.
+
+        ``measured_from`` is where the candidates' distances were measured;
+        they are used as-is unless a cached ranking from another location
+        in the geocell is being reused.
+        """
+        rows = [catalog.row_for_id(c.attraction_id) if catalog is not None else None for c in candidates]
+        distances = [c.distance_km for c in candidates]
+        known = [i for i, row in enumerate(rows) if row is not None]
+        if current_location and known and measured_from != self._point(current_location):
+            measured = catalog.distances_from(
+                current_location['lat'], current_location['lng'], np.asarray([rows[i] for i in known])
             )
-    
+            for i, distance in zip(known, measured.tolist()):
+                distances[i] = None if np.isnan(distance) else distance
+
+        # Convert to detailed recommendation results, reading the static
+        # features materialized when the catalog was loaded
+        detailed_recommendations = []
+        for candidate, row, distance in zip(candidates, rows, distances):
+            attraction_id, score = candidate.attraction_id, candidate.score
+            if row is not None:
+                attraction_info = catalog.attractions[row]
+                features = catalog.features[row]
+                categories = attraction_info.get('categories', [])
+
+                recommendation = AttractionRecommendation(
+                    id=str(attraction_id),
+                    name=attraction_info.get('name', 'Unknown Attraction'),
+                    description=attraction_info.get('description', ''),
+                    category=features.primary_category or 'general',
+                    categories=categories,
+                    location=attraction_info.get('location', {}),
+                    rating=attraction_info.get('rating', {}).get('average', 4.0),
+                    confidence_score=score,
+                    reasons=self._generate_reasons(catalog, row, request.preferences, distance),
+                    distance=round(distance, 1) if distance else None,
+                    price_range=list(features.price_range),
+                    estimated_time=features.estimated_duration if features.estimated_duration is not None else '2-3 hours',
+                    duration_minutes=features.duration_minutes,
+                    opening_window=list(features.opening_window) if features.opening_window else None,
+                    weather_suitable=self._weather_suitable((outdoor_weather or {}).get(row)),
+                    features=attraction_info.get('features', {})
+                )
+                detailed_recommendations.append(recommendation)
+
+        logger.info(f"Generated {len(detailed_recommendations)} detailed recommendations")
+
+        # Generate context message based on distance filtering
+        context_message = self._generate_context_message(
+            len(detailed_recommendations),
+            request.preferences.max_travel_distance,
+            request.current_location.address if request.current_location else None
+        )
+
+        return RecommendationResponse(
+            recommendations=detailed_recommendations,
+            total_count=len(detailed_recommendations),
+            algorithm_used="hybrid_with_distance",
+            context={
+                "user_preferences": request.preferences.dict(),
+                "location_provided": request.current_location is not None,
+                "excluded_count": len(request.exclude_visited),
+                "max_distance_km": request.preferences.max_travel_distance,
+                "message": context_message
+            }
+        )
+
+    @staticmethod
+    def _weather_suitable(weather: Optional[Dict[str, Any]]) -> bool:
+        # Only outdoor rows have weather; indoor venues and unknown weather count as suitable
+        return weather is None or weather.get('suitable_for_outdoor', True)
+
+    def _scoring_query(
+        self, request: RecommendationRequest, current_location: Optional[Dict[str, Any]]
+    ) -> Tuple[Optional[Tuple], Dict[str, Any]]:
+        """Result cache key (None when uncached) and recommender arguments for a request"""
+        query = {
+            'user_id': request.user_id,
+            'preferences': request.preferences.dict(),
+            'current_location': current_location,
+            'exclude_visited': request.exclude_visited,
+            'top_k': request.top_k,
+        }
+        if self._result_cache is None or self.variety_mode == 'random':
+            return None, query
+
+        # Score from the centre of the user's geocell so every request mapping
+        # to the same key produces, and can share, the same ranking
+        cell = None
+        if current_location:
+            cell = geohash_encode(current_location['lat'], current_location['lng'], self.cache_precision)
+            lat, lng = geohash_center(cell)
+            query['current_location'] = {'lat': lat, 'lng': lng}
+            query['distance_origin'] = current_location
+
+        key = self._result_cache_key(request, query['preferences'], cell)
+        query['seed'] = stable_hash(repr(key[1:]))
+        return key, query
+
+    def _result_cache_key(self, request: RecommendationRequest, preferences: Dict[str, Any], cell: Optional[str]) -> Tuple:
+        """Cache key: dataset generation, UTC day, geocell, normalized preferences, exclusions and top_k"""
+        normalized = {
+            name: sorted(value, key=str) if isinstance(value, list) else value
+            for name, value in preferences.items()
+        }
+        return (
+            self._generation,
+            datetime.now(timezone.utc).date().isoformat(),
+            request.user_id if self.cache_per_user else None,
+            cell,
+            json.dumps(normalized, sort_keys=True, default=str),
+            tuple(sorted(set(str(i) for i in request.exclude_visited))),
+            request.top_k,
+        )
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Result cache counters for sizing"""
+        if self._result_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, "geohash_precision": self.cache_precision, **self._result_cache.stats()}
+
     def _generate_context_message(self, recommendation_count: int, max_distance: float, location: str) -> str:
         """Generate helpful context message for the user"""
         if recommendation_count == 0:
@@ -158,14 +367,15 @@ class RecommendationService:
     
     def _find_attraction_by_id(self, attraction_id: str) -> Optional[Dict[str, Any]]:
         """Find attraction information by ID"""
-        for attraction in self._attractions_cache:
-            if str(attraction.get('id')) == attraction_id:
-                return attraction
-        return None
+        if self._catalog is None:
+            return None
+        return self._catalog.get(attraction_id)
     
-    def _generate_reasons(self, attraction: Dict[str, Any], preferences, distance: float = None) -> List[str]:
+    def _generate_reasons(self, catalog: AttractionCatalog, row: int, preferences, distance: float = None) -> List[str]:
         """Generate recommendation reasons including distance info"""
         reasons = []
+        attraction = catalog.attractions[row]
+        features = catalog.features[row]
         
         # Distance-based reason
         if distance is not None:
@@ -185,53 +395,23 @@ class RecommendationService:
             reasons.append(f"Matches your interests: {', '.join(list(matching_activities)[:2])}")
 
         # Rating-based reasons
-        rating = attraction.get('rating', {})
-        if isinstance(rating, dict):
-            avg_rating = rating.get('average', 0)
-            if avg_rating >= 4.5:
-                reasons.append(f"Highly rated attraction ({avg_rating}/5.0)")
-            elif avg_rating >= 4.0:
-                reasons.append(f"Great reviews ({avg_rating}/5.0)")
+        avg_rating = float(catalog.rating[row])
+        if avg_rating >= 4.5:
+            reasons.append(f"Highly rated attraction ({avg_rating}/5.0)")
+        elif avg_rating >= 4.0:
+            reasons.append(f"Great reviews ({avg_rating}/5.0)")
 
         # Popularity-based reasons
-        review_count = attraction.get('review_count', 0)
+        review_count = catalog.review_count[row]
         if review_count > 2000:
             reasons.append("Very popular destination")
         elif review_count > 1000:
             reasons.append("Popular with travelers")
 
         # Duration-based reasons
-        estimated_time = attraction.get('estimated_duration', '')
-        if 'full_day' in estimated_time.lower():
+        if features.duration_kind == DURATION_FULL_DAY:
             reasons.append("Perfect for a full day adventure")
-        elif 'half_day' in estimated_time.lower():
+        elif features.duration_kind == DURATION_HALF_DAY:
             reasons.append("Great for half-day exploration")
 
         return reasons[:3]  # Limit to 3 most relevant reasons
-
-    def _calculate_distance_to_user(self, attraction: Dict[str, Any], user_location) -> Optional[float]:
-        """Calculate distance between attraction and user location"""
-        if not user_location or 'location' not in attraction:
-            return None
-            
-        attraction_location = attraction['location']
-        if 'lat' not in attraction_location or 'lng' not in attraction_location:
-            return None
-            
-        import math
-        R = 6371  # Earth radius in kilometers
-
-        user_lat = user_location.lat
-        user_lng = user_location.lng
-            
-        lat1 = math.radians(user_lat)
-        lat2 = math.radians(attraction_location['lat'])
-        delta_lat = math.radians(attraction_location['lat'] - user_lat)
-        delta_lng = math.radians(attraction_location['lng'] - user_lng)
-        
-        a = (math.sin(delta_lat/2) * math.sin(delta_lat/2) +
-             math.cos(lat1) * math.cos(lat2) *
-             math.sin(delta_lng/2) * math.sin(delta_lng/2))
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
\ No newline at end of file
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+from ..core.planning.road_network import ContractionHierarchy, load_road_network
+
+logger = logging.getLogger(__name__)
+
+
+class RoadNetworkRouter:
+    """Driving legs from a local road graph, shaped like ``MapsService.distance_matrix``.
+
+    Each point is snapped to its nearest road node; the walk or drive to
+    that node is added as a straight access leg. Points further than
+    ``SNAP_MAX_KM`` from the network, and unreachable pairs, have no leg.
+
+    Only pre-contracted hierarchies (``scripts/build_road_graph.py``) are
+    loaded; contracting a raw graph is far too slow to do while serving.
+    """
+
+    SNAP_MAX_KM = 5.0
+    ACCESS_SPEED_KMH = 30.0  # Driveways, car parks and unmapped side roads
+
+    def __init__(self, graph_path: Optional[str] = None) -> None:
+        self._graph_path = settings.ROAD_GRAPH_PATH if graph_path is None else graph_path
+        self._hierarchy: Optional[ContractionHierarchy] = None
+        self._lock = threading.Lock()
+
+    def is_configured(self) -> bool:
+        return self.hierarchy is not None
+
+    async def load(self) -> bool:
+        """Load the hierarchy in a worker thread, so start-up can warm it off the event loop"""
+        return await asyncio.to_thread(self.is_configured)
+
+    @property
+    def hierarchy(self) -> Optional[ContractionHierarchy]:
+        """Contraction hierarchy of the road graph, loaded on first use unless ``load`` ran at start-up"""
+        if self._hierarchy is None and self._graph_path:
+            with self._lock:
+                if self._hierarchy is None and self._graph_path:
+                    try:
+                        self._hierarchy = load_road_network(self._graph_path, contract=False)
+                        logger.info("Loaded road graph with %s nodes from %s", len(self._hierarchy.graph), self._graph_path)
+                    except (OSError, ValueError, KeyError, IndexError) as exc:
+                        logger.error("Road graph unavailable at %s: %s", self._graph_path, exc)
+                        self._graph_path = ""
+        return self._hierarchy
+
+    def distance_matrix(
+        self,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+        mode: str = "driving",
+    ) -> Optional[List[List[Dict[str, Optional[float]]]]]:
+        hierarchy = self.hierarchy
+        if hierarchy is None:
+            return None
+        if mode != "driving":
+            logger.warning("Road graph only covers driving, not %s", mode)
+            return None
+
+        origin_snaps = [hierarchy.graph.snap(lat, lng, self.SNAP_MAX_KM) for lat, lng in origins]
+        destination_snaps = [hierarchy.graph.snap(lat, lng, self.SNAP_MAX_KM) for lat, lng in destinations]
+        sources = sorted({snap[0] for snap in origin_snaps if snap})
+        targets = sorted({snap[0] for snap in destination_snaps if snap})
+        minutes, km = hierarchy.many_to_many(sources, targets)
+        source_index = {node: i for i, node in enumerate(sources)}
+        target_index = {node: j for j, node in enumerate(targets)}
+
+        empty = {"distance_km": None, "duration_minutes": None}
+        matrix: List[List[Dict[str, Optional[float]]]] = []
+        for origin_snap in origin_snaps:
+            row: List[Dict[str, Optional[float]]] = []
+            for destination_snap in destination_snaps:
+                if origin_snap is None or destination_snap is None:
+                    row.append(dict(empty))
+                    continue
+                i = source_index[origin_snap[0]]
+                j = target_index[destination_snap[0]]
+                if not np.isfinite(minutes[i, j]):
+                    row.append(dict(empty))
+                    continue
+                access_km = origin_snap[1] + destination_snap[1]
+                row.append({
+                    "distance_km": round(float(km[i, j]) + access_km, 2),
+                    "duration_minutes": round(float(minutes[i, j]) + access_km / self.ACCESS_SPEED_KMH * 60, 1),
+                })
+            matrix.append(row)
+        return matrix
+
+
+road_router = RoadNetworkRouter()
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import httpx
+import numpy as np
+
+from ..core.geo import haversine_km_rad
+from .maps_service import REQUEST_TIMEOUT_S
+
+logger = logging.getLogger(__name__)
+
+Point = Tuple[float, float]
+Leg = Dict[str, Optional[float]]
+Tile = Tuple[List[int], List[int]]
+
+
+def _point_key(point: Point) -> Tuple[float, float]:
+    return (round(point[0], 6), round(point[1], 6))
+
+
+class TravelMatrix:
+    """Travel legs between a trip's deduplicated points."""
+
+    def __init__(self, points: List[Point], legs: Dict[Tuple[int, int], Leg]) -> None:
+        self.points = points
+        self._index = {_point_key(point): i for i, point in enumerate(points)}
+        self._legs = legs
+        self.api_requests = 0
+        self.api_elements = 0
+        self.offline_legs = 0
+
+    def index(self, point: Point) -> int:
+        return self._index[_point_key(point)]
+
+    def add_point(self, point: Point) -> int:
+        """Index of ``point``, appending it when new"""
+        key = _point_key(point)
+        if key not in self._index:
+            self._index[key] = len(self.points)
+            self.points.append(point)
+        return self._index[key]
+
+    def missing_pairs(self, indices: Sequence[int]) -> Set[Tuple[int, int]]:
+        return {(i, j) for i in indices for j in indices if i != j and (i, j) not in self._legs}
+
+    def add_legs(self, legs: Dict[Tuple[int, int], Leg]) -> None:
+        self._legs.update(legs)
+
+    def copy(self) -> "TravelMatrix":
+        """Independent matrix with the same points and legs, for trying out legs without keeping them"""
+        return TravelMatrix(list(self.points), dict(self._legs))
+
+    def leg(self, origin: Point, destination: Point) -> Leg:
+        i, j = self.index(origin), self.index(destination)
+        if i == j:
+            return {"distance_km": 0.0, "duration_minutes": 0.0}
+        return dict(self._legs[(i, j)])
+
+    def block(self, points: Sequence[Point]) -> List[List[Leg]]:
+        """Square sub-matrix of legs between ``points``, in the given order"""
+        return [[self.leg(origin, destination) for destination in points] for origin in points]
+
+
+class TravelMatrixBuilder:
+    """Fetch the travel legs a whole trip needs in one concurrent batch of Maps calls.
+
+    Points are deduplicated across groups (each day shares the base, for
+    example) and only the pairs inside each group are requested. Requests are
+    tiled to the Distance Matrix limits and run concurrently (a thread pool for
+    ``build``, ``asyncio.gather`` for ``build_async``). Legs the API cannot
+    answer come from the offline road ``router`` when one is loaded, and
+    otherwise fall back to a haversine estimate.
+    """
+
+    MAX_ORIGINS = 25
+    MAX_DESTINATIONS = 25
+    MAX_ELEMENTS = 100
+    MAX_WORKERS = 8
+
+    def __init__(self, maps, average_speed_kmh: float = 50.0, router=None) -> None:
+        self.maps = maps
+        self.average_speed_kmh = average_speed_kmh
+        self.router = router
+
+    def build(self, groups: Iterable[Sequence[Point]]) -> TravelMatrix:
+        points, needed, tiles = self._plan(groups)
+        results = []
+        if tiles:
+            with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(tiles))) as pool:
+                results = list(pool.map(lambda tile: self._fetch(points, tile), tiles))
+        return self._assemble(points, needed, tiles, results)
+
+    async def build_async(self, groups: Iterable[Sequence[Point]]) -> TravelMatrix:
+        """``build`` on the event loop: every tile is requested at once with ``asyncio.gather``"""
+        points, needed, tiles = self._plan(groups)
+        results = []
+        if tiles:
+            client = self.maps.http_client
+            if client is None:
+                async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT_S) as own_client:
+                    results = await self._fetch_tiles_async(points, tiles, own_client)
+            else:
+                results = await self._fetch_tiles_async(points, tiles, client)
+        # Offline routing is CPU-bound, so finish off the event loop
+        return await asyncio.to_thread(self._assemble, points, needed, tiles, results)
+
+    async def _fetch_tiles_async(
+        self, points: List[Point], tiles: List[Tile], client: httpx.AsyncClient
+    ) -> List[Optional[List[List[Leg]]]]:
+        return await asyncio.gather(*(
+            self.maps.distance_matrix_async(
+                [points[i] for i in origins], [points[j] for j in destinations], client=client
+            )
+            for origins, destinations in tiles
+        ))
+
+    def _plan(self, groups: Iterable[Sequence[Point]]) -> Tuple[List[Point], Set[Tuple[int, int]], List[Tile]]:
+        """Deduplicated points, the index pairs each group needs, and the tiles to request"""
+        points: List[Point] = []
+        index: Dict[Tuple[float, float], int] = {}
+        index_groups: List[List[int]] = []
+        for group in groups:
+            members: List[int] = []
+            for point in group:
+                key = _point_key(point)
+                if key not in index:
+                    index[key] = len(points)
+                    points.append(point)
+                if index[key] not in members:
+                    members.append(index[key])
+            index_groups.append(members)
+
+        needed: Set[Tuple[int, int]] = {
+            (i, j) for members in index_groups for i in members for j in members if i != j
+        }
+        tiles: List[Tile] = []
+        if self.maps.is_configured() and needed:
+            tiles = self._tiles(index_groups)
+        return points, needed, tiles
+
+    def _assemble(
+        self,
+        points: List[Point],
+        needed: Set[Tuple[int, int]],
+        tiles: List[Tile],
+        results: Sequence[Optional[List[List[Leg]]]],
+    ) -> TravelMatrix:
+        legs, offline = self._collect_legs(points, needed, tiles, results)
+        matrix = TravelMatrix(points, legs)
+        matrix.api_requests = len(tiles)
+        matrix.api_elements = sum(len(o) * len(d) for o, d in tiles)
+        matrix.offline_legs = offline
+        logger.info(
+            "Travel matrix: %s points, %s legs, %s Maps requests (%s elements), %s offline legs",
+            len(points), len(needed), matrix.api_requests, matrix.api_elements, offline,
+        )
+        return matrix
+
+    def extend(self, matrix: TravelMatrix, *groups: Sequence[Point]) -> None:
+        """Add the legs within each group that ``matrix`` lacks, e.g. after a stop moves to another day"""
+        index_groups, needed = self._missing(matrix, groups)
+        if not needed:
+            return
+        tiles: List[Tile] = []
+        if self.maps.is_configured():
+            # Tiles cover the whole groups; legs already known are served from the Maps leg cache
+            tiles = self._tiles(index_groups)
+        results = [self._fetch(matrix.points, tile) for tile in tiles]
+        legs, offline = self._collect_legs(matrix.points, needed, tiles, results)
+        matrix.add_legs({pair: leg for pair, leg in legs.items() if pair in needed})
+        matrix.api_requests += len(tiles)
+        matrix.api_elements += sum(len(o) * len(d) for o, d in tiles)
+        matrix.offline_legs += offline
+
+    def estimated(self, matrix: TravelMatrix, *groups: Sequence[Point]) -> TravelMatrix:
+        """Copy of ``matrix`` whose missing legs within each group are haversine estimates.
+
+        Makes no API calls, so callers can compare candidate days and
+        ``extend`` the real matrix only for the one they keep.
+        """
+        trial = matrix.copy()
+        _, needed = self._missing(trial, groups)
+        if needed:
+            pairs = sorted(needed)
+            trial.add_legs(dict(zip(pairs, self._estimate(trial.points, pairs))))
+        return trial
+
+    @staticmethod
+    def _missing(
+        matrix: TravelMatrix, groups: Iterable[Sequence[Point]]
+    ) -> Tuple[List[List[int]], Set[Tuple[int, int]]]:
+        """Each group's point indices (adding new points to ``matrix``) and the pairs it lacks"""
+        index_groups: List[List[int]] = []
+        needed: Set[Tuple[int, int]] = set()
+        for group in groups:
+            members: List[int] = []
+            for point in group:
+                index = matrix.add_point(point)
+                if index not in members:
+                    members.append(index)
+            index_groups.append(members)
+            needed |= matrix.missing_pairs(members)
+        return index_groups, needed
+
+    def _collect_legs(
+        self,
+        points: List[Point],
+        needed: Set[Tuple[int, int]],
+        tiles: List[Tile],
+        results: Sequence[Optional[List[List[Leg]]]],
+    ) -> Tuple[Dict[Tuple[int, int], Leg], int]:
+        """API legs from the tile results, then offline routes, then estimates for the rest"""
+        legs: Dict[Tuple[int, int], Leg] = {}
+        for (origins, destinations), rows in zip(tiles, results):
+            for a, i in enumerate(origins):
+                for b, j in enumerate(destinations):
+                    if i == j:
+                        continue
+                    leg = rows[a][b] if rows and a < len(rows) and b < len(rows[a]) else None
+                    if leg and leg.get("distance_km") is not None and leg.get("duration_minutes") is not None:
+                        legs[(i, j)] = leg
+
+        offline = 0
+        missing = [pair for pair in needed if pair not in legs]
+        if missing and self.router is not None and self.router.is_configured():
+            offline = self._route_offline(points, missing, legs)
+
+        remaining = [pair for pair in needed if pair not in legs]
+        if remaining:
+            legs.update(zip(remaining, self._estimate(points, remaining)))
+        return legs, offline
+
+    def _route_offline(
+        self, points: List[Point], missing: List[Tuple[int, int]], legs: Dict[Tuple[int, int], Leg]
+    ) -> int:
+        """Fill ``missing`` legs with one many-to-many road graph query; returns how many were found"""
+        origins = sorted({i for i, _ in missing})
+        destinations = sorted({j for _, j in missing})
+        rows = self.router.distance_matrix([points[i] for i in origins], [points[j] for j in destinations])
+        if not rows:
+            return 0
+        origin_pos = {i: a for a, i in enumerate(origins)}
+        destination_pos = {j: b for b, j in enumerate(destinations)}
+        found = 0
+        for i, j in missing:
+            leg = rows[origin_pos[i]][destination_pos[j]]
+            if leg.get("distance_km") is not None and leg.get("duration_minutes") is not None:
+                legs[(i, j)] = leg
+                found += 1
+        return found
+
+    def _tiles(self, index_groups: List[List[int]]) -> List[Tile]:
+        """Origin/destination chunks covering each group's pairs within the API limits"""
+        tiles: List[Tile] = []
+        covered: Set[Tuple[int, int]] = set()
+        for members in index_groups:
+            if len(members) < 2:
+                continue
+            per_request = min(len(members), self.MAX_DESTINATIONS)
+            origin_chunk = min(self.MAX_ORIGINS, max(1, self.MAX_ELEMENTS // per_request))
+            for o in range(0, len(members), origin_chunk):
+                origins = members[o:o + origin_chunk]
+                for d in range(0, len(members), per_request):
+                    destinations = members[d:d + per_request]
+                    pairs = {(i, j) for i in origins for j in destinations if i != j}
+                    if pairs and not pairs <= covered:
+                        tiles.append((origins, destinations))
+                        covered |= pairs
+        return tiles
+
+    def _fetch(self, points: List[Point], tile: Tile):
+        origins, destinations = tile
+        return self.maps.distance_matrix([points[i] for i in origins], [points[j] for j in destinations])
+
+    def _estimate(self, points: List[Point], pairs: List[Tuple[int, int]]) -> List[Leg]:
+        """Haversine legs at ``average_speed_kmh`` for all ``pairs`` in one vectorised pass"""
+        coords = np.radians(np.asarray(points, dtype=np.float64))
+        origins = np.asarray([i for i, _ in pairs], dtype=np.int64)
+        destinations = np.asarray([j for _, j in pairs], dtype=np.int64)
+        distances = np.round(haversine_km_rad(
+            coords[destinations, 0], coords[destinations, 1], coords[origins, 0], coords[origins, 1]
+        ), 2)
+        durations = np.round(distances / self.average_speed_kmh * 60, 1)
+        return [
+            {"distance_km": float(distance), "duration_minutes": float(duration)}
+            for distance, duration in zip(distances, durations)
+        ]
@@ -1,36 +1,259 @@
+import asyncio
+import datetime
 import logging
-import time
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 
+import httpx
 import requests
 
 from ..config import settings
+from ..core.cache import TTLCache
+from ..core.geo import geohash_center, geohash_encode
 from ..security.secrets_manager import get_api_keys
 
 
 logger = logging.getLogger(__name__)
 
+OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+OPEN_METEO_CURRENT = "temperature_2m,apparent_temperature,relative_humidity_2m,wind_speed_10m,weather_code"
+REQUEST_TIMEOUT_S = 10
+OPEN_METEO_DAILY = "weather_code,temperature_2m_max,temperature_2m_min,precipitation_probability_max"
+OPEN_METEO_FORECAST_DAYS = 16  # Furthest day ahead Open-Meteo forecasts
+# Open-Meteo takes comma-separated coordinate lists; 100 per call keeps the URL well under server limits
+OPEN_METEO_BATCH_SIZE = 100
+OPEN_METEO_UNSUITABLE = {"rain", "thunderstorm", "snow", "freezing rain"}
+WET_PRECIPITATION_PROBABILITY = 70  # Percent; a forecast day at or above this is unsuitable outdoors
+
 
 class WeatherService:
-    """Wrapper around weather providers with basic caching."""
+    """Wrapper around weather providers with a bounded, single-flight cache.
 
-    _CACHE_TTL = 900  # seconds
+    Weather is looked up per geohash cell (about 4.9 km square at the
+    default precision 5): every location in a cell shares one cached answer,
+    fetched for the cell's centroid. Expired cells are served stale while
+    they refresh, and a background task re-fetches the most requested cells
+    shortly before they expire so busy regions never wait on a provider.
+    Daily forecasts are cached separately, per (cell, date). Cells a
+    provider failed to answer are remembered briefly so they are not
+    refetched by every request.
+    """
 
     def __init__(self) -> None:
         api_keys = get_api_keys()
         self.api_key = settings.OPENWEATHER_API_KEY or api_keys.get("weather")
-        self._cache: Dict[str, Dict[str, Any]] = {}
+        self.precision = settings.WEATHER_GEOHASH_PRECISION
+        self.refresh_interval = settings.WEATHER_REFRESH_INTERVAL_SECONDS
+        self.refresh_top_n = settings.WEATHER_REFRESH_TOP_N
+        # Concurrent misses for one cell share a single provider call
+        self._cache = TTLCache(
+            maxsize=settings.WEATHER_CACHE_SIZE,
+            ttl=settings.WEATHER_CACHE_TTL_SECONDS,
+            stale_ttl=settings.WEATHER_STALE_TTL_SECONDS,
+            negative_ttl=settings.WEATHER_FAILURE_TTL_SECONDS,
+        )
+        self._forecasts = TTLCache(
+            maxsize=settings.WEATHER_FORECAST_CACHE_SIZE,
+            ttl=settings.WEATHER_FORECAST_TTL_SECONDS,
+            negative_ttl=settings.WEATHER_FAILURE_TTL_SECONDS,
+        )
+        self._refresher: Optional[asyncio.Task] = None
+        # App-lifetime pooled client, set at startup; async calls open their own when it is None
+        self.http_client: Optional[httpx.AsyncClient] = None
 
     def _build_cache_key(self, lat: float, lon: float) -> str:
-        return f"{lat:.4f},{lon:.4f}"
+        return geohash_encode(lat, lon, self.precision)
 
     def get_current_weather(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
-        cache_key = self._build_cache_key(lat, lon)
-        cached = self._cache.get(cache_key)
-        now = time.time()
-        if cached and now - cached["timestamp"] < self._CACHE_TTL:
-            return cached["data"]
+        cell = self._build_cache_key(lat, lon)
+        weather = self._cache.get_or_load(cell, lambda: self._fetch_current(*geohash_center(cell)))
+        return self._for_location(weather, cell, lat, lon)
+
+    async def get_current_weather_async(
+        self, lat: float, lon: float, client: Optional[httpx.AsyncClient] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Non-blocking ``get_current_weather`` sharing the same cache and providers"""
+        cell = self._build_cache_key(lat, lon)
+        weather = await self._cache.get_or_load_async(
+            cell, lambda: self._fetch_current_async(*geohash_center(cell), client)
+        )
+        return self._for_location(weather, cell, lat, lon)
+
+    def get_weather_batch(self, points: Sequence[Tuple[float, float]]) -> List[Optional[Dict[str, Any]]]:
+        """Current weather for each ``(lat, lon)``, in order, from one upstream call per 100 uncached cells.
+
+        Points are deduplicated into geohash cells; cached cells (stale ones
+        included, refreshed in the background) come from the cache, cells
+        another request is already fetching are waited on, and the rest are
+        fetched together from Open-Meteo's multi-location endpoint
+        (OpenWeather has no batch form).
+        """
+        cells = [self._build_cache_key(lat, lon) for lat, lon in points]
+        found = self._cache.get_or_load_many(cells, self._fetch_open_meteo_cells)
+        return [self._for_location(found.get(cell), cell, lat, lon) for cell, (lat, lon) in zip(cells, points)]
+
+    async def get_weather_batch_async(
+        self, points: Sequence[Tuple[float, float]], client: Optional[httpx.AsyncClient] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Non-blocking ``get_weather_batch``; chunks are fetched concurrently"""
+        cells = [self._build_cache_key(lat, lon) for lat, lon in points]
+        found = await self._cache.get_or_load_many_async(
+            cells, lambda missing: self._fetch_open_meteo_cells_async(missing, client)
+        )
+        return [self._for_location(found.get(cell), cell, lat, lon) for cell, (lat, lon) in zip(cells, points)]
+
+    def get_cached_weather_batch(self, points: Sequence[Tuple[float, float]]) -> List[Optional[Dict[str, Any]]]:
+        """``get_weather_batch`` from the cache alone, stale values included; never calls a provider"""
+        cells = [self._build_cache_key(lat, lon) for lat, lon in points]
+        return [
+            self._for_location(self._cache.get(cell, allow_stale=True), cell, lat, lon)
+            for cell, (lat, lon) in zip(cells, points)
+        ]
+
+    def _fetch_open_meteo_cells(self, cells: List[str]) -> Dict[str, Dict[str, Any]]:
+        fetched: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(cells), OPEN_METEO_BATCH_SIZE):
+            fetched.update(self._fetch_open_meteo_batch(cells[start:start + OPEN_METEO_BATCH_SIZE]))
+        return fetched
+
+    async def _fetch_open_meteo_cells_async(
+        self, cells: List[str], client: Optional[httpx.AsyncClient] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        client = client or self.http_client
+        if client is None:
+            async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT_S) as own_client:
+                return await self._fetch_open_meteo_cells_async(cells, own_client)
+
+        chunks = await asyncio.gather(*(
+            self._fetch_open_meteo_batch_async(cells[start:start + OPEN_METEO_BATCH_SIZE], client)
+            for start in range(0, len(cells), OPEN_METEO_BATCH_SIZE)
+        ))
+        fetched: Dict[str, Dict[str, Any]] = {}
+        for chunk in chunks:
+            fetched.update(chunk)
+        return fetched
+
+    def get_daily_forecast_batch(
+        self, points: Sequence[Tuple[float, float]], dates: Sequence[datetime.date]
+    ) -> List[Dict[str, Optional[Dict[str, Any]]]]:
+        """Daily forecast for each point, keyed by ISO date, from one upstream call per 100 uncached cells.
+
+        Entries are cached per (cell, date) and loaded single-flight like
+        current weather; dates past Open-Meteo's 16-day horizon come back
+        as ``None``.
+        """
+        cells = [self._build_cache_key(lat, lon) for lat, lon in points]
+        found = self._forecasts.get_or_load_many(self._forecast_keys(cells, dates), self._fetch_forecasts)
+        return [{day: found.get((cell, day)) for day in map(datetime.date.isoformat, dates)} for cell in cells]
+
+    async def get_daily_forecast_batch_async(
+        self,
+        points: Sequence[Tuple[float, float]],
+        dates: Sequence[datetime.date],
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> List[Dict[str, Optional[Dict[str, Any]]]]:
+        """Non-blocking ``get_daily_forecast_batch``; chunks are fetched concurrently"""
+        cells = [self._build_cache_key(lat, lon) for lat, lon in points]
+        found = await self._forecasts.get_or_load_many_async(
+            self._forecast_keys(cells, dates), lambda missing: self._fetch_forecasts_async(missing, client)
+        )
+        return [{day: found.get((cell, day)) for day in map(datetime.date.isoformat, dates)} for cell in cells]
+
+    @staticmethod
+    def _forecast_keys(cells: List[str], dates: Sequence[datetime.date]) -> List[Tuple[str, str]]:
+        """(cell, ISO date) for every distinct cell and each date Open-Meteo can forecast"""
+        today = datetime.date.today()
+        horizon = today + datetime.timedelta(days=OPEN_METEO_FORECAST_DAYS - 1)
+        days = sorted({day.isoformat() for day in dates if today <= day <= horizon})
+        return [(cell, day) for cell in dict.fromkeys(cells) for day in days]
+
+    @staticmethod
+    def _forecast_span(keys: List[Tuple[str, str]]) -> Tuple[List[str], List[str]]:
+        """The distinct cells among ``keys`` and the sorted dates to request for them"""
+        return list(dict.fromkeys(cell for cell, _ in keys)), sorted({day for _, day in keys})
+
+    def _fetch_forecasts(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        cells, days = self._forecast_span(keys)
+        fetched: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for start in range(0, len(cells), OPEN_METEO_BATCH_SIZE):
+            fetched.update(self._fetch_forecast_batch(cells[start:start + OPEN_METEO_BATCH_SIZE], days))
+        return fetched
+
+    async def _fetch_forecasts_async(
+        self, keys: List[Tuple[str, str]], client: Optional[httpx.AsyncClient] = None
+    ) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        client = client or self.http_client
+        if client is None:
+            async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT_S) as own_client:
+                return await self._fetch_forecasts_async(keys, own_client)
+
+        cells, days = self._forecast_span(keys)
+        chunks = await asyncio.gather(*(
+            self._fetch_forecast_batch_async(cells[start:start + OPEN_METEO_BATCH_SIZE], days, client)
+            for start in range(0, len(cells), OPEN_METEO_BATCH_SIZE)
+        ))
+        fetched: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for chunk in chunks:
+            fetched.update(chunk)
+        return fetched
+
+    @staticmethod
+    def _for_location(weather: Optional[Dict[str, Any]], cell: str, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        """The cell's shared weather, labelled with the coordinates the caller asked about"""
+        if weather is None:
+            return None
+        return {**weather, "location": {"lat": lat, "lon": lon}, "cell": cell}
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Weather cache occupancy, hit rate, evictions, coalesced lookups and stale serves, plus the forecast cache's"""
+        return {**self._cache.stats(), "forecast": self._forecasts.stats()}
+
+    async def refresh_hot_cells(self, client: Optional[httpx.AsyncClient] = None) -> int:
+        """Re-fetch the most requested cells that expire before the next pass; returns how many"""
+        due = [
+            cell for cell in self._cache.hot_keys(self.refresh_top_n)
+            if (self._cache.expires_in(cell) or 0.0) <= self.refresh_interval
+        ]
+        if not due:
+            return 0
+        client = client or self.http_client
+        if client is None:
+            async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT_S) as own_client:
+                return await self.refresh_hot_cells(own_client)
+
+        await asyncio.gather(*(
+            self._cache.refresh_async(cell, lambda cell=cell: self._fetch_current_async(*geohash_center(cell), client))
+            for cell in due
+        ))
+        return len(due)
+
+    async def _run_refresher(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                refreshed = await self.refresh_hot_cells()
+                if refreshed:
+                    logger.info("Refreshed weather for %d hot cells", refreshed)
+            except Exception as exc:
+                logger.error("Weather refresher error: %s", exc)
+
+    def start_refresher(self) -> None:
+        """Start the hot-cell refresher on the running event loop (no-op when disabled or running)"""
+        if self.refresh_interval <= 0 or (self._refresher is not None and not self._refresher.done()):
+            return
+        self._refresher = asyncio.get_running_loop().create_task(self._run_refresher())
 
+    async def stop_refresher(self) -> None:
+        if self._refresher is None:
+            return
+        self._refresher.cancel()
+        try:
+            await self._refresher
+        except asyncio.CancelledError:
+            pass
+        self._refresher = None
+
+    def _fetch_current(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
         weather: Optional[Dict[str, Any]] = None
         if self.api_key:
             weather = self._fetch_openweather(lat, lon)
@@ -38,22 +261,161 @@ class WeatherService:
         if weather is None:
             weather = self._fetch_open_meteo(lat, lon)
 
-        if weather is not None:
-            self._cache[cache_key] = {"timestamp": now, "data": weather}
+        return weather
+
+    async def _fetch_current_async(
+        self, lat: float, lon: float, client: Optional[httpx.AsyncClient] = None
+    ) -> Optional[Dict[str, Any]]:
+        client = client or self.http_client
+        if client is None:
+            async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT_S) as own_client:
+                return await self._fetch_current_async(lat, lon, own_client)
+
+        weather: Optional[Dict[str, Any]] = None
+        if self.api_key:
+            try:
+                response = await client.get(OPENWEATHER_URL, params=self._openweather_params(lat, lon))
+                response.raise_for_status()
+                weather = self._transform_openweather(response.json())
+            except (httpx.HTTPError, ValueError) as exc:
+                logger.error("Weather API error: %s", exc)
+
+        if weather is None:
+            try:
+                response = await client.get(OPEN_METEO_URL, params=self._open_meteo_params(lat, lon))
+                response.raise_for_status()
+                weather = self._parse_open_meteo(response.json())
+            except (httpx.HTTPError, ValueError) as exc:
+                logger.error("Open-Meteo fallback error: %s", exc)
 
         return weather
 
-    def _fetch_openweather(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
-        params = {
+    def _openweather_params(self, lat: float, lon: float) -> Dict[str, Any]:
+        return {
             "lat": lat,
             "lon": lon,
             "appid": self.api_key,
             "units": "metric",
         }
-        url = "https://api.openweathermap.org/data/2.5/weather"
 
+    @staticmethod
+    def _open_meteo_params(lat: float, lon: float) -> Dict[str, Any]:
+        return {
+            "latitude": lat,
+            "longitude": lon,
+            "current": OPEN_METEO_CURRENT,
+        }
+
+    @staticmethod
+    def _open_meteo_batch_params(cells: List[str]) -> Dict[str, Any]:
+        centers = [geohash_center(cell) for cell in cells]
+        return {
+            "latitude": ",".join(f"{lat:.5f}" for lat, _ in centers),
+            "longitude": ",".join(f"{lon:.5f}" for _, lon in centers),
+            "current": OPEN_METEO_CURRENT,
+        }
+
+    def _fetch_open_meteo_batch(self, cells: List[str]) -> Dict[str, Dict[str, Any]]:
+        try:
+            response = requests.get(OPEN_METEO_URL, params=self._open_meteo_batch_params(cells), timeout=REQUEST_TIMEOUT_S)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.RequestException, ValueError) as exc:
+            logger.error("Open-Meteo batch error for %d cells: %s", len(cells), exc)
+            return {}
+
+        return self._parse_batch(cells, payload)
+
+    async def _fetch_open_meteo_batch_async(self, cells: List[str], client: httpx.AsyncClient) -> Dict[str, Dict[str, Any]]:
+        try:
+            response = await client.get(OPEN_METEO_URL, params=self._open_meteo_batch_params(cells))
+            response.raise_for_status()
+            payload = response.json()
+        except (httpx.HTTPError, ValueError) as exc:
+            logger.error("Open-Meteo batch error for %d cells: %s", len(cells), exc)
+            return {}
+
+        return self._parse_batch(cells, payload)
+
+    def _parse_batch(self, cells: List[str], payload: Any) -> Dict[str, Dict[str, Any]]:
+        """Each cell's weather; a single location comes back as an object, several as a list"""
+        payloads = payload if isinstance(payload, list) else [payload]
+        fetched: Dict[str, Dict[str, Any]] = {}
+        for cell, item in zip(cells, payloads):
+            weather = self._parse_open_meteo(item) if isinstance(item, dict) else None
+            if weather is not None:
+                fetched[cell] = weather
+        return fetched
+
+    @staticmethod
+    def _forecast_params(cells: List[str], days: List[str]) -> Dict[str, Any]:
+        centers = [geohash_center(cell) for cell in cells]
+        return {
+            "latitude": ",".join(f"{lat:.5f}" for lat, _ in centers),
+            "longitude": ",".join(f"{lon:.5f}" for _, lon in centers),
+            "daily": OPEN_METEO_DAILY,
+            "timezone": "auto",
+            "start_date": days[0],
+            "end_date": days[-1],
+        }
+
+    def _fetch_forecast_batch(self, cells: List[str], days: List[str]) -> Dict[Tuple[str, str], Dict[str, Any]]:
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = requests.get(OPEN_METEO_URL, params=self._forecast_params(cells, days), timeout=REQUEST_TIMEOUT_S)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.RequestException, ValueError) as exc:
+            logger.error("Open-Meteo forecast error for %d cells: %s", len(cells), exc)
+            return {}
+
+        return self._parse_forecasts(cells, payload)
+
+    async def _fetch_forecast_batch_async(
+        self, cells: List[str], days: List[str], client: httpx.AsyncClient
+    ) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        try:
+            response = await client.get(OPEN_METEO_URL, params=self._forecast_params(cells, days))
+            response.raise_for_status()
+            payload = response.json()
+        except (httpx.HTTPError, ValueError) as exc:
+            logger.error("Open-Meteo forecast error for %d cells: %s", len(cells), exc)
+            return {}
+
+        return self._parse_forecasts(cells, payload)
+
+    def _parse_forecasts(self, cells: List[str], payload: Any) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """Every (cell, date) forecast in a single- or multi-location response"""
+        payloads = payload if isinstance(payload, list) else [payload]
+        fetched: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for cell, item in zip(cells, payloads):
+            daily = item.get("daily") if isinstance(item, dict) else None
+            if not daily:
+                continue
+            for index, day in enumerate(daily.get("time") or []):
+                fetched[(cell, day)] = self._transform_daily(daily, index)
+        return fetched
+
+    def _transform_daily(self, daily: Dict[str, Any], index: int) -> Dict[str, Any]:
+        def value(name: str) -> Optional[float]:
+            values = daily.get(name) or []
+            return values[index] if index < len(values) else None
+
+        condition = self._map_weather_code(value("weather_code"))
+        precipitation = value("precipitation_probability_max")
+        wet = precipitation is not None and precipitation >= WET_PRECIPITATION_PROBABILITY
+        return {
+            "date": daily["time"][index],
+            "condition": condition,
+            "temperature_max": value("temperature_2m_max"),
+            "temperature_min": value("temperature_2m_min"),
+            "precipitation_probability": precipitation,
+            "suitable_for_outdoor": condition.lower() not in OPEN_METEO_UNSUITABLE and not wet,
+            "source": "open-meteo",
+        }
+
+    def _fetch_openweather(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        try:
+            response = requests.get(OPENWEATHER_URL, params=self._openweather_params(lat, lon), timeout=REQUEST_TIMEOUT_S)
             response.raise_for_status()
             payload = response.json()
         except requests.RequestException as exc:
@@ -63,21 +425,17 @@ class WeatherService:
         return self._transform_openweather(payload)
 
     def _fetch_open_meteo(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
-        url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "current": "temperature_2m,apparent_temperature,relative_humidity_2m,wind_speed_10m,weather_code",
-        }
-
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = requests.get(OPEN_METEO_URL, params=self._open_meteo_params(lat, lon), timeout=REQUEST_TIMEOUT_S)
             response.raise_for_status()
             payload = response.json()
         except requests.RequestException as exc:
             logger.error("Open-Meteo fallback error: %s", exc)
             return None
 
+        return self._parse_open_meteo(payload)
+
+    def _parse_open_meteo(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         current = payload.get("current")
         if not current:
             return None
@@ -119,7 +477,7 @@ class WeatherService:
             "description": description,
             "icon": None,
             "wind_speed": wind,
-            "suitable_for_outdoor": condition_lower not in {"rain", "thunderstorm", "snow", "freezing rain"},
+            "suitable_for_outdoor": condition_lower not in OPEN_METEO_UNSUITABLE,
             "source": "open-meteo",
             "timestamp": current.get("time"),
         }
@@ -0,0 +1,59 @@
+"""Compare the scalar and vectorised haversine helpers in app.core.geo.
+
+Times a 1 x 100k one-to-many query (a user against a large catalog) and a
+60 x 60 many-to-many matrix (a trip's stops), using a per-pair loop over the
+pure-Python ``haversine_km`` as the baseline.
+
+    python scripts/benchmark_haversine.py
+    python scripts/benchmark_haversine.py --points 200000 --repeat 10
+"""
+
+import argparse
+import pathlib
+import sys
+import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import numpy as np  # noqa: E402
+
+from app.core.geo import haversine_km, many_to_many_km, one_to_many_km  # noqa: E402
+
+
+def _best(func, repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def _report(label: str, scalar: float, vectorised: float) -> None:
+    print(f"{label:<18} scalar {scalar * 1000:9.2f} ms   vectorised {vectorised * 1000:8.3f} ms   {scalar / vectorised:7.1f}x")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=100_000, help="Targets in the one-to-many case")
+    parser.add_argument("--stops", type=int, default=60, help="Points per side of the many-to-many case")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(-47.0, -34.0, args.points)
+    lngs = rng.uniform(166.0, 179.0, args.points)
+    lat_list, lng_list = lats.tolist(), lngs.tolist()
+    origin = (-41.29, 174.78)
+
+    scalar = _best(lambda: [haversine_km(*origin, lat, lng) for lat, lng in zip(lat_list, lng_list)], args.repeat)
+    vectorised = _best(lambda: one_to_many_km(*origin, lats, lngs), args.repeat)
+    _report(f"1 x {args.points}", scalar, vectorised)
+
+    stop_lats, stop_lngs = lat_list[:args.stops], lng_list[:args.stops]
+    scalar = _best(
+        lambda: [[haversine_km(a, b, c, d) for c, d in zip(stop_lats, stop_lngs)] for a, b in zip(stop_lats, stop_lngs)],
+        args.repeat,
+    )
+    vectorised = _best(lambda: many_to_many_km(stop_lats, stop_lngs), args.repeat)
+    _report(f"{args.stops} x {args.stops}", scalar, vectorised)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""Contract a pre-extracted road graph for offline routing.
+
+The input is JSON (optionally gzipped) with node coordinates and road
+segments weighted by driving time, for example exported from OpenStreetMap:
+
+    {"nodes": [[lat, lng], ...], "edges": [[u, v, minutes, km], [u, v, minutes, km, true], ...]}
+
+A fifth ``true`` marks a one-way segment. The output is the contraction
+hierarchy the API loads from ``ROAD_GRAPH_PATH``. The API refuses raw
+graphs: contracting one takes minutes and must not happen while serving.
+
+    python scripts/build_road_graph.py nz_roads.json.gz /data/nz_roads.ch.json.gz
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from app.core.planning.road_network import load_road_network, save_road_network  # noqa: E402
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="Raw road graph (.json or .json.gz)")
+    parser.add_argument("output", help="Where to write the contraction hierarchy (.json or .json.gz)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    hierarchy = load_road_network(args.source)
+    save_road_network(hierarchy, args.output)
+    print(
+        f"Contracted {len(hierarchy.graph)} nodes into {len(hierarchy.edges)} edges "
+        f"in {time.perf_counter() - started:.1f}s -> {args.output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Precompute travel legs between nearby attractions into the travel-time cache.
+
+Every ordered pair of catalog attractions within ``--radius-km`` of each other
+is requested once through ``MapsService.distance_matrix``, which stores the
+answers in the persistent travel-time store. Pairs already cached are not
+requested again, so the command can be re-run after catalog updates.
+
+    python scripts/warm_travel_cache.py --radius-km 30
+    python scripts/warm_travel_cache.py --radius-km 50 --dry-run
+"""
+
+import argparse
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from app.core.recommendation.catalog import AttractionCatalog  # noqa: E402
+from app.services.maps_service import maps_service  # noqa: E402
+from app.services.open_data_service import load_default_sources  # noqa: E402
+
+
+def _load_attractions():
+    attractions = load_default_sources()
+    if not attractions:
+        from app.data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
+
+        attractions = SAMPLE_NZ_ATTRACTIONS
+    return attractions
+
+
+def nearby_pairs(catalog: AttractionCatalog, radius_km: float):
+    """(origin_row, [destination_rows]) for every located attraction"""
+    for row in range(len(catalog)):
+        if not catalog.has_location[row]:
+            continue
+        loc = catalog.attractions[row]["location"]
+        rows, _ = catalog.within_radius(loc["lat"], loc["lng"], radius_km)
+        destinations = sorted(int(r) for r in rows if r != row)
+        if destinations:
+            yield row, destinations
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--radius-km", type=float, default=30.0, help="Warm pairs at most this far apart")
+    parser.add_argument("--mode", default="driving", help="Distance Matrix travel mode")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the pairs that would be requested")
+    args = parser.parse_args(argv)
+
+    catalog = AttractionCatalog(_load_attractions())
+    plan = list(nearby_pairs(catalog, args.radius_km))
+    total = sum(len(destinations) for _, destinations in plan)
+    print(f"{len(catalog)} attractions, {total} pairs within {args.radius_km} km")
+    if args.dry_run:
+        return 0
+    if not maps_service.is_configured():
+        print("GOOGLE_MAPS_API_KEY is not configured; nothing to warm", file=sys.stderr)
+        return 1
+
+    def point(row):
+        loc = catalog.attractions[row]["location"]
+        return (loc["lat"], loc["lng"])
+
+    chunk = 25  # Distance Matrix destination limit per request
+    for origin, destinations in plan:
+        for start in range(0, len(destinations), chunk):
+            maps_service.distance_matrix(
+                [point(origin)], [point(row) for row in destinations[start:start + chunk]], mode=args.mode
+            )
+
+    stats = maps_service.cache_stats()
+    print(
+        f"Done: {stats['api_requests']} requests, {stats['api_elements']} elements, "
+        f"{stats['store_size']} legs stored, hit rate {stats['hit_rate']:.1%}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
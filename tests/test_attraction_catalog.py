@@ -0,0 +1,103 @@
+import numpy as np
+
+from app.core.recommendation.catalog import AttractionCatalog, popcount
+from app.core.recommendation.features import DURATION_FULL_DAY, DURATION_HALF_DAY, FEATURE_NAMES, duration_kind, parse_duration
+from app.data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
+
+
+def test_catalog_columns_match_source():
+    catalog = AttractionCatalog(SAMPLE_NZ_ATTRACTIONS)
+    assert len(catalog) == len(SAMPLE_NZ_ATTRACTIONS)
+    first = SAMPLE_NZ_ATTRACTIONS[0]
+    assert catalog.ids[0] == first["id"]
+    assert np.isclose(catalog.rating[0], first["rating"]["average"])
+    assert np.isclose(np.degrees(catalog.lat_rad[0]), first["location"]["lat"])
+    assert catalog.has_location.all()
+
+
+def test_catalog_category_overlap_and_distance():
+    catalog = AttractionCatalog(SAMPLE_NZ_ATTRACTIONS)
+    rows = np.arange(len(catalog))
+    query = ["natural", "scenic", "unknown"]
+    overlap = catalog.category_overlap(rows, catalog.category_query_mask(query))
+    expected = [len(set(a["categories"]) & set(query)) for a in SAMPLE_NZ_ATTRACTIONS]
+    assert overlap.tolist() == expected
+
+    loc = SAMPLE_NZ_ATTRACTIONS[0]["location"]
+    distances = catalog.distances_from(loc["lat"], loc["lng"])
+    assert distances[0] < 1e-6
+    assert (distances[1:] > 0).all()
+
+
+def test_catalog_handles_sparse_open_data_records():
+    catalog = AttractionCatalog([
+        {"id": 1, "name": "No location", "location": {"lat": None, "lng": None}, "rating": {}},
+        {"id": "2", "categories": "scenic", "rating": "4.5", "location": {"lat": -41.3, "lng": 174.8}},
+    ])
+    assert catalog.has_location.tolist() == [False, True]
+    assert catalog.rating.tolist() == [3.0, 4.5]
+    assert np.isnan(catalog.distances_from(-41.3, 174.8)[0])
+    assert catalog.available_mask(["1"]).tolist() == [False, True]
+
+
+def test_popcount_multiword():
+    words = np.array([[0, 0], [1, 3], [np.uint64(2**63), 0xFF]], dtype=np.uint64)
+    assert popcount(words).tolist() == [0, 3, 9]
+
+
+def test_inverted_indexes_match_linear_scan():
+    catalog = AttractionCatalog(SAMPLE_NZ_ATTRACTIONS)
+    expected = [i for i, a in enumerate(SAMPLE_NZ_ATTRACTIONS) if "natural" in a["categories"]]
+    assert catalog.rows_with_category("NATURAL", ignore_case=True).tolist() == expected
+    assert catalog.rows_with_category("NATURAL").tolist() == []
+
+    either = [i for i, a in enumerate(SAMPLE_NZ_ATTRACTIONS) if {"beach", "cave"} & set(a["categories"])]
+    assert catalog.rows_with_any_category(["beach", "cave", "unknown"]).tolist() == either
+
+    auckland = [i for i, a in enumerate(SAMPLE_NZ_ATTRACTIONS) if a["region"] == "Auckland"]
+    assert catalog.rows_in_region("auckland").tolist() == auckland
+
+
+def test_id_lookup():
+    catalog = AttractionCatalog(SAMPLE_NZ_ATTRACTIONS)
+    last = SAMPLE_NZ_ATTRACTIONS[-1]
+    assert catalog.get(last["id"]) is last
+    assert catalog.row_for_id(last["id"]) == len(SAMPLE_NZ_ATTRACTIONS) - 1
+    assert catalog.get("missing") is None
+
+
+def test_parse_duration():
+    assert parse_duration("2-3 hours") == 150
+    assert parse_duration("4 hours") == 240
+    assert parse_duration("90 minutes") == 90
+    assert parse_duration("full_day") == 480
+    assert parse_duration("half_day") == 240
+    assert parse_duration("") is None
+    assert parse_duration(None) is None
+
+
+def test_duration_kind_only_for_literal_day_labels():
+    assert duration_kind("full_day") == DURATION_FULL_DAY
+    assert duration_kind("Half_Day") == DURATION_HALF_DAY
+    assert duration_kind("8 hours") is None and duration_kind("3-5 hours") is None
+    assert duration_kind(None) is None
+
+
+def test_static_features_materialized_at_load():
+    catalog = AttractionCatalog([
+        {"id": "a", "categories": ["museum"], "features": {"price_level": 2, "is_outdoor": False},
+         "estimated_duration": "1-2 hours", "rating": {"average": 4.0}, "review_count": 500},
+        {"id": "b", "price_range": [10, 20]},
+    ])
+    first, second = catalog.features
+    assert first.primary_category == "museum"
+    assert first.price_range == [100, 200]
+    assert first.display_price_range == [80, 200]
+    assert second.primary_category is None
+    assert second.price_range == [150, 300]
+    assert second.display_price_range == [10, 20]
+
+    matrix = catalog.feature_matrix
+    assert matrix.shape == (2, len(FEATURE_NAMES))
+    assert matrix[0].tolist() == [0.8, 0.5, 2.0, 90.0, 0.0]
+    assert np.isnan(matrix[1, 2:]).all()
@@ -0,0 +1,23 @@
+def test_list_attractions_filters_by_region_and_category(client):
+    r = client.get("/api/attractions", params={"region": "rotorua", "category": "Family"})
+    assert r.status_code == 200
+    items = r.json()
+    assert items
+    for item in items:
+        assert item["region"] == "Rotorua"
+        assert "family" in item["categories"]
+
+
+def test_list_attractions_limit_and_fallback(client):
+    r = client.get("/api/attractions", params={"category": "no-such-category", "limit": 3})
+    assert r.status_code == 200
+    assert len(r.json()) == 3
+
+
+def test_get_attraction_by_id(client):
+    r = client.get("/api/attractions/WLG_TE_PAPA")
+    assert r.status_code == 200
+    assert r.json()["id"] == "WLG_TE_PAPA"
+
+    r = client.get("/api/attractions/does-not-exist")
+    assert r.status_code == 404
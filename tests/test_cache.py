@@ -0,0 +1,232 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_counters():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["hits"] == 3 and stats["misses"] == 1 and stats["size"] == 2
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=4, ttl=10, clock=clock)
+    cache.set("k", "v")
+    clock.now = 9.9
+    assert cache.get("k") == "v"
+    clock.now = 10.0
+    assert cache.get("k", "missing") == "missing"
+    assert len(cache) == 0
+
+
+def test_clear_and_invalid_size():
+    cache = TTLCache(maxsize=1)
+    cache.set("k", "v")
+    cache.clear()
+    assert cache.get("k") is None
+    with pytest.raises(ValueError):
+        TTLCache(maxsize=0)
+
+
+def test_eviction_and_expiration_counters():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    for key in "abc":
+        cache.set(key, key)
+    clock.now = 11
+    assert cache.get("c") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["expirations"] == 1
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(maxsize=8, ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(1)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["coalesced"] < 5:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1] and results == ["value"] * 6
+    assert cache.get_or_load("k", loader) == "value" and calls == [1]
+
+
+def test_async_single_flight_skips_caching_none_and_propagates_errors():
+    cache = TTLCache(maxsize=8, ttl=60)
+    calls = []
+
+    async def loader(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if value == "boom":
+            raise RuntimeError(value)
+        return value
+
+    async def run():
+        first = await asyncio.gather(*(cache.get_or_load_async("a", lambda: loader("a")) for _ in range(5)))
+        missing = [await cache.get_or_load_async("n", lambda: loader(None)) for _ in range(2)]
+        errors = await asyncio.gather(
+            *(cache.get_or_load_async("e", lambda: loader("boom")) for _ in range(3)), return_exceptions=True
+        )
+        return first, missing, errors
+
+    first, missing, errors = asyncio.run(run())
+    assert first == ["a"] * 5 and missing == [None, None]
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert calls == ["a", None, None, "boom"]
+
+
+def test_stale_values_are_served_while_one_refresh_runs():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=8, ttl=10, clock=clock, stale_ttl=30)
+    cache.set("k", "old")
+    clock.now = 15
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(1)
+        return "new"
+
+    assert cache.get("k") is None  # Plain lookups never see stale values
+    assert [cache.get_or_load("k", loader) for _ in range(3)] == ["old"] * 3
+    release.set()
+    while cache.stats()["in_flight"]:
+        time.sleep(0.001)
+    assert cache.get_or_load("k", loader) == "new" and calls == [1]
+    stats = cache.stats()
+    assert stats["stale_hits"] == 3 and stats["refreshes"] == 1
+
+    clock.now = 100  # Past the stale window: a plain miss again
+    assert cache.get_or_load("k", lambda: "reloaded") == "reloaded"
+
+
+def test_async_stale_refresh_and_hot_keys():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=8, ttl=10, clock=clock, stale_ttl=30)
+
+    async def loader(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    async def run():
+        for key in ("a", "b", "c"):
+            cache.set(key, key + "0")
+        for key, lookups in (("a", 1), ("b", 5), ("c", 3)):
+            for _ in range(lookups):
+                await cache.get_or_load_async(key, lambda: loader("x"))
+        clock.now = 12
+        stale = await cache.get_or_load_async("b", lambda: loader("b1"))
+        await asyncio.sleep(0.05)
+        return stale, await cache.get_or_load_async("b", lambda: loader("b2"))
+
+    assert asyncio.run(run()) == ("b0", "b1")
+    assert cache.hot_keys(2) == ["b", "c"]
+    assert cache.expires_in("b") == pytest.approx(10) and cache.expires_in("zzz") is None
+
+
+def test_batch_loads_share_flights_serve_stale_and_cache_failures_briefly():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=16, ttl=10, clock=clock, stale_ttl=30, negative_ttl=5)
+    cache.set("old", "old0", ttl=2)
+    calls = []
+
+    async def loader(keys):
+        calls.append(sorted(keys))
+        await asyncio.sleep(0.01)
+        return {key: key + "1" for key in keys if key != "bad"}
+
+    async def run():
+        first = await asyncio.gather(
+            cache.get_or_load_many_async(["a", "b", "bad"], loader),
+            cache.get_or_load_many_async(["b", "c", "a"], loader),
+        )
+        clock.now = 3
+        stale = await cache.get_or_load_many_async(["old", "a", "bad"], loader)
+        await asyncio.sleep(0.05)
+        return first, stale
+
+    first, stale = asyncio.run(run())
+    assert first[0] == {"a": "a1", "b": "b1", "bad": None}
+    assert first[1] == {"b": "b1", "c": "c1", "a": "a1"}
+    assert stale == {"old": "old0", "a": "a1", "bad": None}
+    # Each key loaded once; the stale key refreshed in the background; "bad" not retried within 5s
+    assert calls == [["a", "b", "bad"], ["c"], ["old"]]
+    assert cache.get("old") == "old1" and cache.stats()["coalesced"] == 2
+
+    clock.now = 6
+    assert cache.get_or_load_many(["bad", "a"], lambda keys: calls.append(sorted(keys)) or {}) == {
+        "bad": None, "a": "a1"
+    }
+    assert calls[-1] == ["bad"]
+
+    # A failed reload keeps the stale value rather than caching the failure over it
+    clock.now = 25
+    assert cache.get_or_load_many(["a"], lambda keys: {}) == {"a": "a1"}
+    time.sleep(0.05)
+    assert cache.get("a", allow_stale=True) == "a1" and cache.get("a") is None
+
+
+def test_cancelled_leader_hands_the_load_to_a_waiter():
+    cache = TTLCache(maxsize=8, ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "v"
+
+    async def load_many(keys):
+        calls.append(sorted(keys))
+        await asyncio.sleep(0.02)
+        return {key: key.upper() for key in keys}
+
+    async def run():
+        leader = asyncio.ensure_future(cache.get_or_load_async("k", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.get_or_load_async("k", loader))
+        batch_leader = asyncio.ensure_future(cache.get_or_load_many_async(["a", "b"], load_many))
+        await asyncio.sleep(0)
+        batch_waiter = asyncio.ensure_future(cache.get_or_load_many_async(["b", "c"], load_many))
+        await asyncio.sleep(0.005)
+        leader.cancel()
+        batch_leader.cancel()  # A dropped client request
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        with pytest.raises(asyncio.CancelledError):
+            await batch_leader
+        return await waiter, await batch_waiter
+
+    assert asyncio.run(run()) == ("v", {"b": "B", "c": "C"})
+    assert calls == [1, ["a", "b"], ["c"], 1, ["b"]] and cache.get("k") == "v"
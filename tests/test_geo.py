@@ -0,0 +1,32 @@
+import numpy as np
+
+from app.core.geo import (
+    geohash_bounds, geohash_center, geohash_encode, haversine_km, many_to_many_km, one_to_many_km,
+)
+
+
+def test_geohash_known_value():
+    # Reference value from the original geohash.org implementation
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_geohash_cell_contains_point():
+    lat, lng = -41.2865, 174.7762
+    cell = geohash_encode(lat, lng, 6)
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(cell)
+    assert lat_min <= lat < lat_max and lng_min <= lng < lng_max
+    assert geohash_encode(*geohash_center(cell), 6) == cell
+    assert geohash_encode(lat, lng, 4) == cell[:4]
+
+
+def test_vectorised_haversine_matches_scalar():
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(-47, -34, 50)
+    lngs = rng.uniform(166, 179, 50)
+    matrix = many_to_many_km(lats, lngs)
+    expected = [[haversine_km(a, b, c, d) for c, d in zip(lats, lngs)] for a, b in zip(lats, lngs)]
+    assert np.allclose(matrix, expected) and np.allclose(matrix, matrix.T)
+    assert np.allclose(one_to_many_km(lats[3], lngs[3], lats, lngs), matrix[3])
+    assert many_to_many_km(lats[:2], lngs[:2], lats, lngs).shape == (2, 50)
+    # Wellington to Auckland is roughly 490 km
+    assert 480 < haversine_km(-41.2865, 174.7762, -36.8485, 174.7633) < 500
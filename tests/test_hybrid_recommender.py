@@ -0,0 +1,175 @@
+import asyncio
+import importlib.util
+import pathlib
+import time
+
+import numpy as np
+import pytest
+
+from app.data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
+
+# conftest replaces app.core.recommendation.hybrid with a shim for the API
+# tests, so load the real implementation under a separate module name.
+_HYBRID_PATH = pathlib.Path(__file__).resolve().parents[1] / "app" / "core" / "recommendation" / "hybrid.py"
+_spec = importlib.util.spec_from_file_location("app.core.recommendation._hybrid_under_test", _HYBRID_PATH)
+hybrid = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(hybrid)
+
+
+def _synthetic_catalog(size=3000, seed=11):
+    rng = np.random.default_rng(seed)
+    categories = ["natural", "scenic", "family", "cultural", "adventure", "urban"]
+    return [
+        {
+            "id": f"P{i}",
+            "location": {"lat": float(rng.uniform(-47, -34)), "lng": float(rng.uniform(166, 178.5))},
+            "categories": list(rng.choice(categories, size=int(rng.integers(1, 4)), replace=False)),
+            "rating": {"average": float(rng.uniform(2, 5))},
+            "review_count": int(rng.integers(0, 3000)),
+        }
+        for i in range(size)
+    ]
+
+
+def _recommend(recommender, *args, **kwargs):
+    return asyncio.run(recommender.recommend("u", *args, **kwargs))
+
+
+@pytest.fixture
+def no_noise(monkeypatch):
+    monkeypatch.setattr(np.random, "random", lambda n: np.zeros(n))
+
+
+def test_distance_filter_and_exclusions():
+    recommender = hybrid.HybridRecommender()
+    asyncio.run(recommender.load_data(SAMPLE_NZ_ATTRACTIONS))
+    wellington = {"lat": -41.29, "lng": 174.78}
+    result = _recommend(
+        recommender, {"activity_types": ["cultural"], "max_travel_distance": 20}, wellington,
+        exclude_visited=["WLG_TE_PAPA"], top_k=10,
+    )
+    ids = [attraction_id for attraction_id, _ in result]
+    assert ids and all(attraction_id.startswith("WLG_") for attraction_id in ids)
+    assert "WLG_TE_PAPA" not in ids
+    assert all(0.0 <= score <= 1.0 for _, score in result)
+
+
+def test_pruned_catalog_wide_top_k_matches_full_scoring(no_noise):
+    data = _synthetic_catalog()
+    pruned = hybrid.HybridRecommender()
+    full = hybrid.HybridRecommender({"pruning": False})
+    asyncio.run(pruned.load_data(data))
+    asyncio.run(full.load_data(data))
+
+    preferences = {"activity_types": ["natural", "scenic"], "max_travel_distance": None}
+    expected = _recommend(full, preferences, None, exclude_visited=["P1", "P2"], top_k=8)
+    assert _recommend(pruned, preferences, None, exclude_visited=["P1", "P2"], top_k=8) == expected
+    assert len(expected) == 8
+    assert [score for _, score in expected] == sorted((score for _, score in expected), reverse=True)
+
+
+def test_candidates_carry_request_local_distances():
+    data = [dict(a) for a in SAMPLE_NZ_ATTRACTIONS]
+    recommender = hybrid.HybridRecommender()
+    asyncio.run(recommender.load_data(data))
+    preferences = {"activity_types": ["natural"], "max_travel_distance": 5000}
+
+    wellington = asyncio.run(recommender.recommend_candidates(
+        "a", preferences, {"lat": -41.29, "lng": 174.78}, top_k=34))
+    auckland = asyncio.run(recommender.recommend_candidates(
+        "b", preferences, {"lat": -36.85, "lng": 174.76}, top_k=34))
+
+    by_id = {c.attraction_id: c.distance_km for c in auckland}
+    sky_tower = next(c for c in wellington if c.attraction_id == "AKL_SKY_TOWER")
+    assert sky_tower.distance_km > 400
+    assert by_id["AKL_SKY_TOWER"] < 1
+    assert all(recommender.catalog.ids[c.row] == c.attraction_id for c in wellington)
+    assert data == SAMPLE_NZ_ATTRACTIONS
+    assert not recommender.catalog.lat_rad.flags.writeable
+
+
+def test_seeded_variety_is_repeatable_and_varies_by_user():
+    recommender = hybrid.HybridRecommender()
+    asyncio.run(recommender.load_data(_synthetic_catalog(size=500)))
+    prefs = {"activity_types": ["scenic"]}
+    first = _recommend(recommender, prefs, top_k=10)
+    assert _recommend(recommender, prefs, top_k=10) == first
+    other_user = asyncio.run(recommender.recommend("someone-else", prefs, top_k=10))
+    assert other_user != first
+
+
+def test_variety_off_matches_zero_noise(no_noise):
+    data = _synthetic_catalog(size=500)
+    off = hybrid.HybridRecommender({"variety_mode": "off"})
+    random_mode = hybrid.HybridRecommender({"variety_mode": "random"})
+    asyncio.run(off.load_data(data))
+    asyncio.run(random_mode.load_data(data))
+    prefs = {"activity_types": ["family", "urban"]}
+    assert _recommend(off, prefs, top_k=8) == _recommend(random_mode, prefs, top_k=8)
+
+    with pytest.raises(ValueError):
+        hybrid.HybridRecommender({"variety_mode": "sometimes"})
+
+
+def test_seeded_noise_is_uniform_and_deterministic():
+    keys = np.arange(20000, dtype=np.uint64)
+    noise = hybrid.seeded_noise(keys, 42)
+    assert np.array_equal(noise, hybrid.seeded_noise(keys, 42))
+    assert not np.array_equal(noise, hybrid.seeded_noise(keys, 43))
+    assert noise.min() >= 0.0 and noise.max() < 1.0
+    assert abs(noise.mean() - 0.5) < 0.01
+
+
+@pytest.mark.parametrize("pruning", [True, False])
+def test_batch_matches_individual_requests(pruning):
+    recommender = hybrid.HybridRecommender({"pruning": pruning})
+    asyncio.run(recommender.load_data(_synthetic_catalog(size=2000)))
+    recommender.BATCH_MAX_ELEMENTS = 50  # Force several chunks
+    requests = [
+        {"user_id": "a", "preferences": {"activity_types": ["scenic"], "max_travel_distance": 80},
+         "current_location": {"lat": -41.3, "lng": 174.8}, "exclude_visited": ["P1", "P2"], "top_k": 5},
+        {"user_id": "b", "preferences": {"activity_types": []}, "top_k": 7},
+        {"user_id": "c", "preferences": {"activity_types": ["family", "urban"], "max_travel_distance": 0.01},
+         "current_location": {"lat": -45.0, "lng": 170.0}, "top_k": 4},
+        {"user_id": "d", "preferences": {"max_travel_distance": 0},
+         "current_location": {"lat": -37.0, "lng": 175.0}, "top_k": 3},
+    ]
+    batch = asyncio.run(recommender.recommend_batch(requests))
+    for request, result in zip(requests, batch):
+        single = asyncio.run(recommender.recommend_candidates(**request))
+        assert [c.attraction_id for c in result] == [c.attraction_id for c in single]
+        assert [c.score for c in result] == [c.score for c in single]
+        assert [c.distance_km for c in result] == [c.distance_km for c in single]
+
+
+def test_batch_scores_only_nearby_rows_on_a_large_catalog():
+    rng = np.random.default_rng(5)
+    size = 100_000
+    lat, lng = rng.uniform(-47, -34, size), rng.uniform(166, 178.5, size)
+    categories = ["natural", "scenic", "family", "cultural", "adventure", "urban"]
+    data = [
+        {"id": f"P{i}", "location": {"lat": float(lat[i]), "lng": float(lng[i])},
+         "categories": [categories[i % 6]], "rating": {"average": 2 + (i % 7) / 2}}
+        for i in range(size)
+    ]
+    recommender = hybrid.HybridRecommender()
+    asyncio.run(recommender.load_data(data))
+    requests = [
+        {"user_id": f"u{i}", "preferences": {"activity_types": ["scenic"], "max_travel_distance": 30},
+         "current_location": {"lat": float(rng.uniform(-46, -35)), "lng": float(rng.uniform(167, 178))}, "top_k": 10}
+        for i in range(50)
+    ] + [{"user_id": "anywhere", "preferences": {"activity_types": ["urban"]}, "top_k": 10}]
+
+    async def singles():
+        return [await recommender.recommend_candidates(**request) for request in requests]
+
+    started = time.perf_counter()
+    single = asyncio.run(singles())
+    single_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    batch = asyncio.run(recommender.recommend_batch(requests))
+    batch_seconds = time.perf_counter() - started
+
+    assert [[c.attraction_id for c in r] for r in batch] == [[c.attraction_id for c in r] for r in single]
+    # Scoring requests x the whole catalog took ~20x the single-request loop
+    assert batch_seconds < 3 * single_seconds + 0.05
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from app.data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
+from app.schemas.itinerary import ItineraryPlan
+from app.schemas.recommendation import RecommendationRequest
+from app.services.itinerary_planner import ItineraryPlanner
+
+
+@pytest.fixture
+def planner(monkeypatch):
+    planner = ItineraryPlanner()
+    monkeypatch.setattr(planner.maps, "api_key", None)
+    monkeypatch.setattr(planner.weather, "get_current_weather", lambda *args: {"condition": "Clear skies"})
+    monkeypatch.setattr(planner.weather, "get_weather_batch", _clear_batch)
+
+    async def batch_async(points, client=None):
+        return _clear_batch(points)
+
+    monkeypatch.setattr(planner.weather, "get_weather_batch_async", batch_async)
+    monkeypatch.setattr(planner.weather, "get_daily_forecast_batch", _no_forecasts)
+
+    async def forecasts_async(points, dates, client=None):
+        return _no_forecasts(points, dates)
+
+    monkeypatch.setattr(planner.weather, "get_daily_forecast_batch_async", forecasts_async)
+    return planner
+
+
+def _no_forecasts(points, dates):
+    return [{day.isoformat(): None for day in dates} for _ in points]
+
+
+def _clear_batch(points):
+    return [{"condition": "Clear skies", "location": {"lat": lat, "lon": lng}} for lat, lng in points]
+
+
+def _plan(planner):
+    wellington = [a for a in SAMPLE_NZ_ATTRACTIONS if a["region"] == "Wellington"][:4]
+    request = RecommendationRequest(
+        user_id="u", current_location={"lat": -41.29, "lng": 174.78}, preferences={"duration": 2}
+    )
+    pool = [{**a, "confidence_score": 0.5} for a in wellington]
+    plan = planner.build_itinerary(request, pool, solver="cluster")
+    return ItineraryPlan(**plan, recommendations=[]).model_dump(mode="json")
+
+
+def test_replan_only_reroutes_edited_days(planner, monkeypatch):
+    plan = _plan(planner)
+    assert len(plan["days"]) == 2
+    first, second = plan["days"]
+    removed = first["segments"][0]["attraction"]["id"]
+
+    groups = []
+    build = planner.matrix_builder.build
+
+    def spy(matrix_groups):
+        groups.extend(matrix_groups)
+        return build(matrix_groups)
+
+    monkeypatch.setattr(planner.matrix_builder, "build", spy)
+    updated = planner.replan(plan, [{"op": "remove", "day_index": 1, "attraction_id": removed}])
+
+    assert len(groups) == 1  # Only day 1's points were routed
+    assert updated["itinerary_id"] == plan["itinerary_id"] and updated["weather"] == plan["weather"]
+    assert updated["days"][1] is second
+    remaining = [s["attraction"]["id"] for s in updated["days"][0]["segments"]]
+    assert removed not in remaining and len(remaining) == len(first["segments"]) - 1
+    assert updated["summary"]["total_attractions"] == plan["summary"]["total_attractions"] - 1
+    for segment in updated["days"][0]["segments"]:
+        location = segment["attraction"]["location"]
+        assert segment["weather"]["location"] == {"lat": location["lat"], "lon": location["lng"]}
+
+    moved = second["segments"][0]["attraction"]["id"]
+    updated = planner.replan(plan, [{"op": "move", "day_index": 2, "attraction_id": moved, "to_day_index": 1}])
+    assert moved in [s["attraction"]["id"] for s in updated["days"][0]["segments"]]
+    assert updated["days"][0]["date"] == first["date"]
+
+
+def test_replan_endpoint_adds_catalog_attractions(client, planner):
+    plan = _plan(planner)
+    response = client.patch("/api/itineraries/plan", json={
+        "plan": plan, "edits": [{"op": "add", "day_index": 2, "new_attraction_id": "WLG_TE_PAPA"}],
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert "WLG_TE_PAPA" in [s["attraction"]["id"] for s in body["days"][1]["segments"]]
+    assert body["days"][0] == plan["days"][0]
+
+    bad = client.patch("/api/itineraries/plan", json={
+        "plan": plan, "edits": [{"op": "remove", "day_index": 9, "attraction_id": "x"}],
+    })
+    assert bad.status_code == 400
+    unknown = client.patch("/api/itineraries/plan", json={
+        "plan": plan, "edits": [{"op": "add", "day_index": 1, "new_attraction_id": "nope"}],
+    })
+    assert unknown.status_code == 400
+
+
+def test_replan_resolves_ids_from_the_open_data_catalog(client, planner):
+    from app.api.routes.recommendations import recommendation_service
+
+    plan = _plan(planner)
+    open_data = [{
+        "id": "OD_ZEALANDIA", "name": "Zealandia", "region": "Wellington", "categories": ["natural"],
+        "location": {"lat": -41.2905, "lng": 174.7536}, "estimated_duration": "2-3 hours", "features": {"is_outdoor": True},
+    }]
+    asyncio.run(recommendation_service.initialize(open_data))
+    try:
+        response = client.patch("/api/itineraries/plan", json={
+            "plan": plan, "edits": [{"op": "add", "day_index": 1, "new_attraction_id": "OD_ZEALANDIA"}],
+        })
+        assert response.status_code == 200
+        added = [s["attraction"] for s in response.json()["days"][0]["segments"]]
+        zealandia = next(a for a in added if a["id"] == "OD_ZEALANDIA")
+        assert zealandia["duration_minutes"] == 150 and zealandia["features"] == {"is_outdoor": True}
+        assert client.get("/api/attractions/OD_ZEALANDIA").status_code == 200  # Same catalog
+    finally:
+        asyncio.run(recommendation_service.initialize(SAMPLE_NZ_ATTRACTIONS))
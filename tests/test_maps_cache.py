@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import httpx
+
+from app.services.maps_service import MapsService
+
+
+def _service(tmp_path, monkeypatch, calls):
+    service = MapsService(cache_path=str(tmp_path / "legs.sqlite3"))
+    service.api_key = "test-key"
+
+    def fake_request(origins, destinations, mode):
+        calls.append((list(origins), list(destinations)))
+        return [
+            [{"distance_km": abs(o[1] - d[1]) * 100, "duration_minutes": abs(o[1] - d[1]) * 80} for d in destinations]
+            for o in origins
+        ]
+
+    monkeypatch.setattr(service, "_request_matrix", fake_request)
+    return service
+
+
+A, B, C = (-41.0, 174.0), (-41.0, 174.1), (-41.0, 174.2)
+
+
+def test_only_misses_are_requested(tmp_path, monkeypatch):
+    calls = []
+    service = _service(tmp_path, monkeypatch, calls)
+    first = service.distance_matrix([A], [B])
+    assert len(calls) == 1 and abs(first[0][0]["distance_km"] - 10.0) < 1e-9
+
+    again = service.distance_matrix([A], [B])
+    assert again == first and len(calls) == 1
+
+    service.distance_matrix([A], [B, C])
+    assert calls[-1] == ([A], [C])
+    stats = service.cache_stats()
+    assert stats["memory_hits"] == 2 and stats["misses"] == 2
+
+
+def test_legs_survive_restart(tmp_path, monkeypatch):
+    calls = []
+    _service(tmp_path, monkeypatch, calls).distance_matrix([A, B], [B, C])
+    requested = len(calls)
+
+    restarted = _service(tmp_path, monkeypatch, calls)
+    matrix = restarted.distance_matrix([A, B], [B, C])
+    assert len(calls) == requested
+    assert abs(matrix[1][1]["duration_minutes"] - 8.0) < 1e-9
+    assert restarted.cache_stats()["store_hits"] == 4
+
+
+def test_async_matrix_uses_the_same_cache(tmp_path, monkeypatch):
+    calls = []
+    service = _service(tmp_path, monkeypatch, calls)
+    service.distance_matrix([A], [B])
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.params["destinations"])
+        element = {"status": "OK", "distance": {"value": 20000}, "duration": {"value": 1200}}
+        return httpx.Response(200, content=json.dumps({"status": "OK", "rows": [{"elements": [element]}]}))
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await service.distance_matrix_async([A], [B, C], client=client)
+
+    matrix = asyncio.run(run())
+    assert requested == [f"{C[0]},{C[1]}"]
+    assert abs(matrix[0][0]["distance_km"] - 10.0) < 1e-9 and matrix[0][1]["distance_km"] == 20.0
+    assert service.distance_matrix([A], [C]) == [[matrix[0][1]]] and len(calls) == 1
+
+
+def test_store_ignores_expired_legs_and_reads_in_chunks(tmp_path, monkeypatch):
+    from app.services import maps_service as maps_module
+    from app.services.maps_service import TravelTimeStore, leg_key
+
+    monkeypatch.setattr(maps_module, "STORE_LOOKUP_CHUNK", 3)
+    store = TravelTimeStore(str(tmp_path / "legs.sqlite3"), ttl=60)
+    keys = [leg_key(A, (-41.0, 174.0 + i / 100), "driving") for i in range(7)]
+    store.put_many({key: {"distance_km": 1.0, "duration_minutes": 2.0} for key in keys})
+    assert set(store.get_many(keys + [leg_key(B, A, "driving")])) == set(keys)
+
+    now = maps_module.time.time()
+    monkeypatch.setattr(maps_module.time, "time", lambda: now + 61)
+    assert store.get_many(keys) == {}
+
+
+def test_failed_request_keeps_cached_legs(tmp_path, monkeypatch):
+    calls = []
+    service = _service(tmp_path, monkeypatch, calls)
+    cached = service.distance_matrix([A], [B])
+    monkeypatch.setattr(service, "_request_matrix", lambda *args: None)
+
+    matrix = service.distance_matrix([A], [B, C])
+    assert matrix[0][0] == cached[0][0]
+    assert matrix[0][1] == {"distance_km": None, "duration_minutes": None}
+    assert service.distance_matrix([C], [A]) is None  # Nothing cached to fall back on
+
+
+def test_locked_store_falls_back_to_memory_and_api(tmp_path, monkeypatch):
+    import sqlite3
+
+    from app.services import maps_service as maps_module
+
+    monkeypatch.setattr(maps_module, "STORE_BUSY_TIMEOUT_S", 0.05)
+    calls = []
+    service = _service(tmp_path, monkeypatch, calls)
+    assert service.store is not None
+    other_worker = sqlite3.connect(str(tmp_path / "legs.sqlite3"))
+    other_worker.execute("BEGIN EXCLUSIVE")  # Neither reads nor writes can get in
+    try:
+        first = service.distance_matrix([A], [B, C])
+        assert len(calls) == 1 and abs(first[0][1]["distance_km"] - 20.0) < 1e-9
+        assert service.distance_matrix([A], [B, C]) == first and len(calls) == 1  # From memory
+        assert service.cache_stats()["store_size"] == 0
+    finally:
+        other_worker.rollback()
+        other_worker.close()
@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+import pytest
+
+from app.data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
+from app.schemas.recommendation import LocationInfo, RecommendationRequest, UserPreferences
+from app.services.recommendation_service import RecommendationService
+from tests.test_hybrid_recommender import hybrid
+
+
+class RainyWeather:
+    def __init__(self):
+        self.batches = []
+
+    async def get_weather_batch_async(self, points, client=None):
+        self.batches.append(points)
+        return [{"condition": "Rain", "suitable_for_outdoor": False}] * len(points)
+
+
+@pytest.fixture
+def service():
+    service = RecommendationService()
+    service.weather = RainyWeather()
+    # conftest swaps the recommender module for a shim; use the real one here
+    service.recommender = hybrid.HybridRecommender({"variety_mode": "seeded"})
+    service.variety_mode = "seeded"
+    asyncio.run(service.initialize(SAMPLE_NZ_ATTRACTIONS))
+    return service
+
+
+def _request(user_id, lat, lng, activity_types):
+    return RecommendationRequest(
+        user_id=user_id,
+        preferences=UserPreferences(activity_types=activity_types, max_travel_distance=100),
+        current_location=LocationInfo(lat=lat, lng=lng),
+        top_k=5,
+    )
+
+
+def test_nearby_requests_share_cached_ranking(service):
+    first = asyncio.run(service.get_recommendations(_request("a", -41.2865, 174.7762, ["scenic", "natural"])))
+    # Same geocell, different user, same preferences in another order
+    second = asyncio.run(service.get_recommendations(_request("b", -41.2866, 174.7763, ["natural", "scenic"])))
+
+    assert [r.id for r in first.recommendations] == [r.id for r in second.recommendations]
+    stats = service.cache_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    # Distances are still measured from each user's own location
+    assert first.recommendations[0].distance is not None
+
+
+def test_initialize_invalidates_cache(service):
+    request = _request("a", -41.2865, 174.7762, ["scenic"])
+    asyncio.run(service.get_recommendations(request))
+    asyncio.run(service.initialize(SAMPLE_NZ_ATTRACTIONS[:10]))
+    assert service.cache_stats()["size"] == 0
+    asyncio.run(service.get_recommendations(request))
+    assert service.cache_stats()["hits"] == 0
+
+
+def test_batch_uses_and_fills_cache(service):
+    wellington = _request("a", -41.2865, 174.7762, ["scenic"])
+    queenstown = _request("a", -45.0312, 168.6626, ["adventure"])
+    single = asyncio.run(service.get_recommendations(wellington))
+
+    batch = asyncio.run(service.get_recommendations_batch([wellington, queenstown]))
+    assert [r.id for r in batch[0].recommendations] == [r.id for r in single.recommendations]
+    assert batch[1].recommendations and batch[1].algorithm_used == "hybrid_with_distance"
+    assert service.cache_stats()["hits"] == 1
+
+    again = asyncio.run(service.get_recommendations(queenstown))
+    assert [r.id for r in again.recommendations] == [r.id for r in batch[1].recommendations]
+    assert service.cache_stats()["hits"] == 2
+
+
+def test_weather_suitable_reflects_outdoor_weather_in_one_lookup(service):
+    batch = asyncio.run(service.get_recommendations_batch([
+        _request("a", -41.2865, 174.7762, ["scenic", "cultural"]),
+        _request("b", -45.0312, 168.6626, ["adventure"]),
+    ]))
+    assert len(service.weather.batches) == 1
+    catalog = service._catalog
+    for response in batch:
+        for recommendation in response.recommendations:
+            outdoor = catalog.features[catalog.row_for_id(recommendation.id)].is_outdoor
+            assert recommendation.weather_suitable is not bool(outdoor)
+
+
+def test_distances_are_measured_once_from_the_users_location(service, monkeypatch):
+    catalog = service._catalog
+    measure = catalog.distances_from
+    calls = []
+
+    def spy(lat, lng, rows=None):
+        calls.append((lat, lng))
+        return measure(lat, lng, rows)
+
+    monkeypatch.setattr(catalog, "distances_from", spy)
+    first = asyncio.run(service.get_recommendations(_request("a", -41.2865, 174.7762, ["scenic"])))
+    assert calls == [(-41.2865, 174.7762)]  # By the recommender only, from the exact location
+    expected = measure(-41.2865, 174.7762, catalog.rows_for_ids([r.id for r in first.recommendations]))
+    assert [r.distance for r in first.recommendations] == [round(d, 1) for d in expected.tolist()]
+
+    asyncio.run(service.get_recommendations(_request("b", -41.2865, 174.7762, ["scenic"])))
+    assert len(calls) == 1  # Cached ranking from the same point
+    asyncio.run(service.get_recommendations(_request("c", -41.2866, 174.7763, ["scenic"])))
+    assert calls[1:] == [(-41.2866, 174.7763)]  # Same cell, another point: re-measured
+
+
+def test_slow_weather_falls_back_to_cached_readings(service):
+    class SlowWeather(RainyWeather):
+        async def get_weather_batch_async(self, points, client=None):
+            self.batches.append(points)
+            await asyncio.sleep(0.2)
+            return [{"condition": "Rain", "suitable_for_outdoor": False}] * len(points)
+
+        def get_cached_weather_batch(self, points):
+            return [None] * len(points)
+
+    service.weather = SlowWeather()
+    service.weather_timeout = 0.01
+
+    async def run():
+        started = time.perf_counter()
+        response = await service.get_recommendations(_request("a", -41.2865, 174.7762, ["scenic", "cultural"]))
+        elapsed = time.perf_counter() - started
+        pending = len(service._weather_lookups)
+        await asyncio.sleep(0.3)
+        return response, elapsed, pending
+
+    response, elapsed, pending = asyncio.run(run())
+    assert elapsed < 0.15 and pending == 1 and not service._weather_lookups
+    assert response.recommendations and all(r.weather_suitable for r in response.recommendations)
@@ -43,3 +43,20 @@ def test_recommendations_basic(client):
         for key in ["id", "name", "categories", "score", "confidence_score"]:
             assert key in rec
         assert 0.0 <= rec["score"] <= 1.0
+
+
+def test_recommendations_batch(client):
+    item = {
+        "user_id": "test_user",
+        "preferences": {"activity_types": ["natural"], "max_travel_distance": 100},
+        "current_location": {"lat": -41.3, "lng": 174.8},
+        "top_k": 3,
+    }
+    r = client.post("/api/recommendations/batch", json={"requests": [item, {**item, "top_k": 1}]})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["total_count"] == 2
+    assert all("recommendations" in response for response in data["responses"])
+
+    r = client.post("/api/recommendations/batch", json={"requests": []})
+    assert r.status_code == 400
@@ -0,0 +1,94 @@
+import asyncio
+import heapq
+import json
+import math
+import random
+
+import numpy as np
+
+from app.core.planning.road_network import ContractionHierarchy, RoadGraph, load_road_network, save_road_network
+from app.services.road_routing import RoadNetworkRouter
+from app.services.travel_matrix import TravelMatrixBuilder
+from tests.test_travel_matrix import FakeMaps
+
+SIDE = 12
+
+
+def _grid_graph(seed=0):
+    """SIDE x SIDE street grid ~1.1 km apart with random speeds and some one-way streets"""
+    rng = random.Random(seed)
+    nodes = [[-41.0 + 0.01 * i, 174.0 + 0.01 * j] for i in range(SIDE) for j in range(SIDE)]
+    edges = []
+    for i in range(SIDE):
+        for j in range(SIDE):
+            u = i * SIDE + j
+            if j + 1 < SIDE:
+                edges.append([u, u + 1, rng.uniform(0.5, 3.0), 0.85, rng.random() < 0.15])
+            if i + 1 < SIDE:
+                edges.append([u, u + SIDE, rng.uniform(0.5, 3.0), 1.1])
+    return {"nodes": nodes, "edges": edges}
+
+
+def _dijkstra(graph, source):
+    adjacency = [[] for _ in range(len(graph))]
+    for u, v, minutes, _ in graph.edges:
+        adjacency[u].append((v, minutes))
+    dist = [math.inf] * len(graph)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist[node]:
+            continue
+        for nxt, minutes in adjacency[node]:
+            if d + minutes < dist[nxt]:
+                dist[nxt] = d + minutes
+                heapq.heappush(heap, (dist[nxt], nxt))
+    return dist
+
+
+def test_contraction_hierarchy_matches_dijkstra():
+    graph = RoadGraph.from_dict(_grid_graph())
+    hierarchy = ContractionHierarchy.build(graph)
+    sources = list(range(0, len(graph), 7))
+    targets = list(range(3, len(graph), 11))
+    minutes, km = hierarchy.many_to_many(sources, targets)
+
+    for s, source in enumerate(sources):
+        expected = _dijkstra(graph, source)
+        assert np.allclose(minutes[s], [expected[t] for t in targets])
+    assert np.all(km[minutes > 0] > 0)
+
+
+def test_saved_hierarchy_answers_the_same(tmp_path):
+    raw = tmp_path / "roads.json"
+    raw.write_text(json.dumps(_grid_graph(seed=1)))
+    built = load_road_network(str(raw))
+    path = str(tmp_path / "roads.ch.json.gz")
+    save_road_network(built, path)
+    loaded = load_road_network(path)
+
+    nodes = list(range(0, SIDE * SIDE, 5))
+    assert np.allclose(built.many_to_many(nodes, nodes)[0], loaded.many_to_many(nodes, nodes)[0])
+
+
+def test_router_snaps_points_and_feeds_the_travel_matrix(tmp_path):
+    raw = tmp_path / "roads.json"
+    raw.write_text(json.dumps(_grid_graph(seed=2)))
+    assert RoadNetworkRouter(str(raw)).is_configured() is False  # Raw graphs must be contracted offline
+    path = tmp_path / "roads.ch.json"
+    save_road_network(load_road_network(str(raw)), str(path))
+    router = RoadNetworkRouter(str(path))
+    assert asyncio.run(router.load()) is True
+    near = [(-41.0002, 174.0), (-40.95, 174.05), (-40.9, 174.1)]
+    far = (-45.0, 170.0)
+
+    rows = router.distance_matrix(near + [far], near)
+    assert rows[0][0]["duration_minutes"] > 0  # Access legs to and from the snapped node
+    assert rows[0][2]["distance_km"] > 10 and rows[3][0]["distance_km"] is None
+
+    builder = TravelMatrixBuilder(FakeMaps(configured=False), router=router)
+    matrix = builder.build([near])
+    assert matrix.offline_legs == 6
+    assert matrix.leg(near[0], near[2]) == rows[0][2]
+    assert RoadNetworkRouter("").is_configured() is False
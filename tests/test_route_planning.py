@@ -0,0 +1,185 @@
+import asyncio
+import datetime
+import itertools
+import random
+
+import numpy as np
+
+from app.core.planning.clustering import cluster_days
+from app.core.planning.orienteering import solve_orienteering
+from app.core.planning.routing import nearest_neighbour, path_cost, solve_route, two_opt, or_opt
+from app.data.sample_attractions import SAMPLE_NZ_ATTRACTIONS
+from app.schemas.recommendation import RecommendationRequest
+from app.services.itinerary_planner import ItineraryPlanner
+
+
+def _random_costs(n, seed):
+    rng = random.Random(seed)
+    points = [(rng.random(), rng.random()) for _ in range(n)]
+    # Mildly asymmetric, like real travel durations
+    return [[((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5 * (1 + 0.2 * rng.random()) for b in points] for a in points]
+
+
+def test_small_routes_are_optimal():
+    for seed in range(30):
+        n = 2 + seed % 6
+        cost = _random_costs(n, seed)
+        for start in (0, None):
+            path = solve_route(cost, start=start)
+            assert sorted(path) == list(range(n))
+            candidates = [p for p in itertools.permutations(range(n)) if start is None or p[0] == start]
+            assert path_cost(cost, path) <= min(path_cost(cost, p) for p in candidates) + 1e-9
+
+
+def test_local_search_improves_large_routes():
+    cost = _random_costs(40, seed=7)
+    path = solve_route(cost, start=0, time_budget=1.0)
+    assert path[0] == 0 and sorted(path) == list(range(40))
+    assert path_cost(cost, path) <= path_cost(cost, nearest_neighbour(cost, 0))
+
+    # At a local optimum neither move finds anything
+    assert not two_opt(cost, path, 1, deadline=float("inf"))
+    assert not or_opt(cost, path, 1, deadline=float("inf"))
+
+
+def test_daily_route_visits_stops_without_zig_zag(monkeypatch):
+    planner = ItineraryPlanner()
+    monkeypatch.setattr(planner.maps, "api_key", None)  # Haversine estimates only
+    base = (-41.29, 174.78)
+    stops = [
+        {"name": "far", "location": {"lat": -41.29, "lng": 175.20}},
+        {"name": "near", "location": {"lat": -41.29, "lng": 174.85}},
+        {"name": "nowhere", "location": {}},
+        {"name": "middle", "location": {"lat": -41.29, "lng": 175.00}},
+    ]
+    day = planner._build_daily_route(1, base, stops)
+    names = [segment["attraction"]["name"] for segment in day["segments"]]
+    assert names == ["near", "middle", "far", "nowhere"]
+    assert day["segments"][-1]["travel"] == {"distance_km": None, "duration_minutes": None}
+    assert abs(day["total_distance_km"] - sum(s["travel"]["distance_km"] or 0 for s in day["segments"])) < 0.02
+
+
+def test_cluster_days_balanced_and_compact():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-46, -35, 60)
+    lng = rng.uniform(167, 178, 60)
+    days = cluster_days(lat, lng, 14, start=(-41.3, 174.8))
+    assert len(days) == 14
+    assert sorted(i for day in days for i in day) == list(range(60))
+    assert {len(day) for day in days} <= {4, 5}
+
+
+def test_days_do_not_mix_regions(monkeypatch):
+    planner = ItineraryPlanner()
+    monkeypatch.setattr(planner.maps, "api_key", None)
+    # Interleave two distant regions in ranking order
+    auckland = [a for a in SAMPLE_NZ_ATTRACTIONS if a["region"] == "Auckland"][:3]
+    queenstown = [a for a in SAMPLE_NZ_ATTRACTIONS if a["region"] == "Queenstown"][:3]
+    ranked = [a for pair in zip(auckland, queenstown) for a in pair] + [{"name": "nowhere", "location": {}}]
+
+    days = planner._assign_days(ranked, 2, start=(-36.85, 174.76))
+    regions = [{a.get("region") for a in day if a.get("region")} for day in days]
+    assert regions == [{"Auckland"}, {"Queenstown"}]
+    assert sum(len(day) for day in days) == len(ranked)
+
+
+def test_orienteering_respects_day_budget_and_prefers_high_scores():
+    rng = np.random.default_rng(2)
+    points = rng.uniform(0, 120, size=(31, 2))
+    travel = np.hypot(*(points[:, np.newaxis, :] - points[np.newaxis, :, :]).transpose(2, 0, 1))
+    scores = rng.random(30)
+    service = np.full(30, 60.0)
+
+    days = solve_orienteering(scores, service, travel, n_days=3, day_minutes=300, time_budget=0.5)
+    visited = [i for day in days for i in day]
+    assert len(visited) == len(set(visited)) and visited
+    for day in days:
+        path = [0] + [i + 1 for i in day]
+        minutes = sum(travel[a, b] for a, b in zip(path, path[1:])) + service[day].sum()
+        assert minutes <= 300 + 1e-6
+    assert scores[visited].mean() > scores.mean()
+
+
+def test_orienteering_itinerary_uses_visit_durations(monkeypatch):
+    planner = ItineraryPlanner()
+    monkeypatch.setattr(planner.maps, "api_key", None)
+    pool = [
+        {**a, "confidence_score": 1.0 - i / 100, "estimated_time": a["estimated_duration"]}
+        for i, a in enumerate(SAMPLE_NZ_ATTRACTIONS)
+    ]
+    days = planner._build_orienteering_days(pool, 2, start=(-41.29, 174.78))
+    assert 0 < len(days) <= 2
+    for day in days:
+        first = day["segments"][0]
+        assert first["departure_time"] > first["arrival_time"]
+        for earlier, later in zip(day["segments"], day["segments"][1:]):
+            assert later["arrival_time"] >= earlier["departure_time"]
+        assert day["segments"][-1]["departure_time"][11:16] <= "17:00"
+
+
+def test_async_itinerary_reuses_prefetched_weather(monkeypatch):
+    planner = ItineraryPlanner()
+    monkeypatch.setattr(planner.maps, "api_key", None)
+
+    async def no_lookup(*args, **kwargs):
+        raise AssertionError("weather was already fetched")
+
+    monkeypatch.setattr(planner.weather, "get_current_weather_async", no_lookup)
+    batches = []
+
+    async def batch(points, client=None):
+        batches.append(points)
+        return [{"condition": "Rain", "suitable_for_outdoor": False}] * len(points)
+
+    monkeypatch.setattr(planner.weather, "get_weather_batch_async", batch)
+
+    async def forecasts(points, dates, client=None):
+        batches.append(points)
+        return [{day.isoformat(): None for day in dates} for _ in points]
+
+    monkeypatch.setattr(planner.weather, "get_daily_forecast_batch_async", forecasts)
+    request = RecommendationRequest(
+        user_id="u", current_location={"lat": -41.29, "lng": 174.78}, preferences={"duration": 2}
+    )
+    pool = [{**a, "confidence_score": 0.5} for a in SAMPLE_NZ_ATTRACTIONS[:8]]
+    weather = {"condition": "Clear skies", "suitable_for_outdoor": True}
+
+    plan = asyncio.run(planner.build_itinerary_async(request, pool, weather=weather))
+    assert plan["weather"] == weather
+    assert plan["summary"]["total_attractions"] == sum(len(day["segments"]) for day in plan["days"]) > 0
+    assert len(batches) == 2  # Every stop's current weather and forecasts, one lookup each
+    assert all(segment["weather"]["condition"] == "Rain" for day in plan["days"] for segment in day["segments"])
+
+
+def test_outdoor_stops_move_off_wet_days(monkeypatch):
+    planner = ItineraryPlanner()
+    monkeypatch.setattr(planner.maps, "api_key", None)
+    monkeypatch.setattr(planner.weather, "get_current_weather", lambda *args: None)
+    monkeypatch.setattr(planner.weather, "get_weather_batch", lambda points: [None] * len(points))
+    today = datetime.date.today().isoformat()
+    wet = {"value": False}
+
+    def forecasts(points, dates):
+        return [
+            {day.isoformat(): {"suitable_for_outdoor": not (wet["value"] and day.isoformat() == today)} for day in dates}
+            for _ in points
+        ]
+
+    monkeypatch.setattr(planner.weather, "get_daily_forecast_batch", forecasts)
+    ids = {"WLG_TE_PAPA", "WLG_ZEALANDIA", "WLG_MOUNT_VICTORIA", "WLG_WETA_WORKSHOP"}
+    pool = [{**a, "confidence_score": 0.5} for a in SAMPLE_NZ_ATTRACTIONS if a["id"] in ids]
+    request = RecommendationRequest(
+        user_id="u", current_location={"lat": -41.29, "lng": 174.78}, preferences={"duration": 2}
+    )
+
+    def outdoor_today(plan):
+        return [s["attraction"]["features"]["is_outdoor"] for s in plan["days"][0]["segments"]].count(True)
+
+    dry_plan = planner.build_itinerary(request, pool, solver="cluster")
+    wet["value"] = True
+    wet_plan = planner.build_itinerary(request, pool, solver="cluster")
+
+    assert outdoor_today(dry_plan) > 0 and outdoor_today(wet_plan) == 0
+    assert wet_plan["summary"]["total_attractions"] == 4
+    assert wet_plan["days"][0]["forecast"] == {"suitable_for_outdoor": False}
+    assert all(day["overflow_minutes"] == 0 for day in wet_plan["days"])
@@ -0,0 +1,71 @@
+from app.core.planning.scheduling import Visit, schedule_day
+from app.core.recommendation.features import parse_opening_hours
+from app.services.itinerary_planner import ItineraryPlanner
+
+
+def test_clock_includes_each_stay_and_waits_for_opening():
+    schedule = schedule_day([15, 30, 10], [Visit(120), Visit(60, (720.0, 1020.0)), Visit(90, (540.0, 780.0))], 480)
+    first, second, third = schedule.visits
+    assert (first.arrival, first.departure) == (555, 675)
+    assert second.arrival == 705 and second.wait_minutes == 15 and second.departure == 780
+    assert third.arrival == 790 and third.late_minutes == 90
+    assert schedule.overflow_minutes == 0 and schedule.late_minutes == 90
+
+    long_day = schedule_day([0, 0, 0], [Visit(240), Visit(240), Visit(120)], 480)
+    assert long_day.overflow_minutes == 120
+
+
+def test_opening_hours_parsing():
+    assert parse_opening_hours("09:00-17:00") == (540.0, 1020.0)
+    assert parse_opening_hours("9am - 5:30pm") == (540.0, 1050.0)
+    assert parse_opening_hours({"open": "18:00", "close": "02:00"}) == (1080.0, 1560.0)
+    assert parse_opening_hours("Open 24 hours") is None
+    assert parse_opening_hours(None) is None
+
+
+def test_overflowing_day_hands_stops_to_a_day_with_room(monkeypatch):
+    planner = ItineraryPlanner()
+    monkeypatch.setattr(planner.maps, "api_key", None)
+    monkeypatch.setattr(planner.matrix_builder, "router", None)
+
+    def stop(name, lng, minutes):
+        return {"name": name, "location": {"lat": -41.0, "lng": lng}, "duration_minutes": minutes}
+
+    busy = [stop("a", 174.00, 180), stop("b", 174.01, 180), stop("c", 174.02, 180)]
+    quiet = [stop("d", 174.03, 60)]
+    start = (-41.0, 174.0)
+    matrix = planner.matrix_builder.build([[start] + planner._coords(day) for day in (busy, quiet)])
+
+    days = planner._route_days(start, [busy, quiet], matrix)
+    assert [day["overflow_minutes"] for day in days] == [0, 0]
+    assert sorted(len(day["segments"]) for day in days) == [2, 2]
+    for day in days:
+        for earlier, later in zip(day["segments"], day["segments"][1:]):
+            assert later["arrival_time"] >= earlier["departure_time"]
+
+
+def test_only_the_chosen_day_is_extended(monkeypatch):
+    planner = ItineraryPlanner()
+    monkeypatch.setattr(planner.maps, "api_key", None)
+    monkeypatch.setattr(planner.matrix_builder, "router", None)
+    extended = []
+    extend = planner.matrix_builder.extend
+
+    def spy(matrix, *groups):
+        extended.append(groups)
+        return extend(matrix, *groups)
+
+    monkeypatch.setattr(planner.matrix_builder, "extend", spy)
+
+    def stop(name, lng, minutes):
+        return {"name": name, "location": {"lat": -41.0, "lng": lng}, "duration_minutes": minutes}
+
+    busy = [stop("a", 174.00, 180), stop("b", 174.01, 180), stop("c", 174.02, 180)]
+    full = [stop("e", 174.04, 200), stop("f", 174.05, 200)]
+    quiet = [stop("d", 174.03, 60)]
+    start = (-41.0, 174.0)
+    matrix = planner.matrix_builder.build([[start] + planner._coords(day) for day in (busy, full, quiet)])
+
+    days = planner._route_days(start, [busy, full, quiet], matrix)
+    assert [len(day["segments"]) for day in days] == [2, 2, 2]
+    assert len(extended) == 1 and (-41.0, 174.03) in extended[0][0]
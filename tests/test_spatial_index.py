@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.core.geo import haversine_km_rad
+from app.core.recommendation.spatial import GeoGridIndex
+
+
+def _brute_force(lat_rad, lng_rad, lat, lng, radius_km):
+    distances = haversine_km_rad(lat_rad, lng_rad, np.radians(lat), np.radians(lng))
+    return np.flatnonzero(distances <= radius_km)
+
+
+def test_radius_query_matches_full_scan():
+    rng = np.random.default_rng(7)
+    lat_rad = np.radians(rng.uniform(-89.0, 89.0, 5000))
+    lng_rad = np.radians(rng.uniform(-180.0, 180.0, 5000))
+    lat_rad[::50] = np.nan
+    index = GeoGridIndex(lat_rad, lng_rad)
+
+    queries = [
+        (-41.3, 174.8, 300),   # Wellington
+        (-20.0, 179.9, 500),   # crosses the antimeridian
+        (88.5, 10.0, 400),     # covers the pole
+        (0.0, 0.0, 25000),     # whole globe
+        (-45.0, 170.0, 0.5),
+    ]
+    for lat, lng, radius in queries:
+        rows, distances = index.query_radius(lat, lng, radius)
+        expected = _brute_force(lat_rad, lng_rad, lat, lng, radius)
+        assert sorted(rows.tolist()) == expected.tolist()
+        assert (distances <= radius).all()
+
+
+def test_radius_query_only_touches_nearby_cells():
+    lat_rad = np.radians(np.array([-41.29, -41.30, -36.85, -45.03]))
+    lng_rad = np.radians(np.array([174.78, 174.77, 174.76, 168.66]))
+    index = GeoGridIndex(lat_rad, lng_rad)
+    assert len(index.candidate_positions(-41.3, 174.8, 10)) == 2
+    rows, _ = index.query_radius(-41.3, 174.8, 10)
+    assert sorted(rows.tolist()) == [0, 1]
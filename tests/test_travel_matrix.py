@@ -0,0 +1,78 @@
+import asyncio
+import threading
+
+from app.services.maps_service import MapsService
+from app.services.travel_matrix import TravelMatrixBuilder
+
+
+class FakeMaps:
+    """Distance Matrix stand-in: 1 km per 0.01 degree of longitude, 1 minute per km"""
+
+    def __init__(self, configured=True):
+        self.configured = configured
+        self.calls = []
+        self.clients = set()
+        self.http_client = None
+        self._lock = threading.Lock()
+
+    def is_configured(self):
+        return self.configured
+
+    def distance_matrix(self, origins, destinations):
+        with self._lock:
+            self.calls.append((len(origins), len(destinations)))
+        return [
+            [{"distance_km": abs(o[1] - d[1]) * 100, "duration_minutes": abs(o[1] - d[1]) * 100} for d in destinations]
+            for o in origins
+        ]
+
+    async def distance_matrix_async(self, origins, destinations, client=None):
+        self.clients.add(client)
+        return self.distance_matrix(origins, destinations)
+
+    haversine_distance = staticmethod(MapsService.haversine_distance)
+
+
+def test_trip_matrix_dedupes_points_and_respects_limits():
+    maps = FakeMaps()
+    base = (-41.0, 174.0)
+    days = [[base] + [(-41.0, 174.01 + 0.01 * (d * 10 + i)) for i in range(5)] for d in range(14)]
+    matrix = TravelMatrixBuilder(maps).build(days)
+
+    assert len(matrix.points) == 1 + 14 * 5
+    assert all(o <= 25 and d <= 25 and o * d <= 100 for o, d in maps.calls)
+    # Per-day blocks instead of a full 71 x 71 matrix
+    assert matrix.api_elements == 14 * 36 and len(maps.calls) == 14
+
+    leg = matrix.leg(days[3][1], days[3][4])
+    assert abs(leg["distance_km"] - 3.0) < 1e-9
+    assert matrix.leg(base, base)["distance_km"] == 0.0
+
+
+def test_large_group_is_tiled_and_unconfigured_maps_falls_back_to_haversine():
+    maps = FakeMaps()
+    points = [(-41.0, 174.0 + 0.01 * i) for i in range(41)]
+    matrix = TravelMatrixBuilder(maps).build([points])
+    assert all(o * d <= 100 for o, d in maps.calls)
+    assert len(matrix.block(points)) == 41
+    assert abs(matrix.leg(points[0], points[40])["duration_minutes"] - 40.0) < 1e-9
+
+    offline = TravelMatrixBuilder(FakeMaps(configured=False)).build([points[:3]])
+    assert offline.api_requests == 0
+    assert offline.leg(points[0], points[2])["distance_km"] > 0
+
+
+def test_async_build_matches_threaded_build():
+    base = (-41.0, 174.0)
+    days = [[base] + [(-41.0, 174.01 + 0.01 * (d * 10 + i)) for i in range(4)] for d in range(5)]
+    threaded = TravelMatrixBuilder(FakeMaps()).build(days)
+    maps = FakeMaps()
+    gathered = asyncio.run(TravelMatrixBuilder(maps).build_async(days))
+
+    assert len(maps.calls) == gathered.api_requests == threaded.api_requests
+    for day in days:
+        assert gathered.block(day) == threaded.block(day)
+
+    maps.http_client = shared = object()  # The app-lifetime client is used for every tile
+    asyncio.run(TravelMatrixBuilder(maps).build_async([[base, (-41.0, 174.5)]]))
+    assert shared in maps.clients
@@ -0,0 +1,167 @@
+import asyncio
+import datetime
+
+from app.services import weather_service as weather_module
+from app.services.weather_service import WeatherService
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def test_concurrent_lookups_for_one_location_make_one_provider_call(monkeypatch):
+    service = WeatherService()
+    calls = []
+
+    async def fetch(lat, lon, client=None):
+        calls.append((lat, lon))
+        await asyncio.sleep(0.01)
+        return {"condition": "Clear skies", "suitable_for_outdoor": True}
+
+    monkeypatch.setattr(service, "_fetch_current_async", fetch)
+
+    async def run():
+        return await asyncio.gather(*(service.get_current_weather_async(-41.28651, 174.77621) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1 and all(result == results[0] for result in results)
+    stats = service.cache_stats()
+    assert stats["coalesced"] == 9 and stats["size"] == 1
+
+    monkeypatch.setattr(service, "_fetch_current", lambda lat, lon: calls.append((lat, lon)))
+    assert service.get_current_weather(-41.28651, 174.77621) == results[0] and len(calls) == 1
+
+
+def test_nearby_locations_share_the_cell_centroid_lookup(monkeypatch):
+    service = WeatherService()
+    service.precision = 5
+    calls = []
+
+    def fetch(lat, lon):
+        calls.append((lat, lon))
+        return {"condition": "Clear skies"}
+
+    monkeypatch.setattr(service, "_fetch_current", fetch)
+    # Two Queenstown streets a few hundred metres apart
+    first = service.get_current_weather(-45.0212, 168.6826)
+    second = service.get_current_weather(-45.0250, 168.6790)
+
+    assert len(calls) == 1 and calls[0] != (-45.0212, 168.6826)
+    assert first["cell"] == second["cell"]
+    assert first["location"] == {"lat": -45.0212, "lon": 168.6826}
+    assert second["location"] == {"lat": -45.0250, "lon": 168.6790}
+
+
+def test_refresher_rewarms_hot_cells_about_to_expire(monkeypatch):
+    service = WeatherService()
+    service.refresh_top_n, service.refresh_interval = 1, 60
+    calls = []
+
+    async def fetch(lat, lon, client=None):
+        calls.append((lat, lon))
+        return {"condition": f"reading {len(calls)}"}
+
+    monkeypatch.setattr(service, "_fetch_current_async", fetch)
+
+    async def run():
+        for _ in range(3):
+            await service.get_current_weather_async(-45.0212, 168.6826)
+        await service.get_current_weather_async(-41.28651, 174.77621)
+        fresh = await service.refresh_hot_cells()  # Both cells still have 15 minutes left
+        service.refresh_interval = 3600
+        due = await service.refresh_hot_cells()
+        return fresh, due, await service.get_current_weather_async(-45.0212, 168.6826)
+
+    fresh, due, weather = asyncio.run(run())
+    assert (fresh, due) == (0, 1) and len(calls) == 3
+    assert weather["condition"] == "reading 3"
+
+
+def test_batch_dedupes_cells_serves_hits_and_chunks_misses(monkeypatch):
+    service = WeatherService()
+    service.precision = 5
+    requests_made = []
+
+    def get(url, params, timeout):
+        count = len(params["latitude"].split(","))
+        requests_made.append(count)
+        current = {"temperature_2m": 12.0, "weather_code": 61}
+        return FakeResponse([{"current": current}] * count if count > 1 else {"current": current})
+
+    monkeypatch.setattr(weather_module.requests, "get", get)
+    monkeypatch.setattr(weather_module, "OPEN_METEO_BATCH_SIZE", 2)
+    service._cache.set(service._build_cache_key(-41.28651, 174.77621), {"condition": "Clear skies"})
+
+    points = [
+        (-45.0212, 168.6826), (-45.0250, 168.6790),  # One Queenstown cell
+        (-41.28651, 174.77621),  # Cached
+        (-43.5321, 172.6362), (-36.8485, 174.7633),
+    ]
+    results = service.get_weather_batch(points)
+
+    assert requests_made == [2, 1]  # Three uncached cells, two per call
+    assert results[0]["cell"] == results[1]["cell"] and results[2]["condition"] == "Clear skies"
+    assert results[3]["condition"] == "Rain" and results[3]["suitable_for_outdoor"] is False
+    assert results[4]["location"] == {"lat": -36.8485, "lon": 174.7633}
+    assert service.get_weather_batch(points) == results and requests_made == [2, 1]
+
+
+def test_daily_forecasts_are_batched_and_cached_per_cell_and_date(monkeypatch):
+    service = WeatherService()
+    requests_made = []
+    today = datetime.date.today()
+    dates = [today, today + datetime.timedelta(days=1), today + datetime.timedelta(days=30)]
+
+    def get(url, params, timeout):
+        requests_made.append(params)
+        days = [params["start_date"], params["end_date"]]
+        daily = {"time": days, "weather_code": [0, 63], "precipitation_probability_max": [10, 90]}
+        return FakeResponse([{"daily": daily}] * len(params["latitude"].split(",")))
+
+    monkeypatch.setattr(weather_module.requests, "get", get)
+    points = [(-45.0212, 168.6826), (-41.28651, 174.77621)]
+    first = service.get_daily_forecast_batch(points, dates)
+
+    assert len(requests_made) == 1 and requests_made[0]["end_date"] == dates[1].isoformat()
+    assert first[0][today.isoformat()]["suitable_for_outdoor"] is True
+    assert first[1][dates[1].isoformat()]["condition"] == "Rain"
+    assert first[1][dates[1].isoformat()]["suitable_for_outdoor"] is False
+    assert first[0][dates[2].isoformat()] is None  # Beyond the forecast horizon
+
+    async def run():
+        return await service.get_daily_forecast_batch_async(points, dates[:2])
+
+    assert asyncio.run(run()) == [{day: forecast[day] for day in list(forecast)[:2]} for forecast in first]
+    assert len(requests_made) == 1 and service.cache_stats()["forecast"]["size"] == 4
+
+
+def test_concurrent_batches_share_fetches_and_failed_cells_are_not_refetched(monkeypatch):
+    service = WeatherService()
+    service.precision = 5
+    batches = []
+
+    async def fetch(cells, client=None):
+        batches.append(sorted(cells))
+        await asyncio.sleep(0.01)
+        return {cell: {"condition": "Clear skies"} for cell in cells[1:]}  # The provider drops the first cell
+
+    monkeypatch.setattr(service, "_fetch_open_meteo_cells_async", fetch)
+    points = [(-45.0212, 168.6826), (-41.28651, 174.77621), (-43.5321, 172.6362)]
+
+    async def run():
+        return await asyncio.gather(*(service.get_weather_batch_async(points) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(batches) == 1 and all(result == results[0] for result in results)
+    assert results[0][0] is None and results[0][1]["condition"] == "Clear skies"
+    assert service.cache_stats()["coalesced"] == 12
+
+    asyncio.run(run())
+    assert len(batches) == 1  # The failed cell is remembered for WEATHER_FAILURE_TTL_SECONDS